@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 import torch
 from sklearn.preprocessing import StandardScaler
@@ -12,6 +13,7 @@ from app.services.indicators import add_technical_indicators
 
 class MarketDataset(Dataset):
     def __init__(self, frame: pd.DataFrame, sequence_length: int = 60) -> None:
+        self.sequence_length = sequence_length
         enriched = add_technical_indicators(frame)
 
         # Better labels: use 3-day forward return to reduce noise
@@ -26,16 +28,15 @@ class MarketDataset(Dataset):
         enriched = enriched.dropna().reset_index(drop=True)
 
         self.scaler = StandardScaler()
-        scaled = self.scaler.fit_transform(enriched[FEATURE_COLUMNS])
+        self.scaled = self.scaler.fit_transform(enriched[FEATURE_COLUMNS]).astype(np.float32)
 
-        self.features: list = []
-        self.targets: list = []
-        for idx in range(sequence_length, len(enriched)):
-            self.features.append(scaled[idx - sequence_length: idx])
-            self.targets.append(int(enriched.iloc[idx]["target"]))
-
-        self.features = np.asarray(self.features, dtype=np.float32)
-        self.targets = np.asarray(self.targets, dtype=np.int64)
+        # Sample k is the window scaled[k:k + sequence_length] labelled with the target of the
+        # bar right after it. The windows are a zero-copy (N, sequence_length, F) view of scaled.
+        if len(self.scaled) > sequence_length:
+            self.features = sliding_window_view(self.scaled[:-1], sequence_length, axis=0).transpose(0, 2, 1)
+        else:
+            self.features = np.empty((0, sequence_length, self.scaled.shape[1]), dtype=np.float32)
+        self.targets = enriched["target"].to_numpy(dtype=np.int64, copy=True)[sequence_length:]  # writable for from_numpy
 
         # Compute class weights for imbalanced labels
         counts = np.bincount(self.targets, minlength=3).astype(float)
@@ -46,4 +47,6 @@ class MarketDataset(Dataset):
         return len(self.targets)
 
     def __getitem__(self, index: int) -> tuple[torch.Tensor, torch.Tensor]:
-        return torch.tensor(self.features[index]), torch.tensor(self.targets[index])
+        # slices of the contiguous scaled matrix share its memory; the DataLoader copies once when batching
+        window = self.scaled[index:index + self.sequence_length]
+        return torch.from_numpy(window), torch.from_numpy(self.targets[index:index + 1])[0]
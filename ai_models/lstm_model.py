@@ -53,3 +53,38 @@ class LSTMClassifier(nn.Module):
         # Classification
         return self.classifier(context)
 
+
+
+LSTMState = tuple[torch.Tensor, torch.Tensor]
+
+
+class StreamingLSTMClassifier(nn.Module):
+    """Unidirectional LSTM classifying from the last hidden state, for incremental inference.
+
+    forward() reads a whole window from a zero state like LSTMClassifier; warm()
+    does the same and also returns the (h, c) state, which step() then advances
+    one bar at a time, so a new bar costs one timestep instead of a full window.
+    """
+
+    def __init__(self, input_size: int, hidden_size: int, num_layers: int, num_classes: int) -> None:
+        super().__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, num_layers, batch_first=True, dropout=0.3)
+        self.classifier = nn.Sequential(
+            nn.Linear(hidden_size, hidden_size // 2),
+            nn.ReLU(),
+            nn.Dropout(0.2),
+            nn.Linear(hidden_size // 2, num_classes),
+        )
+
+    def forward(self, inputs: torch.Tensor) -> torch.Tensor:
+        return self.warm(inputs)[0]
+
+    def warm(self, inputs: torch.Tensor) -> tuple[torch.Tensor, LSTMState]:
+        """Logits and final state for (batch, seq, features) windows read from a zero state."""
+        lstm_out, state = self.lstm(inputs)
+        return self.classifier(lstm_out[:, -1]), state
+
+    def step(self, inputs: torch.Tensor, state: LSTMState) -> tuple[torch.Tensor, LSTMState]:
+        """Advance ``state`` by one (batch, features) bar; returns the new logits and state."""
+        lstm_out, state = self.lstm(inputs.unsqueeze(1), state)
+        return self.classifier(lstm_out[:, -1]), state
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import importlib.util
+import logging
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import torch
+from torch import nn
+
+logger = logging.getLogger(__name__)
+
+# Ways to run a window classifier: eager PyTorch, or one of the artifacts written at
+# train time: TorchScript, ONNX, or the int8 build (dynamically quantized LSTM/Linear
+# weights, saved only when it passed the validation accuracy gate).
+RUNTIMES = ("eager", "torchscript", "onnx", "int8")
+
+# (N, seq, features) float32 -> (N, classes) logits
+Runner = Callable[[np.ndarray], np.ndarray]
+
+
+def artifact_path(model_path: str | Path, runtime: str) -> Path:
+    """Where the artifact for ``runtime`` lives, next to the state_dict at ``model_path``."""
+    path = Path(model_path)
+    suffix = {"torchscript": ".ts", "onnx": ".onnx", "int8": ".int8.pt"}[runtime]
+    return path.with_name(path.stem + suffix)
+
+
+def onnx_available() -> bool:
+    return importlib.util.find_spec("onnx") is not None and importlib.util.find_spec("onnxruntime") is not None
+
+
+def export_artifacts(model: nn.Module, model_path: str | Path, input_size: int, sequence_length: int = 60) -> dict[str, str]:
+    """Write TorchScript and (when the onnx packages are installed) ONNX exports of an eval-mode
+    model next to ``model_path``; returns the written paths by runtime. A failing export is logged
+    and skipped, and its file from an earlier model is removed so it cannot be served."""
+    model.eval()
+    example = torch.randn(2, sequence_length, input_size)
+    written = {}
+
+    path = artifact_path(model_path, "torchscript")
+    try:
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example)
+        traced.save(str(path))
+        written["torchscript"] = str(path)
+    except Exception as exc:
+        logger.warning("TorchScript export failed: %s", exc)
+
+    if onnx_available():
+        path = artifact_path(model_path, "onnx")
+        try:
+            torch.onnx.export(
+                model, (example,), str(path),
+                input_names=["features"], output_names=["logits"],
+                dynamic_axes={"features": {0: "batch"}, "logits": {0: "batch"}},
+                dynamo=False,
+            )
+            written["onnx"] = str(path)
+        except Exception as exc:
+            logger.warning("ONNX export failed: %s", exc)
+    else:
+        logger.info("Skipping ONNX export: install onnx and onnxruntime to enable it")
+
+    for runtime in ("torchscript", "onnx"):
+        if runtime not in written:
+            artifact_path(model_path, runtime).unlink(missing_ok=True)
+    return written
+
+
+def quantize_int8(model: nn.Module) -> nn.Module:
+    """Copy of an eval-mode model with int8 LSTM and Linear weights (activations quantized per call)."""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def load_int8(model: nn.Module, model_path: str | Path) -> nn.Module:
+    """The saved int8 build for the fp32 ``model`` at ``model_path``."""
+    quantized = quantize_int8(model)
+    quantized.load_state_dict(torch.load(artifact_path(model_path, "int8"), map_location="cpu", weights_only=False))
+    return quantized.eval()
+
+
+def _torch_runner(module: nn.Module | torch.jit.ScriptModule) -> Runner:
+    def run(batch: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            return module(torch.from_numpy(batch)).numpy()
+    return run
+
+
+def load_runner(runtime: str, model: nn.Module, model_path: str | Path) -> Runner:
+    """Runner for ``runtime`` around the eval-mode ``model`` loaded from ``model_path``.
+
+    Raises if the runtime is unknown or its artifact/package is missing; callers fall back to eager.
+    """
+    if runtime == "eager":
+        return _torch_runner(model)
+    if runtime == "int8":
+        return _torch_runner(load_int8(model, model_path))
+    if runtime == "torchscript":
+        return _torch_runner(torch.jit.load(str(artifact_path(model_path, "torchscript")), map_location="cpu"))
+    if runtime == "onnx":
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()  # same CPU budget as the torch runtimes
+        session = onnxruntime.InferenceSession(str(artifact_path(model_path, "onnx")), options, providers=["CPUExecutionProvider"])
+
+        def run(batch: np.ndarray) -> np.ndarray:
+            return session.run(None, {"features": batch})[0]
+        return run
+    raise ValueError(f"Unknown LSTM runtime {runtime!r}; expected one of {', '.join(RUNTIMES)}")
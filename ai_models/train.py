@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import io
 import logging
+import time
 from pathlib import Path
 
 import joblib
@@ -12,27 +14,14 @@ from torch.utils.data import DataLoader, random_split
 
 from ai_models.dataset import MarketDataset
 from ai_models.features import FEATURE_COLUMNS
-from ai_models.lstm_model import LSTMClassifier
+from ai_models.lstm_model import LSTMClassifier, StreamingLSTMClassifier
+from ai_models.runtime import artifact_path, export_artifacts, quantize_int8
 
 logger = logging.getLogger(__name__)
 
 
-def train_model(frame: pd.DataFrame, model_path: str, scaler_path: str, epochs: int = 30) -> dict:
-    dataset = MarketDataset(frame)
-
-    if len(dataset) < 100:
-        raise ValueError(f"Not enough samples to train: {len(dataset)}. Need at least 100.")
-
-    # 80/20 train/val split
-    val_size = max(int(len(dataset) * 0.2), 10)
-    train_size = len(dataset) - val_size
-    train_ds, val_ds = random_split(dataset, [train_size, val_size])
-
-    train_loader = DataLoader(train_ds, batch_size=32, shuffle=True)
-    val_loader = DataLoader(val_ds, batch_size=64, shuffle=False)
-
-    model = LSTMClassifier(input_size=len(FEATURE_COLUMNS), hidden_size=128, num_layers=2, num_classes=3)
-    loss_fn = nn.CrossEntropyLoss(weight=dataset.class_weights)
+def _fit(model: nn.Module, train_loader: DataLoader, val_loader: DataLoader, loss_fn: nn.Module, epochs: int) -> tuple[float, list[dict]]:
+    """Train with early stopping on validation loss; ``model`` ends up holding the best weights."""
     optimizer = torch.optim.Adam(model.parameters(), lr=1e-3, weight_decay=1e-5)
     scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, patience=3, factor=0.5)
 
@@ -85,18 +74,185 @@ def train_model(frame: pd.DataFrame, model_path: str, scaler_path: str, epochs:
                 logger.info("Early stopping at epoch %d", epoch + 1)
                 break
 
-    # Save best model
     if best_state:
         model.load_state_dict(best_state)
+    model.eval()
+    return best_val_loss, history
+
+
+def _predict_classes(model: nn.Module, loader: DataLoader) -> tuple[np.ndarray, np.ndarray]:
+    preds, targets = [], []
+    with torch.no_grad():
+        for features, batch_targets in loader:
+            preds.append(model(features).argmax(dim=1).numpy())
+            targets.append(batch_targets.numpy())
+    return np.concatenate(preds), np.concatenate(targets)
+
+
+def _batch_latency_ms(model: nn.Module, batch: torch.Tensor, repeats: int = 20) -> float:
+    samples = []
+    with torch.inference_mode():
+        model(batch)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(batch)
+            samples.append((time.perf_counter() - start) * 1000)
+    return round(float(np.median(samples)), 3)
+
+
+def _serialized_kb(state_dict: dict) -> float:
+    buffer = io.BytesIO()
+    torch.save(state_dict, buffer)
+    return round(buffer.tell() / 1024, 1)
+
+
+def build_int8(model: nn.Module, model_path: str, val_loader: DataLoader, max_accuracy_drop: float) -> dict:
+    """Quantize ``model`` to int8 and keep the build only if validation accuracy drops by at most
+    ``max_accuracy_drop`` percentage points; reports size and per-batch latency against fp32.
+    A failing build (e.g. no quantized engine) is logged and reported as not accepted."""
+    path = artifact_path(model_path, "int8")
+    try:
+        return _gate_int8(model, path, val_loader, max_accuracy_drop)
+    except Exception as exc:
+        path.unlink(missing_ok=True)
+        logger.warning("int8 build failed: %s", exc)
+        return {"accepted": False, "path": None, "error": str(exc)}
+
+
+def _gate_int8(model: nn.Module, path: Path, val_loader: DataLoader, max_accuracy_drop: float) -> dict:
+    quantized = quantize_int8(model)
+    fp32_preds, targets = _predict_classes(model, val_loader)
+    int8_preds, _ = _predict_classes(quantized, val_loader)
+    fp32_acc = float((fp32_preds == targets).mean() * 100)
+    int8_acc = float((int8_preds == targets).mean() * 100)
+    batch = next(iter(val_loader))[0]
+
+    accepted = fp32_acc - int8_acc <= max_accuracy_drop
+    if accepted:
+        torch.save(quantized.state_dict(), path)
+    else:
+        # a stale build from an earlier model must not be served alongside the new one
+        path.unlink(missing_ok=True)
+        logger.warning("int8 build rejected: accuracy %.2f%% vs fp32 %.2f%%", int8_acc, fp32_acc)
+    return {
+        "accepted": accepted,
+        "path": str(path) if accepted else None,
+        "fp32_val_acc": round(fp32_acc, 2),
+        "int8_val_acc": round(int8_acc, 2),
+        "accuracy_drop": round(fp32_acc - int8_acc, 2),
+        "max_accuracy_drop": max_accuracy_drop,
+        "label_agreement_pct": round(float((int8_preds == fp32_preds).mean() * 100), 2),
+        "size_kb": {"fp32": _serialized_kb(model.state_dict()), "int8": _serialized_kb(quantized.state_dict())},
+        "batch_latency_ms": {"batch_size": len(batch), "fp32": _batch_latency_ms(model, batch), "int8": _batch_latency_ms(quantized, batch)},
+    }
+
+
+def streamed_probabilities(model: StreamingLSTMClassifier, series: np.ndarray, window: int, rewarm_bars: int) -> np.ndarray:
+    """Class probabilities for each bar of ``series`` from ``window`` on, as served incrementally.
+
+    Mirrors PredictionService: the committed state covers every bar but the last,
+    warmed from the previous ``window - 1`` bars, then advanced one closed bar at a
+    time and re-warmed every ``rewarm_bars`` steps; the last bar is read with a
+    throwaway step. Row i is the prediction made with bars [.., window + i) available.
+    """
+    inputs = torch.from_numpy(np.ascontiguousarray(series, dtype=np.float32))
+    probs = []
+    steps = 0
+    state = None
+    with torch.no_grad():
+        for end in range(window, len(series) + 1):
+            if state is None or steps >= rewarm_bars:
+                _, state = model.warm(inputs[end - window:end - 1].unsqueeze(0))
+                steps = 0
+            else:
+                _, state = model.step(inputs[end - 2:end - 1], state)
+                steps += 1
+            logits, _ = model.step(inputs[end - 1:end], state)
+            probs.append(torch.softmax(logits, dim=1)[0].numpy())
+    return np.stack(probs)
+
+
+def streaming_report(
+    reference: nn.Module,
+    streaming: StreamingLSTMClassifier,
+    dataset: MarketDataset,
+    val_loader: DataLoader,
+    rewarm_bars: int,
+) -> dict:
+    """Accuracy of the streaming model against the reference on the validation split, plus
+    how closely incremental serving matches full-window inference of the same model."""
+    reference_preds, targets = _predict_classes(reference, val_loader)
+    streaming_preds, _ = _predict_classes(streaming, val_loader)
+
+    # incremental vs full-window on the contiguous training series (windows end at bar idx - 1)
+    window = dataset.sequence_length
+    series = np.concatenate([dataset.features[0], dataset.features[1:, -1]])
+    streamed = streamed_probabilities(streaming, series, window, rewarm_bars)[:len(dataset)]
+    with torch.no_grad():
+        windowed = torch.cat([
+            torch.softmax(streaming(torch.from_numpy(np.ascontiguousarray(dataset.features[i:i + 256]))), dim=1)
+            for i in range(0, len(dataset), 256)
+        ]).numpy()
+
+    return {
+        "val_acc": round(float((streaming_preds == targets).mean() * 100), 2),
+        "reference_val_acc": round(float((reference_preds == targets).mean() * 100), 2),
+        "agreement_with_reference_pct": round(float((streaming_preds == reference_preds).mean() * 100), 2),
+        "rewarm_bars": rewarm_bars,
+        "incremental_vs_window_agreement_pct": round(float((streamed.argmax(1) == windowed.argmax(1)).mean() * 100), 2),
+        "incremental_vs_window_max_prob_diff": round(float(np.abs(streamed - windowed).max()), 4),
+    }
+
+
+def train_model(
+    frame: pd.DataFrame,
+    model_path: str,
+    scaler_path: str,
+    epochs: int = 30,
+    streaming_model_path: str | None = None,
+    rewarm_bars: int = 240,
+    max_int8_accuracy_drop: float = 1.0,
+) -> dict:
+    """Train the LSTM classifier and write its exports and gated int8 build (report under
+    ``"int8"``); with ``streaming_model_path`` also train the streaming variant on the same
+    split and include its parity report under ``"streaming"``."""
+    dataset = MarketDataset(frame)
+
+    if len(dataset) < 100:
+        raise ValueError(f"Not enough samples to train: {len(dataset)}. Need at least 100.")
+
+    # 80/20 train/val split
+    val_size = max(int(len(dataset) * 0.2), 10)
+    train_size = len(dataset) - val_size
+    train_ds, val_ds = random_split(dataset, [train_size, val_size])
+
+    train_loader = DataLoader(train_ds, batch_size=32, shuffle=True)
+    val_loader = DataLoader(val_ds, batch_size=64, shuffle=False)
+    loss_fn = nn.CrossEntropyLoss(weight=dataset.class_weights)
+
+    model = LSTMClassifier(input_size=len(FEATURE_COLUMNS), hidden_size=128, num_layers=2, num_classes=3)
+    best_val_loss, history = _fit(model, train_loader, val_loader, loss_fn, epochs)
+
+    # Save best model
     Path(model_path).parent.mkdir(parents=True, exist_ok=True)
     torch.save(model.state_dict(), model_path)
     joblib.dump(dataset.scaler, scaler_path)
+    artifacts = export_artifacts(model, model_path, len(FEATURE_COLUMNS), dataset.sequence_length)
 
     best_epoch = history[int(np.argmin([h["val_loss"] for h in history]))]
-    return {
+    result = {
         "epochs_trained": len(history),
         "best_val_loss": round(best_val_loss, 4),
         "best_val_acc": best_epoch["val_acc"],
         "samples": len(dataset),
         "history": history[-5:],  # last 5 epochs
+        "artifacts": artifacts,
+        "int8": build_int8(model, model_path, val_loader, max_int8_accuracy_drop),
     }
+
+    if streaming_model_path:
+        streaming = StreamingLSTMClassifier(input_size=len(FEATURE_COLUMNS), hidden_size=128, num_layers=2, num_classes=3)
+        _fit(streaming, train_loader, val_loader, loss_fn, epochs)
+        torch.save(streaming.state_dict(), streaming_model_path)
+        result["streaming"] = streaming_report(model, streaming, dataset, val_loader, rewarm_bars)
+    return result
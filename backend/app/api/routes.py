@@ -13,7 +13,9 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.security import create_access_token, hash_password, verify_password
 from app.db.session import get_db
 from app.schemas.common import (
+    BacktestPortfolioRequest,
     BacktestRequest,
+    BacktestSweepRequest,
     HistoryLoadRequest,
     LoginRequest,
     PredictionResponse,
@@ -23,14 +25,22 @@ from app.schemas.common import (
     TokenResponse,
     UpstoxExchangeRequest,
 )
+from app.services.alerts import get_alert_stats
 from app.services.auto_trader import get_status, start_auto_trader, stop_auto_trader
-from app.services.backtester import Backtester
+from app.services.backtest_sweep import check_sweep_size, expand_grid, run_sweep
+from app.services.backtester import Backtester, StrategyParams
+from app.services.indicator_panel import enrich_panel_async
 from app.services.market_data import MarketDataService
+from app.services.market_stream import get_stream_stats
 from app.services.news_sentiment import COMPANY_NAMES, NewsSentimentService
+from app.services.portfolio_backtester import PortfolioConfig, run_portfolio_backtest_async
 from app.services.predictor import PredictionService
+from app.services.quotes import fetch_quotes, get_quote_cache_stats
 from app.services.stock_scanner import StockScannerService
+from app.services.tick_store import get_tick_store_stats
 from app.services.trading_engine import TradingEngineService
-from app.services.upstox import UpstoxService
+from app.services.upstox import UpstoxService, get_latency_metrics as get_upstox_latency_metrics
+from app.websocket.socket_server import get_fanout_stats
 
 router = APIRouter(prefix="/api/v1")
 
@@ -123,6 +133,11 @@ async def upstox_status(db: AsyncIOMotorDatabase = Depends(get_db)) -> dict:
     }
 
 
+@router.get("/settings/upstox/metrics")
+async def upstox_metrics() -> dict:
+    return {"latency": get_upstox_latency_metrics(), "quote_cache": get_quote_cache_stats(), "ticks": get_tick_store_stats(), "stream": get_stream_stats(), "alerts": get_alert_stats(), "fanout": get_fanout_stats()}
+
+
 @router.get("/settings/upstox/auth-url")
 async def upstox_auth_url() -> dict:
     """Get Upstox authorization URL for re-authentication."""
@@ -143,10 +158,11 @@ async def market_quotes(payload: QuoteRequest, db: AsyncIOMotorDatabase = Depend
     upstox = UpstoxService(db)
     credential = await upstox.get_credential(_user_id(user))
     try:
-        return await upstox.get_quotes(credential.access_token, payload.instrument_keys)
+        quotes = await fetch_quotes(upstox, credential.access_token, payload.instrument_keys)
     except httpx.HTTPStatusError as exc:
         detail = exc.response.text.strip() or str(exc)
         raise HTTPException(status_code=exc.response.status_code, detail=detail) from exc
+    return {"status": "success", "data": quotes}
 
 
 @router.post("/market/history/load")
@@ -166,8 +182,7 @@ async def load_market_history(payload: HistoryLoadRequest, db: AsyncIOMotorDatab
         detail = exc.response.text.strip() or str(exc)
         raise HTTPException(status_code=exc.response.status_code, detail=detail) from exc
     candle_rows = data.get("data", {}).get("candles", [])
-    inserted = await MarketDataService(db).persist_candles(payload.instrument_key, payload.interval, candle_rows)
-    return {"inserted": inserted, "received": len(candle_rows)}
+    return await MarketDataService(db).upsert_candles(payload.instrument_key, payload.interval, candle_rows)
 
 
 @router.get("/market/history/{instrument_key}")
@@ -224,7 +239,12 @@ async def train_model(db: AsyncIOMotorDatabase = Depends(get_db)) -> dict:
     combined = pd.concat(frames, ignore_index=True).sort_values("timestamp").reset_index(drop=True)
     try:
         result = await asyncio.get_event_loop().run_in_executor(
-            None, lambda: _train(combined, settings.model_path, settings.scaler_path, epochs=30)
+            None, lambda: _train(
+                combined, settings.model_path, settings.scaler_path, epochs=30,
+                streaming_model_path=settings.lstm_streaming_model_path if settings.lstm_variant == "streaming" else None,
+                rewarm_bars=settings.lstm_stream_rewarm_bars,
+                max_int8_accuracy_drop=settings.lstm_int8_max_accuracy_drop,
+            )
         )
         return {"status": "trained", **result}
     except Exception as exc:
@@ -241,9 +261,10 @@ async def scan_stocks(
     top_n = payload.get("top_n", 5)
     min_candles = payload.get("min_candles", 100)
     include_sentiment = payload.get("include_sentiment", True)
+    concurrency = payload.get("concurrency")
     
     scanner = StockScannerService(db)
-    top_stocks = await scanner.scan_universe(interval, min_candles, top_n, include_sentiment)
+    top_stocks = await scanner.scan_universe(interval, min_candles, top_n, include_sentiment, concurrency=concurrency)
     
     return {
         "top_stocks": top_stocks,
@@ -251,6 +272,7 @@ async def scan_stocks(
         "interval": interval,
         "total_scanned": len(top_stocks),
         "sentiment_enabled": include_sentiment,
+        "scan_stats": scanner.last_scan_stats,
     }
 
 
@@ -306,10 +328,10 @@ async def prediction_signals(instrument_keys: str | None = None, interval: str =
     keys = [k.strip() for k in instrument_keys.split(",")] if instrument_keys else ALL
     predictor = PredictionService()
     service = MarketDataService(db)
-    results = []
+    frames: dict[str, pd.DataFrame] = {}
     for instrument_key in keys:
-        candles = await service.recent_candles(instrument_key, interval, limit=120)
-        if len(candles) < 30:
+        frame = await service.recent_candles_frame(instrument_key, interval, limit=120)
+        if len(frame) < 30:
             try:
                 user = await get_default_user(db)
                 upstox = UpstoxService(db)
@@ -319,18 +341,18 @@ async def prediction_signals(instrument_keys: str | None = None, interval: str =
                 data = await upstox.get_historical_candles(credential.access_token, instrument_key, interval, today, from_date)
                 rows = data.get("data", {}).get("candles", [])
                 await service.persist_candles(instrument_key, interval, rows)
-                candles = await service.recent_candles(instrument_key, interval, limit=120)
+                frame = await service.recent_candles_frame(instrument_key, interval, limit=120)
             except Exception:
                 continue
-        if len(candles) < 30:
+        if len(frame) < 30:
             continue
-        candle_rows = [
-            [c.timestamp.isoformat(), float(c.open), float(c.high), float(c.low), float(c.close), c.volume, c.oi]
-            for c in candles
-        ]
+        frames[instrument_key] = frame
+    enriched = await enrich_panel_async(list(frames.values()))
+    results = []
+    for prediction in predictor.predict_enriched_many(dict(zip(frames, enriched))).values():
         try:
-            results.append(PredictionResponse(**predictor.predict(instrument_key, candle_rows)))
-        except Exception as e:
+            results.append(PredictionResponse(**prediction))
+        except Exception:
             continue
     return results
 
@@ -804,16 +826,83 @@ async def execute_strategy(strategy_id: str, db: AsyncIOMotorDatabase = Depends(
 
 @router.post("/backtesting/run")
 async def run_backtest(payload: BacktestRequest, db: AsyncIOMotorDatabase = Depends(get_db)) -> dict:
-    candles = await MarketDataService(db).recent_candles(payload.instrument_key, payload.interval, limit=2000)
-    frame = pd.DataFrame([
-        {"timestamp": c.timestamp, "open": float(c.open), "high": float(c.high), "low": float(c.low), "close": float(c.close), "volume": c.volume}
-        for c in candles
-    ])
+    frame = await MarketDataService(db).recent_candles_frame(payload.instrument_key, payload.interval, limit=None)
     if frame.empty:
         raise HTTPException(status_code=400, detail="No historical data loaded for this instrument")
     return Backtester().run(frame, payload.starting_capital)
 
 
+@router.post("/backtesting/sweep")
+async def run_backtest_sweep(payload: BacktestSweepRequest, db: AsyncIOMotorDatabase = Depends(get_db)) -> dict:
+    grid = expand_grid({
+        "rsi_buy": payload.rsi_buy,
+        "rsi_sell": payload.rsi_sell,
+        "macd_fast": payload.macd_fast,
+        "macd_slow": payload.macd_slow,
+        "macd_signal": payload.macd_signal,
+        "atr_stop_multiplier": payload.atr_stop_multiplier,
+    })
+    try:
+        # reject oversized sweeps before any history is read from Mongo
+        check_sweep_size(len(grid), len(payload.instrument_keys))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    svc = MarketDataService(db)
+    loaded = await asyncio.gather(*(
+        svc.recent_candles_frame(key, payload.interval, limit=None) for key in payload.instrument_keys
+    ))
+    frames = {key: frame for key, frame in zip(payload.instrument_keys, loaded) if not frame.empty}
+    if not frames:
+        raise HTTPException(status_code=400, detail="No historical data loaded for these instruments")
+    started = datetime.now(timezone.utc)
+    try:
+        results = await run_sweep(frames, grid, payload.starting_capital)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {
+        "instruments": list(frames),
+        "skipped": [key for key in payload.instrument_keys if key not in frames],
+        "parameter_sets": len(grid),
+        "runs": len(results),
+        "elapsed_ms": round((datetime.now(timezone.utc) - started).total_seconds() * 1000, 1),
+        "results": results[:payload.top_n],
+    }
+
+
+@router.post("/backtesting/portfolio")
+async def run_portfolio_backtest(payload: BacktestPortfolioRequest, db: AsyncIOMotorDatabase = Depends(get_db)) -> dict:
+    from app.models.watchlist import INTRADAY_UNIVERSE
+    keys = payload.instrument_keys or INTRADAY_UNIVERSE
+    svc = MarketDataService(db)
+    loaded = await asyncio.gather(*(
+        svc.recent_candles_frame(key, payload.interval, limit=None, from_date=payload.from_date, to_date=payload.to_date)
+        for key in keys
+    ))
+    frames = dict(zip(keys, loaded))
+    config = PortfolioConfig(
+        strategy=StrategyParams(
+            rsi_buy=payload.rsi_buy,
+            rsi_sell=payload.rsi_sell,
+            atr_stop_multiplier=payload.atr_stop_multiplier,
+        ),
+        max_positions=payload.max_positions,
+        stop_loss_pct=payload.stop_loss_pct,
+        profit_target_pct=payload.profit_target_pct,
+        trailing_stop_enabled=payload.trailing_stop_enabled,
+        daily_loss_limit=payload.daily_loss_limit,
+        max_trades_per_day=payload.max_trades_per_day,
+        risk_per_trade_pct=payload.risk_per_trade_pct,
+    )
+    try:
+        result = await run_portfolio_backtest_async(frames, payload.starting_capital, config)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not payload.include_equity_curve:
+        result.pop("equity_curve", None)
+    result["skipped"] = [key for key, frame in frames.items() if frame.empty]
+    return result
+
+
 @router.get("/news")
 async def market_news(q: str = "NSE stock market India") -> dict:
     from app.core.config import get_settings
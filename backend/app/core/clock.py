@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+_simulated_now: ContextVar[datetime | None] = ContextVar("simulated_now", default=None)
+
+
+def utcnow() -> datetime:
+    """Current UTC time, or the simulated time while a replay is driving the clock."""
+    return _simulated_now.get() or datetime.now(timezone.utc)
+
+
+def simulated_now() -> datetime | None:
+    """The simulated time if a replay set one, else None (live trading)."""
+    return _simulated_now.get()
+
+
+def set_simulated_now(moment: datetime | None) -> None:
+    """Pin utcnow() to ``moment`` for the current context; ``None`` returns to wall-clock time."""
+    _simulated_now.set(moment)
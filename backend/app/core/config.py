@@ -37,16 +37,49 @@ class Settings(BaseSettings):
     upstox_api_base_url: str = "https://api.upstox.com"
     upstox_hft_base_url: str = "https://api-hft.upstox.com"
     upstox_market_feed_authorize_url: str = "https://api.upstox.com/v3/feed/market-data-feed/authorize"
+    upstox_http2: bool = False  # needs the optional 'h2' package
+    upstox_max_connections: int = 20
+    upstox_max_keepalive_connections: int = 10
+    upstox_keepalive_expiry_seconds: float = 30.0
+    upstox_quote_batch_size: int = 500
+    upstox_quote_cache_ttl_ms: int = 300  # 0 disables the quote cache
+    market_stream_enabled: bool = False  # stream the traders' instruments into the tick store
+    market_stream_default_instruments: str = ""  # comma-separated keys always streamed; traders add their own at runtime
+    tick_store_max_age_ms: int = 2000
+    market_stream_frame_queue: int = 1000  # raw frames buffered ahead of decoding; oldest dropped beyond
+    market_stream_queue_instruments: int = 2000  # instruments waiting to be published; newer ticks conflate
+    market_stream_backoff_base_seconds: float = 1.0
+    market_stream_backoff_max_seconds: float = 60.0
+    market_feed_decoder_workers: int = 0  # >0 decodes feed frames in a process pool
+    stream_bars_enabled: bool = True  # build 1m/5m candles from streamed ticks
+    stream_bar_flush_seconds: float = 2.0
 
     socket_io_redis_channel: str = "benx:stream"
+    socket_conflation_ms: int = 250  # market.tick fan-out window; newest tick per instrument wins
+    alert_queue_max: int = 10000  # queued events (and pending instruments for ticks); oldest dropped beyond
+    alert_publish_batch_size: int = 200  # messages per Redis pipeline
     model_path: str = "./artifacts/lstm_latest.pt"
     scaler_path: str = "./artifacts/feature_scaler.pkl"
+    lstm_runtime: str = "eager"  # eager | torchscript | onnx | int8 (artifacts are exported at train time)
+    lstm_int8_max_accuracy_drop: float = 1.0  # validation accuracy points the int8 build may lose
+    lstm_variant: str = "bidirectional"  # or "streaming": unidirectional LSTM with cached per-instrument state
+    lstm_streaming_model_path: str = "./artifacts/lstm_streaming.pt"
+    lstm_stream_rewarm_bars: int = 240  # re-read the 60-bar window after this many incremental steps
     news_api_key: str = ""
 
+    scanner_concurrency: int = 8
+    scanner_symbol_timeout_seconds: float = 15.0
+    indicator_workers: int = 2
+    backtest_sweep_max_runs: int = 20000
+
     @property
     def cors_origins(self) -> List[str]:
         return [origin.strip() for origin in self.backend_cors_origins.split(",") if origin.strip()]
 
+    @property
+    def market_stream_default_keys(self) -> List[str]:
+        return [key.strip() for key in self.market_stream_default_instruments.split(",") if key.strip()]
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -3,7 +3,13 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import router
 from app.core.config import get_settings
+from app.db.session import get_db
+from app.services.alerts import close_alert_publisher
 from app.services.auto_trader import start_auto_trader
+from app.services.indicators import shutdown_indicator_executor
+from app.services.market_data import MarketDataService
+from app.services.market_stream import start_market_stream, stop_market_stream
+from app.services.upstox import close_http_client
 from app.websocket.socket_server import create_redis_listener_task, socket_app
 
 settings = get_settings()
@@ -28,5 +34,16 @@ def health() -> dict:
 
 @app.on_event("startup")
 async def startup_event() -> None:
+    await MarketDataService(await get_db()).ensure_indexes()
     create_redis_listener_task()
     start_auto_trader(interval_seconds=60)
+    if settings.market_stream_enabled:
+        start_market_stream()
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    stop_market_stream()
+    shutdown_indicator_executor()
+    await close_http_client()
+    await close_alert_publisher()
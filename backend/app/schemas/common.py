@@ -70,3 +70,35 @@ class BacktestRequest(BaseModel):
     starting_capital: float
     strategy_id: int
 
+
+
+class BacktestSweepRequest(BaseModel):
+    instrument_keys: list[str]
+    interval: str = "day"
+    starting_capital: float
+    rsi_buy: list[float] = [35.0]
+    rsi_sell: list[float] = [65.0]
+    macd_fast: list[int] = [12]
+    macd_slow: list[int] = [26]
+    macd_signal: list[int] = [9]
+    atr_stop_multiplier: list[float] = [0.0]
+    top_n: int = 50
+
+
+class BacktestPortfolioRequest(BaseModel):
+    instrument_keys: list[str] | None = None  # defaults to INTRADAY_UNIVERSE
+    interval: str = "5minute"
+    starting_capital: float
+    from_date: datetime | None = None
+    to_date: datetime | None = None
+    rsi_buy: float = 35.0
+    rsi_sell: float = 65.0
+    atr_stop_multiplier: float = 0.0
+    max_positions: int = 3
+    stop_loss_pct: float = 0.75
+    profit_target_pct: float = 1.5
+    trailing_stop_enabled: bool = True
+    daily_loss_limit: float = 2000.0
+    max_trades_per_day: int = 10
+    risk_per_trade_pct: float = 1.0
+    include_equity_curve: bool = True
@@ -1,25 +1,147 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+from collections import deque
+from itertools import islice
+from typing import Any
 
-from redis import Redis
+from redis.asyncio import Redis
 
 from app.core.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+_publisher: _AlertPublisher | None = None
+# Ticks per coalesced market.tick message.
+TICK_BATCH = 500
+
+
+class _AlertPublisher:
+    """Non-blocking Redis publisher shared by every AlertService on one event loop.
+
+    publish() only queues; a background task sends queued messages in pipelined
+    batches, so callers never wait on a Redis round trip. Batched ``market.tick``
+    payloads are coalesced to the latest tick per instrument until the next
+    flush. When the queue is full the oldest message is dropped (counted).
+    """
+
+    def __init__(self, redis_url: str, channel: str, max_queue: int, batch_size: int) -> None:
+        self.redis = Redis.from_url(redis_url)
+        self.channel = channel
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.loop = asyncio.get_running_loop()
+        self._queue: deque[tuple[str, dict]] = deque()
+        self._ticks: dict[str, dict] = {}
+        self._wake = asyncio.Event()
+        self.stats = {"queued": 0, "published": 0, "batches": 0, "coalesced": 0, "dropped": 0, "errors": 0}
+        self._task = self.loop.create_task(self._run())
+
+    def publish(self, event: str, payload: dict) -> None:
+        ticks = payload.get("ticks") if event == "market.tick" else None
+        if isinstance(ticks, list):
+            for tick in ticks:
+                key = tick.get("instrument_key")
+                if key in self._ticks:
+                    self.stats["coalesced"] += 1
+                elif len(self._ticks) >= self.max_queue:
+                    self.stats["dropped"] += 1
+                    continue
+                else:
+                    self.stats["queued"] += 1
+                self._ticks[key] = tick
+        else:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.stats["dropped"] += 1
+            self._queue.append((event, payload))
+            self.stats["queued"] += 1
+        self._wake.set()
+
+    def _take(self) -> list[str]:
+        """Encode up to one batch: queued events first, then pending ticks in TICK_BATCH chunks."""
+        messages = [
+            json.dumps({"event": event, "payload": payload})
+            for event, payload in (self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue))))
+        ]
+        while self._ticks and len(messages) < self.batch_size:
+            keys = list(islice(self._ticks, TICK_BATCH))
+            ticks = [self._ticks.pop(key) for key in keys]
+            messages.append(json.dumps({"event": "market.tick", "payload": {"ticks": ticks}}))
+        return messages
+
+    async def _send(self, messages: list[str]) -> None:
+        pipeline = self.redis.pipeline(transaction=False)
+        for message in messages:
+            pipeline.publish(self.channel, message)
+        await pipeline.execute()
+        self.stats["published"] += len(messages)
+        self.stats["batches"] += 1
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._queue or self._ticks:
+                messages = self._take()
+                try:
+                    await self._send(messages)
+                except Exception as exc:
+                    self.stats["errors"] += 1
+                    self.stats["dropped"] += len(messages)
+                    logger.warning("Redis publish of %d messages failed: %s", len(messages), exc)
+                    await asyncio.sleep(1.0)
+
+    async def close(self) -> None:
+        """Stop the flush task, send what is still queued, and close the connection."""
+        self._task.cancel()
+        try:
+            while self._queue or self._ticks:
+                await self._send(self._take())
+        except Exception as exc:
+            logger.warning("Dropping queued alerts on shutdown: %s", exc)
+        await self.redis.aclose()
+
+    def get_stats(self) -> dict[str, Any]:
+        return {**self.stats, "queue_depth": len(self._queue), "pending_ticks": len(self._ticks)}
+
+
+def _get_publisher() -> _AlertPublisher:
+    global _publisher
+    loop = asyncio.get_running_loop()
+    if _publisher is None or _publisher.loop is not loop or loop.is_closed():
+        settings = get_settings()
+        _publisher = _AlertPublisher(
+            settings.redis_url, settings.socket_io_redis_channel,
+            settings.alert_queue_max, settings.alert_publish_batch_size,
+        )
+    return _publisher
+
+
+def get_alert_stats() -> dict[str, Any] | None:
+    return _publisher.get_stats() if _publisher is not None else None
+
+
+async def close_alert_publisher() -> None:
+    global _publisher
+    if _publisher is not None:
+        publisher, _publisher = _publisher, None
+        await publisher.close()
+
 
 class AlertService:
     def __init__(self) -> None:
-        settings = get_settings()
-        self.redis = Redis.from_url(settings.redis_url) if settings.redis_url else None
-        self.channel = settings.socket_io_redis_channel
+        self.enabled = bool(get_settings().redis_url)
 
     def publish(self, event: str, payload: dict) -> None:
-        if self.redis is None:
+        """Queue an event for the socket.io relay; returns immediately (must be called on the event loop)."""
+        if not self.enabled:
             return
         try:
-            self.redis.publish(self.channel, json.dumps({"event": event, "payload": payload}))
-        except Exception:
-            logger.warning("Redis publish failed for event %s", event)
+            publisher = _get_publisher()
+        except RuntimeError:
+            logger.warning("Alert %s published outside the event loop; dropped", event)
+            return
+        publisher.publish(event, payload)
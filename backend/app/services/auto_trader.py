@@ -2,15 +2,15 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import datetime, timezone
 from typing import Any
 
-import pandas as pd
-
+from app.core.clock import utcnow
 from app.core.config import get_settings
 from app.db.session import get_client
 from app.services.alerts import AlertService
-from app.services.indicators import add_technical_indicators
+from app.services.indicator_state import IndicatorState, sync_indicator_state
+from app.services.market_stream import set_stream_interest
+from app.services.quotes import fetch_quotes
 from app.services.stock_scanner import StockScannerService
 from app.services.upstox import UpstoxService
 
@@ -67,7 +67,7 @@ LABEL = {
 
 def _log(msg: str) -> None:
     logger.info(msg)
-    _status["log"] = ([{"t": datetime.now(timezone.utc).strftime("%H:%M:%S"), "msg": msg}] + _status["log"])[:20]
+    _status["log"] = ([{"t": utcnow().strftime("%H:%M:%S"), "msg": msg}] + _status["log"])[:20]
 
 
 def _db():
@@ -75,23 +75,21 @@ def _db():
     return get_client()[settings.mongodb_db]
 
 
-def _score_stock(quote: dict, candles: list[dict]) -> float:
+def _score_stock(quote: dict, state: IndicatorState) -> float:
     """
     Score a stock 0-100 for trading opportunity.
     Higher = better candidate to trade right now.
     Uses: RSI, MACD crossover, momentum, volume surge, Bollinger position.
     """
     last = float(quote.get("last_price", 0))
-    if last == 0 or len(candles) < 30:
+    if last == 0 or state.bars < 30:
         return 0.0
 
     try:
-        df = pd.DataFrame(candles)
-        df = add_technical_indicators(df)
-        if df.empty:
+        if not state.ready:
             return 0.0
 
-        row = df.iloc[-1]
+        row = state.values()
         score = 0.0
 
         # RSI: best between 40-60 (active momentum, not overbought/oversold)
@@ -136,17 +134,15 @@ def _score_stock(quote: dict, candles: list[dict]) -> float:
         return 0.0
 
 
-def _trade_signal(quote: dict, candles: list[dict]) -> str | None:
+def _trade_signal(quote: dict, state: IndicatorState) -> str | None:
     """BUY / SELL / None based on indicators."""
     last = float(quote.get("last_price", 0))
-    if last == 0 or len(candles) < 30:
+    if last == 0 or state.bars < 30:
         return None
     try:
-        df = pd.DataFrame(candles)
-        df = add_technical_indicators(df)
-        if df.empty:
+        if not state.ready:
             return None
-        row = df.iloc[-1]
+        row = state.values()
         rsi = float(row.get("rsi_14", 50))
         macd = float(row.get("macd", 0))
         macd_sig = float(row.get("macd_signal", 0))
@@ -164,31 +160,27 @@ def _trade_signal(quote: dict, candles: list[dict]) -> str | None:
         return None
 
 
-async def _fetch_candles_for_scoring(upstox: UpstoxService, credential: Any, instrument_key: str, interval: str = "day") -> list[dict]:
-    """Fetch stored candles or load from Upstox for scoring."""
+async def _indicator_state_for_scoring(upstox: UpstoxService, credential: Any, instrument_key: str, interval: str = "day") -> IndicatorState:
+    """Incremental indicators from stored candles, loading from Upstox when history is short."""
     from app.services.market_data import MarketDataService
-    db = _db()
-    svc = MarketDataService(db)
-    candles = await svc.recent_candles(instrument_key, interval, limit=60)
-    if len(candles) < 30:
+    svc = MarketDataService(upstox.db)
+    state = await sync_indicator_state(svc, instrument_key, interval)
+    if state.bars < 30:
         try:
-            today = datetime.now(timezone.utc).date().isoformat()
+            now = utcnow()
+            today = now.date().isoformat()
             if interval == "day":
-                from_date = datetime.now(timezone.utc).replace(year=datetime.now().year - 1).date().isoformat()
+                from_date = now.replace(year=now.year - 1).date().isoformat()
             else:
                 # For intraday, only fetch today's data
                 from_date = today
             data = await upstox.get_historical_candles(credential.access_token, instrument_key, interval, today, from_date)
             rows = data.get("data", {}).get("candles", [])
-            await svc.persist_candles(instrument_key, interval, rows)
-            candles = await svc.recent_candles(instrument_key, interval, limit=60)
+            await svc.upsert_candles(instrument_key, interval, rows)
+            state = await sync_indicator_state(svc, instrument_key, interval, reseed=True)
         except Exception as e:
             logger.warning("Could not load candles for %s: %s", instrument_key, e)
-    return [
-        {"open": float(c.open), "high": float(c.high), "low": float(c.low),
-         "close": float(c.close), "volume": c.volume}
-        for c in candles
-    ]
+    return state
 
 
 async def _place_order(upstox: UpstoxService, credential: Any, instrument_key: str,
@@ -267,7 +259,7 @@ async def _run_cycle(db, state: dict) -> None:
     await _calculate_performance_metrics(db, user_id)
     
     # --- Check daily loss limit ---
-    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    today = utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     today_trades = await db["trades"].find({"user_id": user_id, "created_at": {"$gte": today}}).to_list(length=10000)
     today_pnl = sum(float(t.get("pnl") or 0) for t in today_trades)
     _status["today_pnl"] = today_pnl
@@ -288,15 +280,15 @@ async def _run_cycle(db, state: dict) -> None:
 
     # --- Check existing open positions: manage them ---
     open_positions = await db["positions"].find({"user_id": user_id, "quantity": {"$ne": 0}}).to_list(length=100)
+    position_quotes = await fetch_quotes(upstox, credential.access_token, [p["instrument_key"] for p in open_positions])
     
     for open_pos in open_positions:
         instrument_key = open_pos["instrument_key"]
         entry_price = float(open_pos.get("average_price", 0))
         qty = int(open_pos.get("quantity", 0))
 
-        # Fetch current price
-        quotes_resp = await upstox.get_quotes(credential.access_token, [instrument_key])
-        quote = (quotes_resp.get("data") or {}).get(instrument_key) or {}
+        # Current price
+        quote = position_quotes.get(instrument_key) or {}
         current_price = float(quote.get("last_price") or entry_price)
 
         if entry_price > 0 and qty != 0:
@@ -366,11 +358,11 @@ async def _run_cycle(db, state: dict) -> None:
                         "status": resp.get("status", "submitted"),
                         "upstox_order_id": resp.get("data", {}).get("order_id"),
                         "pnl": pnl_abs, "metadata_json": resp.get("_payload"),
-                        "created_at": datetime.now(timezone.utc),
+                        "created_at": utcnow(),
                     })
                     await db["positions"].update_one(
                         {"user_id": user_id, "instrument_key": instrument_key},
-                        {"$set": {"quantity": 0, "last_price": current_price, "updated_at": datetime.now(timezone.utc)}},
+                        {"$set": {"quantity": 0, "last_price": current_price, "updated_at": utcnow()}},
                     )
                     # Clear trailing stop for this position
                     position_key = f"{user_id}_{instrument_key}"
@@ -404,19 +396,22 @@ async def _run_cycle(db, state: dict) -> None:
     except Exception as exc:
         _log(f"Scanner failed: {exc}. Falling back to watchlist.")
         top_stocks = []
+    await set_stream_interest("auto_trader", [stock["symbol"] for stock in top_stocks] + [p["instrument_key"] for p in open_positions])
 
     # If scanner returns results, use them; otherwise fall back to old logic
     if top_stocks:
         # Pick the top stock with BUY or SELL signal
         chosen = None
+        candidate_quotes = await fetch_quotes(
+            upstox, credential.access_token,
+            [stock["symbol"] for stock in top_stocks if stock["ml_signal"] in ["BUY", "SELL"]],
+        )
         for stock in top_stocks:
             instrument_key = stock["symbol"]
             ml_signal = stock["ml_signal"]
             
             if ml_signal in ["BUY", "SELL"]:
-                # Fetch current price
-                quotes_resp = await upstox.get_quotes(credential.access_token, [instrument_key])
-                quote = (quotes_resp.get("data") or {}).get(instrument_key) or {}
+                quote = candidate_quotes.get(instrument_key) or {}
                 last_price = float(quote.get("last_price") or 0)
                 
                 if last_price > 0 and last_price <= capital * 0.5:
@@ -452,13 +447,13 @@ async def _run_cycle(db, state: dict) -> None:
                     "status": resp.get("status", "submitted"),
                     "upstox_order_id": resp.get("data", {}).get("order_id"),
                     "pnl": None, "metadata_json": resp.get("_payload"),
-                    "created_at": datetime.now(timezone.utc),
+                    "created_at": utcnow(),
                 })
                 signed_qty = quantity if signal == "BUY" else -quantity
                 await db["positions"].update_one(
                     {"user_id": user_id, "instrument_key": instrument_key},
                     {"$set": {"quantity": signed_qty, "average_price": last_price,
-                              "last_price": last_price, "updated_at": datetime.now(timezone.utc)}},
+                              "last_price": last_price, "updated_at": utcnow()}},
                     upsert=True,
                 )
                 _status["active_position"] = {"instrument": label, "entry": last_price, "current": last_price,
@@ -474,8 +469,7 @@ async def _run_cycle(db, state: dict) -> None:
     # Fallback to old watchlist logic if scanner didn't find anything
     _log("No scanner results. Using watchlist fallback...")
 
-    quotes_resp = await upstox.get_quotes(credential.access_token, WATCHLIST)
-    quotes: dict = quotes_resp.get("data") or {}
+    quotes = await fetch_quotes(upstox, credential.access_token, WATCHLIST)
 
     scores: list[tuple[str, float, str | None, float]] = []
     for instrument_key in WATCHLIST:
@@ -486,9 +480,9 @@ async def _run_cycle(db, state: dict) -> None:
         # Only trade stocks we can afford at least 1 share with 10% of capital
         if last_price > capital * 0.5:
             continue
-        candles = await _fetch_candles_for_scoring(upstox, credential, instrument_key)
-        score = _score_stock(quote, candles)
-        signal = _trade_signal(quote, candles)
+        ind_state = await _indicator_state_for_scoring(upstox, credential, instrument_key)
+        score = _score_stock(quote, ind_state)
+        signal = _trade_signal(quote, ind_state)
         scores.append((instrument_key, score, signal, last_price))
         _log(f"  {LABEL.get(instrument_key, instrument_key)}: score={score:.1f} signal={signal}")
 
@@ -526,13 +520,13 @@ async def _run_cycle(db, state: dict) -> None:
             "status": resp.get("status", "submitted"),
             "upstox_order_id": resp.get("data", {}).get("order_id"),
             "pnl": None, "metadata_json": resp.get("_payload"),
-            "created_at": datetime.now(timezone.utc),
+            "created_at": utcnow(),
         })
         signed_qty = quantity if signal == "BUY" else -quantity
         await db["positions"].update_one(
             {"user_id": user_id, "instrument_key": instrument_key},
             {"$set": {"quantity": signed_qty, "average_price": last_price,
-                      "last_price": last_price, "updated_at": datetime.now(timezone.utc)}},
+                      "last_price": last_price, "updated_at": utcnow()}},
             upsert=True,
         )
         _status["active_position"] = {"instrument": label, "entry": last_price, "current": last_price,
@@ -557,7 +551,7 @@ async def _loop(interval_seconds: int = 30) -> None:
                 continue
             await _run_cycle(db, state)
             _status["cycles"] += 1
-            _status["last_cycle"] = datetime.now(timezone.utc).isoformat()
+            _status["last_cycle"] = utcnow().isoformat()
             _status["last_error"] = None
         except Exception as exc:
             _status["last_error"] = str(exc)
@@ -7,16 +7,18 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import datetime, timezone
 from typing import Any
 from decimal import Decimal
 
 import pandas as pd
 
+from app.core.clock import utcnow
 from app.core.config import get_settings
 from app.db.session import get_client
 from app.services.alerts import AlertService
-from app.services.indicators import add_technical_indicators
+from app.services.indicators import add_technical_indicators_async
+from app.services.market_stream import set_stream_interest
+from app.services.quotes import fetch_quotes
 from app.services.stock_scanner import StockScannerService
 from app.services.upstox import UpstoxService
 
@@ -55,8 +57,8 @@ def _log(msg: str, level: str = "INFO") -> None:
     """Add log entry with timestamp and level."""
     logger.info(msg)
     entry = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "time": datetime.now(timezone.utc).strftime("%H:%M:%S"),
+        "timestamp": utcnow().isoformat(),
+        "time": utcnow().strftime("%H:%M:%S"),
         "level": level,
         "message": msg
     }
@@ -66,8 +68,8 @@ def _log(msg: str, level: str = "INFO") -> None:
 def _log_decision(decision_type: str, stock: str, details: dict) -> None:
     """Log detailed decision with reasoning for educational purposes."""
     entry = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "time": datetime.now(timezone.utc).strftime("%H:%M:%S"),
+        "timestamp": utcnow().isoformat(),
+        "time": utcnow().strftime("%H:%M:%S"),
         "type": decision_type,
         "stock": stock,
         "details": details
@@ -83,7 +85,7 @@ def _db():
 async def _analyze_stock_comprehensive(
     instrument_key: str,
     quote: dict,
-    candles: list[dict],
+    candles: pd.DataFrame,
     capital: float
 ) -> dict:
     """
@@ -111,8 +113,7 @@ async def _analyze_stock_comprehensive(
         }
     
     try:
-        df = pd.DataFrame(candles)
-        df = add_technical_indicators(df)
+        df = await add_technical_indicators_async(candles)
         if df.empty:
             return {"instrument_key": instrument_key, "label": label, "viable": False, "reason": "Technical indicators failed"}
         
@@ -356,11 +357,11 @@ async def _save_decision_history(db, user_id: str, decision: dict) -> None:
     """Save decision to database for historical tracking."""
     await db["trading_decisions"].insert_one({
         "user_id": user_id,
-        "timestamp": datetime.now(timezone.utc),
+        "timestamp": utcnow(),
         "decision_type": decision["type"],
         "stock": decision.get("stock"),
         "details": decision.get("details", {}),
-        "created_at": datetime.now(timezone.utc)
+        "created_at": utcnow()
     })
 
 
@@ -377,7 +378,8 @@ async def _calculate_performance_metrics(db, user_id: str) -> dict:
             "win_rate": 0,
             "profit_factor": 0,
             "sharpe_ratio": 0,
-            "max_drawdown": 0
+            "max_drawdown": 0,
+            "total_pnl": 0
         }
     
     wins = [float(t["pnl"]) for t in trades if float(t.get("pnl", 0)) > 0]
@@ -461,31 +463,30 @@ async def _run_professional_cycle(db, state: dict) -> None:
     except Exception as e:
         _log(f"Scanner failed: {e}", "ERROR")
         scan_results = []
+    await set_stream_interest("auto_trader_professional", [stock["symbol"] for stock in scan_results])
     
+    # Quotes for every candidate in one batched call
+    try:
+        quotes = await fetch_quotes(upstox, credential.access_token, [stock["symbol"] for stock in scan_results])
+    except Exception as e:
+        _log(f"Quote fetch failed: {e}", "ERROR")
+        quotes = {}
+
     # Analyze each stock in detail
     detailed_analyses = []
     for stock in scan_results:
         instrument_key = stock["symbol"]
-        
-        # Get quote
-        try:
-            quotes_resp = await upstox.get_quotes(credential.access_token, [instrument_key])
-            quote = (quotes_resp.get("data") or {}).get(instrument_key) or {}
-        except:
+        quote = quotes.get(instrument_key)
+        if quote is None:
             continue
         
         # Get candles
         from app.services.market_data import MarketDataService
         svc = MarketDataService(db)
-        candles = await svc.recent_candles(instrument_key, "5minute", limit=60)
-        candle_dicts = [
-            {"open": float(c.open), "high": float(c.high), "low": float(c.low),
-             "close": float(c.close), "volume": c.volume}
-            for c in candles
-        ]
+        candles = await svc.recent_candles_frame(instrument_key, "5minute", limit=60)
         
         # Comprehensive analysis
-        analysis = await _analyze_stock_comprehensive(instrument_key, quote, candle_dicts, capital)
+        analysis = await _analyze_stock_comprehensive(instrument_key, quote, candles, capital)
         if analysis["viable"]:
             detailed_analyses.append(analysis)
     
@@ -561,7 +562,7 @@ async def _loop_professional(interval_seconds: int = 60) -> None:
             
             await _run_professional_cycle(db, state)
             _status["cycles"] += 1
-            _status["last_cycle"] = datetime.now(timezone.utc).isoformat()
+            _status["last_cycle"] = utcnow().isoformat()
             _status["last_error"] = None
         except Exception as exc:
             _status["last_error"] = str(exc)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+from dataclasses import asdict, fields
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import get_settings
+from app.services.backtester import StrategyParams, indicator_arrays, performance_metrics, run_strategy
+from app.services.indicators import get_indicator_executor
+
+logger = logging.getLogger(__name__)
+
+PARAM_FIELDS = tuple(field.name for field in fields(StrategyParams))
+# The indicator_arrays entries run_strategy reads; only these cross the process boundary.
+STRATEGY_ARRAYS = ("complete", "open", "low", "close", "raw_close", "rsi_14", "atr_14", "macd", "macd_signal")
+
+
+def expand_grid(ranges: dict[str, list]) -> list[StrategyParams]:
+    """Cartesian product of parameter ranges, skipping inverted RSI bands and MACD periods.
+
+    Fields missing from ``ranges`` keep their StrategyParams default.
+    """
+    defaults = StrategyParams()
+    values = [ranges.get(name) or [getattr(defaults, name)] for name in PARAM_FIELDS]
+    grid = []
+    for combo in itertools.product(*values):
+        params = StrategyParams(**dict(zip(PARAM_FIELDS, combo)))
+        if params.rsi_buy >= params.rsi_sell or params.macd_fast >= params.macd_slow:
+            continue
+        grid.append(params)
+    return grid
+
+
+def strategy_arrays(frame: pd.DataFrame) -> dict[str, np.ndarray]:
+    """indicator_arrays trimmed to what run_strategy reads, so pool workers send back a fraction of it."""
+    arrays = indicator_arrays(frame)
+    return {name: arrays[name] for name in STRATEGY_ARRAYS}
+
+
+def check_sweep_size(parameter_sets: int, symbols: int) -> None:
+    """Raise ValueError if the sweep exceeds backtest_sweep_max_runs."""
+    limit = get_settings().backtest_sweep_max_runs
+    if parameter_sets * symbols > limit:
+        raise ValueError(f"Sweep has {parameter_sets * symbols} runs, limit is {limit}")
+
+
+def evaluate_grid(
+    instrument_key: str,
+    arrays: dict[str, np.ndarray],
+    grid: list[StrategyParams],
+    capital: float,
+) -> list[dict]:
+    """Backtest every parameter set on one symbol's precomputed indicators."""
+    macd_cache: dict = {}
+    rows = []
+    for params in grid:
+        equity_curve, trades, wins = run_strategy(arrays, params, capital, macd_cache)
+        metrics = performance_metrics(equity_curve, capital, trades, wins, include_curve=False)
+        rows.append({"instrument_key": instrument_key, **asdict(params), **metrics})
+    return rows
+
+
+def rank_results(rows: list[dict]) -> list[dict]:
+    """Best Sharpe first, then shallower drawdown, then more trades."""
+    ranked = sorted(rows, key=lambda row: (-row["sharpe_ratio"], row["max_drawdown_pct"], -row["trades"]))
+    for rank, row in enumerate(ranked, start=1):
+        row["rank"] = rank
+    return ranked
+
+
+def _chunks(grid: list[StrategyParams], count: int) -> list[list[StrategyParams]]:
+    size = max(1, -(-len(grid) // max(1, count)))
+    return [grid[start:start + size] for start in range(0, len(grid), size)]
+
+
+async def run_sweep(frames: dict[str, pd.DataFrame], grid: list[StrategyParams], capital: float) -> list[dict]:
+    """Evaluate ``grid`` on every frame and return the ranked results table.
+
+    Indicators are computed once per symbol; the grid is then split across the
+    indicator process pool so each worker reuses one symbol's arrays for many
+    parameter sets. Only the STRATEGY_ARRAYS are shipped between processes.
+    """
+    settings = get_settings()
+    check_sweep_size(len(grid), len(frames))
+    if not grid or not frames:
+        return []
+
+    executor = get_indicator_executor()
+    if executor is None:
+        rows = []
+        for instrument_key, frame in frames.items():
+            rows.extend(evaluate_grid(instrument_key, indicator_arrays(frame), grid, capital))
+        return rank_results(rows)
+
+    loop = asyncio.get_running_loop()
+    keys = list(frames)
+    arrays = await asyncio.gather(*(loop.run_in_executor(executor, strategy_arrays, frames[key]) for key in keys))
+    jobs = [
+        loop.run_in_executor(executor, evaluate_grid, key, symbol_arrays, chunk, capital)
+        for key, symbol_arrays in zip(keys, arrays)
+        for chunk in _chunks(grid, settings.indicator_workers)
+    ]
+    rows = [row for chunk_rows in await asyncio.gather(*jobs) for row in chunk_rows]
+    logger.info("Backtest sweep: %d symbols x %d parameter sets", len(keys), len(grid))
+    return rank_results(rows)
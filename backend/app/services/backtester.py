@@ -1,47 +1,189 @@
 from __future__ import annotations
 
 import math
+from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
 
-from app.services.indicators import add_technical_indicators
+from app.services.indicator_panel import build_price_panel, compute_indicator_panel
+
+
+@dataclass(frozen=True)
+class StrategyParams:
+    """RSI + MACD crossover rules; the defaults are the original hard-coded strategy."""
+
+    rsi_buy: float = 35.0
+    rsi_sell: float = 65.0
+    macd_fast: int = 12
+    macd_slow: int = 26
+    macd_signal: int = 9
+    atr_stop_multiplier: float = 0.0  # 0 disables the stop
+
+
+DEFAULT_PARAMS = StrategyParams()
+
+
+def indicator_arrays(frame: pd.DataFrame) -> dict[str, np.ndarray]:
+    """add_technical_indicators columns for ``frame`` as 1-D arrays, plus the mask of rows it keeps.
+
+    Compute this once per symbol and reuse it for every parameter set.
+    """
+    panel = build_price_panel([frame])
+    indicators = compute_indicator_panel(panel["open"], panel["high"], panel["low"], panel["close"], panel["volume"])
+    arrays = {name: values[0] for name, values in indicators.items()}
+    arrays["complete"] = ~np.isnan(arrays["close"])
+    arrays["raw_close"] = panel["close"][0]
+    return arrays
+
+
+def macd_lines(close: np.ndarray, fast: int, slow: int, signal: int) -> tuple[np.ndarray, np.ndarray]:
+    """MACD and signal lines with ``ta``'s EMA conventions for arbitrary periods."""
+    series = pd.Series(close)
+    macd = (
+        series.ewm(span=fast, min_periods=fast, adjust=False).mean()
+        - series.ewm(span=slow, min_periods=slow, adjust=False).mean()
+    )
+    return macd.to_numpy(), macd.ewm(span=signal, min_periods=signal, adjust=False).mean().to_numpy()
+
+
+def simulate_long_only(
+    open_: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    buy: np.ndarray,
+    sell: np.ndarray,
+    capital: float,
+    stop_distance: np.ndarray | None = None,
+) -> tuple[np.ndarray, int, int]:
+    """Run the all-in long-only position model over precomputed signal arrays.
+
+    The sequential part jumps from one entry to the next exit with searchsorted
+    instead of visiting every bar; cash and share counts are then forward-filled
+    across the series to build the equity curve. With ``stop_distance`` a long
+    is also closed on the first bar whose low breaches ``entry - distance``, at
+    the stop price (or the open when it gaps through). Returns
+    ``(equity_curve, trades, wins)``.
+    """
+    bars = len(close)
+    buy_rows = np.flatnonzero(buy)
+    sell_rows = np.flatnonzero(sell)
+    change_rows: list[int] = []
+    change_cash: list[float] = []
+    change_shares: list[int] = []
+    cash = capital
+    trades = 0
+    wins = 0
+    cursor = 0
+    while True:
+        next_buy = np.searchsorted(buy_rows, cursor)
+        if next_buy == len(buy_rows):
+            break
+        entry = int(buy_rows[next_buy])
+        price = float(close[entry])
+        position = math.floor(cash / price)
+        trades += 1
+        if position == 0:
+            cursor = entry + 1
+            continue
+        cash -= position * price
+        change_rows.append(entry)
+        change_cash.append(cash)
+        change_shares.append(position)
+
+        next_sell = np.searchsorted(sell_rows, entry + 1)
+        exit_row = int(sell_rows[next_sell]) if next_sell < len(sell_rows) else bars
+        exit_price = float(close[exit_row]) if exit_row < bars else math.nan
+        if stop_distance is not None and stop_distance[entry] > 0:
+            stop = price - float(stop_distance[entry])
+            hits = np.flatnonzero(low[entry + 1:exit_row + 1] <= stop)
+            if len(hits):
+                exit_row = entry + 1 + int(hits[0])
+                exit_price = min(float(open_[exit_row]), stop)
+        if exit_row >= bars:
+            break
+        exit_value = position * exit_price
+        if exit_value > position * float(open_[exit_row]):
+            wins += 1
+        cash += exit_value
+        trades += 1
+        change_rows.append(exit_row)
+        change_cash.append(cash)
+        change_shares.append(0)
+        cursor = exit_row + 1
+
+    # Index of the latest position change at or before each bar (-1 before the first).
+    last_change = np.full(bars, -1, dtype=np.int64)
+    last_change[np.asarray(change_rows, dtype=np.int64)] = np.arange(len(change_rows))
+    last_change = np.maximum.accumulate(last_change) if bars else last_change
+    cash_curve = np.append(np.asarray(change_cash, dtype=np.float64), capital)[last_change]
+    shares_curve = np.append(np.asarray(change_shares, dtype=np.float64), 0.0)[last_change]
+    return cash_curve + shares_curve * close, trades, wins
+
+
+def run_strategy(
+    arrays: dict[str, np.ndarray],
+    params: StrategyParams,
+    capital: float,
+    macd_cache: dict[tuple[int, int, int], tuple[np.ndarray, np.ndarray]] | None = None,
+) -> tuple[np.ndarray, int, int]:
+    """Simulate ``params`` on precomputed indicator_arrays; returns simulate_long_only's tuple."""
+    complete = arrays["complete"]
+    periods = (params.macd_fast, params.macd_slow, params.macd_signal)
+    if periods == (DEFAULT_PARAMS.macd_fast, DEFAULT_PARAMS.macd_slow, DEFAULT_PARAMS.macd_signal):
+        macd, macd_signal = arrays["macd"], arrays["macd_signal"]
+    else:
+        if macd_cache is None:
+            macd_cache = {}
+        if periods not in macd_cache:
+            macd_cache[periods] = macd_lines(arrays["raw_close"], *periods)
+        macd, macd_signal = macd_cache[periods]
+    macd, macd_signal = macd[complete], macd_signal[complete]
+    rsi = arrays["rsi_14"][complete]
+    with np.errstate(invalid="ignore"):
+        buy = (rsi < params.rsi_buy) & (macd > macd_signal)
+        sell = (rsi > params.rsi_sell) & (macd < macd_signal)
+    stop_distance = arrays["atr_14"][complete] * params.atr_stop_multiplier if params.atr_stop_multiplier > 0 else None
+    return simulate_long_only(
+        arrays["open"][complete],
+        arrays["low"][complete],
+        arrays["close"][complete],
+        buy,
+        sell,
+        capital,
+        stop_distance,
+    )
+
+
+def performance_metrics(
+    equity_curve: np.ndarray,
+    capital: float,
+    trades: int,
+    wins: int,
+    include_curve: bool = True,
+) -> dict:
+    """The metrics dictionary returned by Backtester.run for a finished equity curve."""
+    equity_series = pd.Series(equity_curve, dtype=np.float64)
+    returns = equity_series.pct_change().dropna()
+    drawdown = ((equity_series.cummax() - equity_series) / equity_series.cummax()).fillna(0)
+    sharpe = float((returns.mean() / returns.std()) * (252**0.5)) if not returns.empty and returns.std() else 0.0
+    metrics = {
+        "ending_capital": float(equity_series.iloc[-1]) if not equity_series.empty else capital,
+        "total_return_pct": float(((equity_series.iloc[-1] - capital) / capital) * 100) if not equity_series.empty else 0.0,
+        "win_rate": float((wins / trades) * 100) if trades else 0.0,
+        "sharpe_ratio": sharpe,
+        "max_drawdown_pct": float(drawdown.max() * 100) if not drawdown.empty else 0.0,
+        "trades": trades,
+    }
+    if include_curve:
+        metrics["equity_curve"] = equity_series.tolist()
+    return metrics
 
 
 class Backtester:
-    def run(self, frame: pd.DataFrame, capital: float) -> dict:
-        enriched = add_technical_indicators(frame)
-        position = 0
-        cash = capital
-        equity_curve: list[float] = []
-        trades = 0
-        wins = 0
-        for _, row in enriched.iterrows():
-            buy_signal = row["rsi_14"] < 35 and row["macd"] > row["macd_signal"]
-            sell_signal = row["rsi_14"] > 65 and row["macd"] < row["macd_signal"]
-            if position == 0 and buy_signal:
-                position = math.floor(cash / row["close"])
-                cash -= position * row["close"]
-                trades += 1
-            elif position > 0 and sell_signal:
-                exit_value = position * row["close"]
-                if exit_value > position * row["open"]:
-                    wins += 1
-                cash += exit_value
-                position = 0
-                trades += 1
-            equity_curve.append(cash + position * row["close"])
-
-        equity_series = pd.Series(equity_curve)
-        returns = equity_series.pct_change().dropna()
-        drawdown = ((equity_series.cummax() - equity_series) / equity_series.cummax()).fillna(0)
-        sharpe = float((returns.mean() / returns.std()) * (252**0.5)) if not returns.empty and returns.std() else 0.0
-        return {
-            "ending_capital": float(equity_series.iloc[-1]) if not equity_series.empty else capital,
-            "total_return_pct": float(((equity_series.iloc[-1] - capital) / capital) * 100) if not equity_series.empty else 0.0,
-            "win_rate": float((wins / trades) * 100) if trades else 0.0,
-            "sharpe_ratio": sharpe,
-            "max_drawdown_pct": float(drawdown.max() * 100) if not drawdown.empty else 0.0,
-            "trades": trades,
-            "equity_curve": [float(value) for value in equity_curve],
-        }
+    def __init__(self, params: StrategyParams = DEFAULT_PARAMS) -> None:
+        self.params = params
 
+    def run(self, frame: pd.DataFrame, capital: float) -> dict:
+        equity_curve, trades, wins = run_strategy(indicator_arrays(frame), self.params, capital)
+        return performance_metrics(equity_curve, capital, trades, wins)
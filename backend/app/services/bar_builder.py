@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from app.services.feed_decoder import Tick
+from app.services.market_data import INTERVAL_SECONDS, MarketDataService
+
+logger = logging.getLogger(__name__)
+
+STREAM_BAR_INTERVALS = ("1minute", "5minute")
+
+
+class _Bar:
+    __slots__ = ("start_ms", "open", "high", "low", "close", "volume", "partial", "closed")
+
+    def __init__(self, start_ms: int, price: float, partial: bool) -> None:
+        self.start_ms = start_ms
+        self.open = self.high = self.low = self.close = price
+        self.volume = 0
+        self.partial = partial
+        self.closed = False
+
+    def row(self) -> list:
+        stamp = datetime.fromtimestamp(self.start_ms / 1000, tz=timezone.utc).isoformat()
+        return [stamp, self.open, self.high, self.low, self.close, self.volume, None]
+
+
+class BarBuilder:
+    """Rolls feed ticks into OHLCV bars per instrument and interval.
+
+    Bars are bucketed on the tick's last-trade time. A bar closes when a tick
+    for a later bucket arrives, or via close_due() once its end has passed
+    without one. Closed bars queue until flush(), which writes them in one bulk
+    upsert and publishes a ``market.bar`` event per bar. Volume comes from the
+    feed's cumulative day volume when present, else from summed trade sizes.
+    The first bar of each series after start-up saw only part of its ticks, so
+    it is never written (it would clobber a complete backfilled bar).
+    """
+
+    def __init__(self, market_service: MarketDataService, alerts: Any, intervals: tuple[str, ...] = STREAM_BAR_INTERVALS) -> None:
+        self.market_service = market_service
+        self.alerts = alerts
+        self.spans = {interval: INTERVAL_SECONDS[interval] * 1000 for interval in intervals}
+        # latest bar per series; it stays here after closing so late ticks can be recognised
+        self._bars: dict[tuple[str, str], _Bar] = {}
+        self._day_volume: dict[str, int] = {}
+        self._closed: list[tuple[str, str, _Bar]] = []
+        self.stats = {"ticks": 0, "late_ticks": 0, "bars_closed": 0, "bars_written": 0}
+
+    def add_ticks(self, ticks: list[Tick]) -> None:
+        for tick in ticks:
+            if tick.ltt <= 0 or tick.ltp <= 0:
+                continue
+            self.stats["ticks"] += 1
+            traded = self._traded_volume(tick)
+            for interval, span in self.spans.items():
+                self._add(tick, interval, span, traded)
+
+    def _traded_volume(self, tick: Tick) -> int:
+        if tick.volume is None:
+            return tick.ltq
+        previous = self._day_volume.get(tick.instrument_key)
+        self._day_volume[tick.instrument_key] = tick.volume
+        # a drop means a new session's counter
+        return tick.volume - previous if previous is not None and tick.volume >= previous else 0
+
+    def _add(self, tick: Tick, interval: str, span: int, traded: int) -> None:
+        series = (tick.instrument_key, interval)
+        start = tick.ltt - tick.ltt % span
+        bar = self._bars.get(series)
+        if bar is not None and (start < bar.start_ms or (start == bar.start_ms and bar.closed)):
+            self.stats["late_ticks"] += 1
+            return
+        if bar is None or start > bar.start_ms:
+            if bar is not None and not bar.closed:
+                self._close(series, bar)
+            bar = self._bars[series] = _Bar(start, tick.ltp, partial=bar is None)
+        else:
+            bar.high = max(bar.high, tick.ltp)
+            bar.low = min(bar.low, tick.ltp)
+            bar.close = tick.ltp
+        bar.volume += traded
+
+    def _close(self, series: tuple[str, str], bar: _Bar) -> None:
+        bar.closed = True
+        self.stats["bars_closed"] += 1
+        if not bar.partial:
+            self._closed.append((*series, bar))
+
+    def close_due(self, now_ms: int | None = None, grace_ms: int = 2000) -> None:
+        """Close bars whose interval ended more than ``grace_ms`` ago (quiet instruments)."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        for series, bar in self._bars.items():
+            if not bar.closed and bar.start_ms + self.spans[series[1]] + grace_ms <= now_ms:
+                self._close(series, bar)
+
+    async def flush(self) -> int:
+        """Write queued closed bars in one bulk upsert and publish their bar-close events."""
+        if not self._closed:
+            return 0
+        closed, self._closed = self._closed, []
+        rows = [(key, interval, bar.row()) for key, interval, bar in closed]
+        try:
+            await self.market_service.upsert_candle_batch(rows, source="stream")
+        except Exception as exc:
+            logger.warning("Writing %d stream bars failed: %s", len(rows), exc)
+            self._closed = closed + self._closed
+            return 0
+        self.stats["bars_written"] += len(rows)
+        for key, interval, row in rows:
+            self.alerts.publish("market.bar", {
+                "instrument_key": key, "interval": interval, "timestamp": row[0],
+                "open": row[1], "high": row[2], "low": row[3], "close": row[4], "volume": row[5],
+            })
+        return len(rows)
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import logging
+import math
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.clock import set_simulated_now, utcnow
+from app.core.config import get_settings
+from app.models.trading import UpstoxCredential
+from app.models.watchlist import INTRADAY_UNIVERSE
+from app.services import auto_trader, auto_trader_professional
+from app.services.indicator_state import clear_indicator_states
+from app.services.market_data import INTERVAL_SECONDS, MarketDataService
+from app.services.predictor import PredictionService
+from app.services.stock_scanner import StockScannerService
+
+logger = logging.getLogger(__name__)
+
+REPLAY_USER_ID = "replay"
+# Collections read from the live database; everything the cycles write goes to the scratch one.
+SOURCE_COLLECTIONS = ("candles",)
+TRADERS = {
+    "auto": auto_trader._run_cycle,
+    "professional": auto_trader_professional._run_professional_cycle,
+}
+
+
+# Collection methods that only read; anything else on a source collection goes to scratch.
+READ_METHODS = frozenset({"find", "find_one", "count_documents", "estimated_document_count", "distinct", "aggregate"})
+
+
+class _SourceCollection:
+    """A live collection that can be read but not written: writes land in the scratch copy."""
+
+    def __init__(self, source, scratch):
+        self._source = source
+        self._scratch = scratch
+
+    def __getattr__(self, name: str):
+        return getattr(self._source if name in READ_METHODS else self._scratch, name)
+
+
+class ReplayDatabase:
+    """Routes market data reads to the live database and every write to a scratch database."""
+
+    def __init__(self, source: AsyncIOMotorDatabase, scratch: AsyncIOMotorDatabase):
+        self.source = source
+        self.scratch = scratch
+
+    def __getitem__(self, name: str):
+        if name in SOURCE_COLLECTIONS:
+            return _SourceCollection(self.source[name], self.scratch[name])
+        return self.scratch[name]
+
+
+class CandleFeed:
+    """Preloaded candles per instrument, answering "what did the market look like at t"."""
+
+    def __init__(self, interval: str, arrays: dict[str, dict[str, np.ndarray]]):
+        self.interval = interval
+        self.bar = np.timedelta64(INTERVAL_SECONDS.get(interval, 0), "s")
+        self.arrays = {key: data for key, data in arrays.items() if len(data["timestamp"])}
+
+    @classmethod
+    async def load(cls, market_service: MarketDataService, instrument_keys: list[str], interval: str,
+                   start: datetime, end: datetime) -> CandleFeed:
+        arrays = {}
+        for key in instrument_keys:
+            arrays[key] = await market_service.recent_candles_arrays(
+                key, interval, limit=None, from_date=start - timedelta(days=1), to_date=end,
+            )
+        return cls(interval, arrays)
+
+    def closes_between(self, start: datetime, end: datetime) -> list[datetime]:
+        """Bar-close times of every stored bar starting in [start, end), across all instruments."""
+        lo, hi = np.datetime64(start.replace(tzinfo=None), "ms"), np.datetime64(end.replace(tzinfo=None), "ms")
+        stamps = [data["timestamp"][(data["timestamp"] >= lo) & (data["timestamp"] < hi)] for data in self.arrays.values()]
+        if not stamps:
+            return []
+        closes = np.unique(np.concatenate(stamps)) + self.bar
+        return [stamp.astype("datetime64[ms]").item().replace(tzinfo=timezone.utc) for stamp in closes]
+
+    def quote(self, instrument_key: str, now: datetime) -> dict[str, Any] | None:
+        """Synthetic Upstox market quote built from the bars closed by ``now``."""
+        data = self.arrays.get(instrument_key)
+        if data is None:
+            return None
+        stamps = data["timestamp"]
+        closed_by = np.datetime64(now.replace(tzinfo=None), "ms") - self.bar
+        last = int(np.searchsorted(stamps, closed_by, side="right")) - 1
+        if last < 0:
+            return None
+        first = int(np.searchsorted(stamps, stamps[last].astype("datetime64[D]")))
+        previous_close = float(data["close"][first - 1]) if first > 0 else float(data["open"][first])
+        last_price = float(data["close"][last])
+        return {
+            "instrument_token": instrument_key,
+            "timestamp": (stamps[last] + self.bar).astype("datetime64[ms]").item().replace(tzinfo=timezone.utc).isoformat(),
+            "last_price": last_price,
+            "volume": float(np.nansum(data["volume"][first:last + 1])),
+            "net_change": round(last_price - previous_close, 2),
+            "ohlc": {
+                "open": float(data["open"][first]),
+                "high": float(np.nanmax(data["high"][first:last + 1])),
+                "low": float(np.nanmin(data["low"][first:last + 1])),
+                "close": last_price,
+            },
+        }
+
+
+class ReplayUpstoxService:
+    """Local stand-in for UpstoxService: quotes from the candle feed, history from Mongo, no network."""
+
+    def __init__(self, db: ReplayDatabase, feed: CandleFeed):
+        self.db = db
+        self.feed = feed
+        self.market_service = MarketDataService(db.source)
+        self.orders: list[dict[str, Any]] = []
+        self.calls: Counter = Counter()
+
+    async def get_credential(self, user_id: str) -> UpstoxCredential:
+        return UpstoxCredential(user_id=user_id, access_token="replay")
+
+    async def get_quotes(self, access_token: str, instrument_keys: list[str]) -> dict[str, Any]:
+        self.calls["get_quotes"] += 1
+        now = utcnow()
+        quotes = {key: self.feed.quote(key, now) for key in instrument_keys}
+        return {"status": "success", "data": {key: quote for key, quote in quotes.items() if quote}}
+
+    async def get_historical_candles(self, access_token: str, instrument_key: str, interval: str,
+                                     to_date: str | None, from_date: str | None) -> dict[str, Any]:
+        self.calls["get_historical_candles"] += 1
+        arrays = await self.market_service.recent_candles_arrays(
+            instrument_key, interval, limit=None,
+            from_date=datetime.fromisoformat(from_date) if from_date else None,
+            to_date=datetime.fromisoformat(to_date) + timedelta(days=1) if to_date else None,
+        )
+        rows = [
+            [stamp.astype("datetime64[ms]").item().isoformat(), o, h, l, c, v, 0]
+            for stamp, o, h, l, c, v in zip(arrays["timestamp"], *(arrays[f].tolist() for f in ("open", "high", "low", "close", "volume")))
+        ]
+        rows.reverse()  # Upstox returns newest first
+        return {"status": "success", "data": {"candles": rows}}
+
+    async def place_order(self, access_token: str, order_payload: dict[str, Any]) -> dict[str, Any]:
+        self.calls["place_order"] += 1
+        order_id = f"replay-{len(self.orders) + 1}"
+        self.orders.append({**order_payload, "order_id": order_id, "placed_at": utcnow()})
+        return {"status": "success", "data": {"order_id": order_id}}
+
+    async def get_websocket_authorization(self, access_token: str) -> dict[str, Any]:
+        return {"status": "success", "data": {"authorized_redirect_uri": ""}}
+
+
+class ReplayAlertService:
+    """Counts published events instead of sending them to Redis."""
+
+    def __init__(self) -> None:
+        self.events: Counter = Counter()
+
+    def publish(self, event: str, payload: dict) -> None:
+        self.events[event] += 1
+
+
+class ReplayScannerService(StockScannerService):
+    """Scanner sharing one predictor across cycles and skipping live news sentiment."""
+
+    def __init__(self, db: ReplayDatabase):
+        self.db = db
+        self.settings = get_settings()
+        self.market_service = MarketDataService(db.source)
+        self.predictor = PredictionService()
+        self.sentiment_service = None
+        self.last_scan_stats = {}
+
+    async def scan_universe(self, *args, **kwargs) -> list[dict[str, Any]]:
+        kwargs["include_sentiment"] = False
+        return await super().scan_universe(*args, **kwargs)
+
+
+@contextmanager
+def _stand_ins(upstox: ReplayUpstoxService, alerts: ReplayAlertService, scanner: ReplayScannerService):
+    """Point the trader modules at the stand-ins; restored on exit."""
+    replacements = {
+        "UpstoxService": lambda db: upstox,
+        "AlertService": lambda: alerts,
+        "StockScannerService": lambda db: scanner,
+    }
+    saved = []
+    for module in (auto_trader, auto_trader_professional):
+        for name, replacement in replacements.items():
+            saved.append((module, name, getattr(module, name)))
+            setattr(module, name, replacement)
+    try:
+        yield
+    finally:
+        for module, name, original in saved:
+            setattr(module, name, original)
+        set_simulated_now(None)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+async def replay_cycles(
+    source: AsyncIOMotorDatabase,
+    scratch: AsyncIOMotorDatabase,
+    start: datetime,
+    end: datetime,
+    trader: str = "auto",
+    interval: str = "5minute",
+    state: dict[str, Any] | None = None,
+    instrument_keys: list[str] | None = None,
+    reenable_daily: bool = True,
+) -> dict[str, Any]:
+    """Run a trader cycle once per stored bar close between ``start`` and ``end``.
+
+    The simulated clock is pinned to each bar close, candle reads only see bars
+    closed by then, and quotes come from the same candles. Trades, positions and
+    decisions are written to ``scratch`` (dropped first). The trader modules are
+    patched for the duration, so run this in its own process, not the API server.
+    With ``reenable_daily`` a daily-loss shutdown only lasts until the next session.
+    """
+    cycle = TRADERS[trader]
+    start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+    end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    instrument_keys = instrument_keys or INTRADAY_UNIVERSE
+
+    for name in await scratch.list_collection_names():
+        await scratch[name].drop()
+    db = ReplayDatabase(source, scratch)
+    await scratch["auto_trading_state"].insert_one({
+        "user_id": REPLAY_USER_ID,
+        "enabled": True,
+        "paper_trading": True,
+        "max_capital_allocation": 50000,
+        "daily_loss_limit": 2000,
+        **(state or {}),
+    })
+
+    feed = await CandleFeed.load(MarketDataService(source), instrument_keys, interval, start, end)
+    upstox = ReplayUpstoxService(db, feed)
+    alerts = ReplayAlertService()
+    scanner = ReplayScannerService(db)
+    clear_indicator_states()
+
+    ticks = feed.closes_between(start, end)
+    durations: list[float] = []
+    errors = 0
+    last_error = None
+    skipped = 0
+    day = None
+    wall_start = time.perf_counter()
+    with _stand_ins(upstox, alerts, scanner):
+        for now in ticks:
+            set_simulated_now(now)
+            if reenable_daily and now.date() != day:
+                day = now.date()
+                await scratch["auto_trading_state"].update_one({"user_id": REPLAY_USER_ID}, {"$set": {"enabled": True}})
+            doc = await scratch["auto_trading_state"].find_one({"enabled": True})
+            if doc is None:
+                skipped += 1
+                continue
+            cycle_start = time.perf_counter()
+            try:
+                await cycle(db, doc)
+            except Exception as exc:
+                errors += 1
+                last_error = f"{now.isoformat()}: {exc}"
+                logger.exception("Replay cycle failed at %s", now.isoformat())
+            durations.append((time.perf_counter() - cycle_start) * 1000)
+
+    trades = await scratch["trades"].find({"user_id": REPLAY_USER_ID}).to_list(length=None)
+    positions = await scratch["positions"].find({"user_id": REPLAY_USER_ID, "quantity": {"$ne": 0}}).to_list(length=None)
+    realised = [float(t["pnl"]) for t in trades if t.get("pnl") is not None]
+    return {
+        "trader": trader,
+        "interval": interval,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "sessions": len({tick.date() for tick in ticks}),
+        "cycles": len(durations),
+        "skipped_disabled": skipped,
+        "errors": errors,
+        "last_error": last_error,
+        "wall_seconds": round(time.perf_counter() - wall_start, 2),
+        "cycle_ms": {
+            "mean": round(sum(durations) / len(durations), 2) if durations else 0.0,
+            "p50": round(_percentile(durations, 50), 2),
+            "p95": round(_percentile(durations, 95), 2),
+            "max": round(max(durations, default=0.0), 2),
+        },
+        "trades": len(trades),
+        "closed_trades": len(realised),
+        "realised_pnl": round(sum(realised), 2),
+        "open_positions": [p["instrument_key"] for p in positions],
+        "decisions": await scratch["trading_decisions"].count_documents({}),
+        "upstox_calls": dict(upstox.calls),
+        "alerts": dict(alerts.events),
+    }
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple
+
+from google.protobuf.message import DecodeError
+
+from app.proto.MarketDataFeedV3_pb2 import FeedResponse
+
+logger = logging.getLogger(__name__)
+
+
+class Tick(NamedTuple):
+    """One instrument update from the v3 feed; fields the feed mode does not carry are None."""
+
+    instrument_key: str
+    ltp: float
+    ltt: int  # last trade time, epoch ms
+    ltq: int
+    cp: float  # previous close
+    open: float | None = None
+    high: float | None = None
+    low: float | None = None
+    close: float | None = None
+    volume: int | None = None
+    atp: float | None = None
+    oi: float | None = None
+    tbq: float | None = None
+    tsq: float | None = None
+    bids: tuple[tuple[float, int], ...] = ()
+    asks: tuple[tuple[float, int], ...] = ()
+
+
+def _daily_ohlc(market: Any) -> tuple[float | None, ...]:
+    for bar in market.marketOHLC.ohlc:
+        if bar.interval == "1d":
+            return bar.open, bar.high, bar.low, bar.close
+    return None, None, None, None
+
+
+def decode_frame(raw: bytes) -> list[Tick]:
+    """Parse one binary feed frame; market-info frames and empty feeds yield no ticks."""
+    response = FeedResponse()
+    response.ParseFromString(raw)
+    ticks = []
+    for key, feed in response.feeds.items():
+        kind = feed.WhichOneof("FeedUnion")
+        if kind == "ltpc":
+            ltpc = feed.ltpc
+            ticks.append(Tick(key, ltpc.ltp, ltpc.ltt, ltpc.ltq, ltpc.cp))
+        elif kind == "fullFeed":
+            which = feed.fullFeed.WhichOneof("FullFeedUnion")
+            if which == "marketFF":
+                market = feed.fullFeed.marketFF
+                levels = [((level.bidP, level.bidQ), (level.askP, level.askQ)) for level in market.marketLevel.bidAskQuote]
+                bids, asks = (tuple(side) for side in zip(*levels)) if levels else ((), ())
+                ltpc = market.ltpc
+                ticks.append(Tick(
+                    key, ltpc.ltp, ltpc.ltt, ltpc.ltq, ltpc.cp, *_daily_ohlc(market),
+                    volume=market.vtt, atp=market.atp, oi=market.oi, tbq=market.tbq, tsq=market.tsq,
+                    bids=bids, asks=asks,
+                ))
+            elif which == "indexFF":
+                index = feed.fullFeed.indexFF
+                ltpc = index.ltpc
+                ticks.append(Tick(key, ltpc.ltp, ltpc.ltt, ltpc.ltq, ltpc.cp, *_daily_ohlc(index)))
+        elif kind == "firstLevelWithGreeks":
+            first = feed.firstLevelWithGreeks
+            ltpc = first.ltpc
+            depth = first.firstDepth
+            ticks.append(Tick(
+                key, ltpc.ltp, ltpc.ltt, ltpc.ltq, ltpc.cp, volume=first.vtt, oi=first.oi,
+                bids=((depth.bidP, depth.bidQ),), asks=((depth.askP, depth.askQ),),
+            ))
+    return ticks
+
+
+def decode_frames(frames: list[bytes]) -> list[Tick]:
+    """Decode a batch of frames in order (also the unit of work for the decoder pool)."""
+    ticks = []
+    for raw in frames:
+        try:
+            ticks.extend(decode_frame(raw))
+        except DecodeError:
+            logger.warning("Dropping undecodable feed frame (%d bytes)", len(raw))
+    return ticks
+
+
+def tick_payload(tick: Tick) -> dict[str, Any]:
+    """Compact form of a tick for Redis/socket.io: price, time, volume and top of book.
+
+    Full depth and day OHLC stay in the tick store (and REST quotes).
+    """
+    payload: dict[str, Any] = {"instrument_key": tick.instrument_key, "ltp": tick.ltp, "ltt": tick.ltt, "cp": tick.cp}
+    if tick.volume:
+        payload["volume"] = tick.volume
+    if tick.bids:
+        payload["bid"] = tick.bids[0][0]
+        payload["ask"] = tick.asks[0][0]
+    return payload
+
+
+class FeedDecoder:
+    """Decodes frame batches inline, or in a process pool when ``workers`` > 0."""
+
+    def __init__(self, workers: int = 0) -> None:
+        # spawn keeps the workers free of the parent's event loop and sockets
+        self.executor = (
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            if workers > 0 else None
+        )
+
+    async def decode(self, frames: list[bytes]) -> list[Tick]:
+        if not frames:
+            return []
+        if self.executor is None:
+            return decode_frames(frames)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, decode_frames, frames)
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from app.services.indicators import get_indicator_executor
+
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Same order add_technical_indicators appends its columns in.
+INDICATOR_COLUMNS = [
+    "rsi_14",
+    "rsi_7",
+    "macd",
+    "macd_signal",
+    "macd_diff",
+    "sma_20",
+    "sma_50",
+    "ema_20",
+    "ema_12",
+    "bb_high",
+    "bb_low",
+    "bb_mid",
+    "atr_14",
+    "volume_ma_20",
+    "volume_ratio",
+    "returns",
+    "returns_3d",
+    "returns_7d",
+    "volatility_20",
+    "volatility_10",
+    "price_to_sma20",
+    "price_to_sma50",
+    "bb_position",
+    "adx_14",
+]
+
+
+def build_price_panel(frames: list[pd.DataFrame], length: int | None = None) -> dict[str, np.ndarray]:
+    """Stack per-symbol OHLCV frames into (symbols x time) float64 arrays.
+
+    Shorter histories are left-padded with NaN so every symbol's last bar lines up
+    in the final column. ``length`` trims every symbol to its most recent bars.
+    When every frame has a ``timestamp`` column the panel also carries the aligned
+    bar times as a datetime64[ms] ``timestamp`` array (NaT padded).
+    """
+    length = length or max((len(frame) for frame in frames), default=0)
+    panel = {column: np.full((len(frames), length), np.nan) for column in PRICE_COLUMNS}
+    with_time = bool(frames) and all("timestamp" in frame for frame in frames)
+    if with_time:
+        panel["timestamp"] = np.full((len(frames), length), np.datetime64("NaT"), dtype="datetime64[ms]")
+    for row, frame in enumerate(frames):
+        tail = frame.tail(length)
+        for column in PRICE_COLUMNS:
+            values = tail[column].to_numpy(dtype=np.float64)
+            panel[column][row, length - len(values):] = values
+        if with_time:
+            panel["timestamp"][row, length - len(tail):] = tail["timestamp"].to_numpy(dtype="datetime64[ms]")
+    return panel
+
+
+def _first_valid(close: np.ndarray) -> np.ndarray:
+    """Index of each column's first non-NaN row (``len`` for all-NaN columns)."""
+    valid = ~np.isnan(close)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), close.shape[0])
+
+
+def _window_mean(values: np.ndarray, start: np.ndarray, window: int) -> np.ndarray:
+    """Per-column mean of ``values[start : start + window]`` (NaN where it runs off the end)."""
+    rows, cols = values.shape
+    idx = start[None, :] + np.arange(window)[:, None]
+    fits = start + window <= rows
+    gathered = values[np.clip(idx, 0, rows - 1), np.arange(cols)[None, :]]
+    return np.where(fits, gathered.mean(axis=0), np.nan)
+
+
+def _wilder(values: np.ndarray, seed_row: np.ndarray, seed: np.ndarray, window: int) -> np.ndarray:
+    """Wilder smoothing seeded with ``seed`` at ``seed_row``: NaN before, recursive after.
+
+    Equivalent to the ``x[i] = (x[i-1] * (n - 1) + v[i]) / n`` loops in ``ta``.
+    """
+    rows, cols = values.shape
+    arr = np.where(np.arange(rows)[:, None] > seed_row[None, :], values, np.nan)
+    seeded = seed_row < rows
+    arr[seed_row[seeded], np.nonzero(seeded)[0]] = seed[seeded]
+    return pd.DataFrame(arr).ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+
+
+def _zero_fill(values: np.ndarray, start: np.ndarray, stop: np.ndarray) -> np.ndarray:
+    """Set rows in ``[start, stop)`` to 0 per column (``ta`` emits zeros while warming up)."""
+    rows = np.arange(values.shape[0])[:, None]
+    return np.where((rows >= start[None, :]) & (rows < stop[None, :]), 0.0, values)
+
+
+def _ema(frame: pd.DataFrame, span: int) -> pd.DataFrame:
+    return frame.ewm(span=span, min_periods=span, adjust=False).mean()
+
+
+def _rsi(close: pd.DataFrame, start: np.ndarray, window: int) -> np.ndarray:
+    diff = close.diff().to_numpy()
+    before = np.arange(diff.shape[0])[:, None] < start[None, :]
+    up = np.where(before, np.nan, np.where(diff > 0, diff, 0.0))
+    down = np.where(before, np.nan, np.where(diff < 0, -diff, 0.0))
+    ema_up = pd.DataFrame(up).ewm(alpha=1 / window, min_periods=window, adjust=False).mean().to_numpy()
+    ema_down = pd.DataFrame(down).ewm(alpha=1 / window, min_periods=window, adjust=False).mean().to_numpy()
+    return np.where(ema_down == 0, 100.0, 100 - 100 / (1 + ema_up / ema_down))
+
+
+def _atr(high: np.ndarray, low: np.ndarray, prev_close: np.ndarray, start: np.ndarray, window: int) -> np.ndarray:
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    seed_row = start + window - 1
+    atr = _wilder(true_range, seed_row, _window_mean(true_range, start, window), window)
+    return _zero_fill(atr, start, seed_row)
+
+
+def _adx(high: np.ndarray, low: np.ndarray, prev_close: np.ndarray, start: np.ndarray, window: int) -> np.ndarray:
+    prev_high = np.vstack([np.full((1, high.shape[1]), np.nan), high[:-1]])
+    prev_low = np.vstack([np.full((1, low.shape[1]), np.nan), low[:-1]])
+    movement = np.maximum(high, prev_close) - np.minimum(low, prev_close)
+    diff_up = high - prev_high
+    diff_down = prev_low - low
+    pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+    neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    # Smoothed sums start from the first bar that has a previous close.
+    seed_row = start + window
+    smoothed = [
+        _wilder(values, seed_row, _window_mean(values, start + 1, window), window)
+        for values in (movement, pos, neg)
+    ]
+    tr_s, pos_s, neg_s = smoothed
+    di_pos = np.where(tr_s != 0, 100 * pos_s / tr_s, 0.0)
+    di_neg = np.where(tr_s != 0, 100 * neg_s / tr_s, 0.0)
+    di_sum = di_pos + di_neg
+    dx = np.where(di_sum != 0, 100 * np.abs(di_pos - di_neg) / di_sum, 0.0)
+    dx = np.where(np.isnan(tr_s), np.nan, dx)
+
+    adx_row = start + 2 * window - 1
+    adx = _wilder(dx, adx_row, _window_mean(dx, seed_row, window), window)
+    return _zero_fill(adx, start, adx_row)
+
+
+def compute_indicator_panel(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+) -> dict[str, np.ndarray]:
+    """Compute every add_technical_indicators column for a (symbols x time) OHLCV panel.
+
+    Each input is a float array shaped (symbols, time), left-padded with NaN for
+    symbols with shorter history (see build_price_panel). Returns the five price
+    columns plus INDICATOR_COLUMNS, each shaped (symbols, time), with values matching
+    what ``ta`` produces per symbol. Rows that add_technical_indicators would drop
+    are NaN.
+    """
+    # Work time-major so pandas rolling/ewm run down every symbol column at once.
+    o, h, l, c, v = (np.asarray(a, dtype=np.float64).T for a in (open_, high, low, close, volume))
+    start = _first_valid(c)
+    close_df = pd.DataFrame(c)
+    prev_close = np.vstack([np.full((1, c.shape[1]), np.nan), c[:-1]])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out: dict[str, np.ndarray] = {"open": o, "high": h, "low": l, "close": c, "volume": v}
+        out["rsi_14"] = _rsi(close_df, start, 14)
+        out["rsi_7"] = _rsi(close_df, start, 7)
+
+        macd = _ema(close_df, 12) - _ema(close_df, 26)
+        macd_signal = _ema(macd, 9)
+        out["macd"] = macd.to_numpy()
+        out["macd_signal"] = macd_signal.to_numpy()
+        out["macd_diff"] = (macd - macd_signal).to_numpy()
+
+        out["sma_20"] = close_df.rolling(20, min_periods=20).mean().to_numpy()
+        out["sma_50"] = close_df.rolling(50, min_periods=50).mean().to_numpy()
+        out["ema_20"] = _ema(close_df, 20).to_numpy()
+        out["ema_12"] = _ema(close_df, 12).to_numpy()
+
+        bb_std = close_df.rolling(20, min_periods=20).std(ddof=0).to_numpy()
+        out["bb_mid"] = out["sma_20"]
+        out["bb_high"] = out["bb_mid"] + 2 * bb_std
+        out["bb_low"] = out["bb_mid"] - 2 * bb_std
+
+        out["atr_14"] = _atr(h, l, prev_close, start, 14)
+
+        volume_ma = pd.DataFrame(v).rolling(20).mean().to_numpy()
+        out["volume_ma_20"] = volume_ma
+        out["volume_ratio"] = v / np.where(volume_ma == 0, 1, volume_ma)
+
+        returns = pd.DataFrame(c / prev_close - 1)
+        out["returns"] = returns.to_numpy()
+        out["returns_3d"] = (close_df / close_df.shift(3) - 1).to_numpy()
+        out["returns_7d"] = (close_df / close_df.shift(7) - 1).to_numpy()
+        out["volatility_20"] = returns.rolling(20).std().to_numpy()
+        out["volatility_10"] = returns.rolling(10).std().to_numpy()
+
+        out["price_to_sma20"] = (c - out["sma_20"]) / out["sma_20"]
+        out["price_to_sma50"] = (c - out["sma_50"]) / out["sma_50"]
+        bb_range = out["bb_high"] - out["bb_low"]
+        out["bb_position"] = (c - out["bb_low"]) / np.where(bb_range == 0, 1, bb_range)
+
+        out["adx_14"] = _adx(h, l, prev_close, start, 14)
+
+    # Blank out every row add_technical_indicators' dropna() would remove.
+    stacked = np.stack(list(out.values()))
+    incomplete = np.isnan(stacked).any(axis=0)
+    return {name: np.where(incomplete, np.nan, values).T for name, values in out.items()}
+
+
+def panel_feature_tensor(panel: dict[str, np.ndarray], columns: list[str]) -> np.ndarray:
+    """Stack panel columns into a (symbols, time, features) array in ``columns`` order."""
+    return np.stack([panel[column] for column in columns], axis=-1)
+
+
+def panel_to_frames(panel: dict[str, np.ndarray], timestamps: np.ndarray | None = None) -> list[pd.DataFrame]:
+    """Split a panel into per-symbol frames shaped like add_technical_indicators output.
+
+    ``timestamps`` is the price panel's aligned ``timestamp`` array; when given, each
+    frame keeps its bar times in a leading ``timestamp`` column.
+    """
+    columns = PRICE_COLUMNS + INDICATOR_COLUMNS
+    frames = []
+    for row in range(panel["close"].shape[0]):
+        data = {"timestamp": timestamps[row]} if timestamps is not None else {}
+        frame = pd.DataFrame({**data, **{column: panel[column][row] for column in columns}})
+        frames.append(frame.dropna().reset_index(drop=True))
+    return frames
+
+
+def enrich_panel(frames: list[pd.DataFrame]) -> list[pd.DataFrame]:
+    """One-pass replacement for ``[add_technical_indicators(f) for f in frames]``."""
+    if not frames:
+        return []
+    panel = build_price_panel(frames)
+    indicators = compute_indicator_panel(panel["open"], panel["high"], panel["low"], panel["close"], panel["volume"])
+    return panel_to_frames(indicators, panel.get("timestamp"))
+
+
+async def enrich_panel_async(frames: list[pd.DataFrame]) -> list[pd.DataFrame]:
+    """enrich_panel in the indicator process pool, keeping the event loop free."""
+    executor = get_indicator_executor()
+    if executor is None or not frames:
+        return enrich_panel(frames)
+    return await asyncio.get_running_loop().run_in_executor(executor, enrich_panel, frames)
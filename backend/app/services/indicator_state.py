@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import copy
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from statistics import fmean
+
+from app.models.trading import Candle
+from app.services.indicator_panel import INDICATOR_COLUMNS, PRICE_COLUMNS
+from app.services.market_data import MarketDataService
+
+NAN = float("nan")
+RSI_WINDOWS = (7, 14)
+WILDER_WINDOW = 14
+
+
+def _std(values: list[float], ddof: int) -> float:
+    mean = fmean(values)
+    return math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - ddof))
+
+
+def _ema_step(prev: float | None, value: float, alpha: float) -> float:
+    return value if prev is None else prev + alpha * (value - prev)
+
+
+@dataclass
+class _Accumulators:
+    """Running state after the last committed bar."""
+
+    bars: int = 0
+    prev_close: float = NAN
+    prev_high: float = NAN
+    prev_low: float = NAN
+    ema: dict[int, float | None] = field(default_factory=lambda: {12: None, 20: None, 26: None})
+    macd_signal: float | None = None
+    macd_count: int = 0
+    rsi_up: dict[int, float | None] = field(default_factory=lambda: {w: None for w in RSI_WINDOWS})
+    rsi_down: dict[int, float | None] = field(default_factory=lambda: {w: None for w in RSI_WINDOWS})
+    closes: deque = field(default_factory=lambda: deque(maxlen=50))
+    volumes: deque = field(default_factory=lambda: deque(maxlen=20))
+    returns: deque = field(default_factory=lambda: deque(maxlen=20))
+    atr: float = 0.0
+    atr_seed: list = field(default_factory=list)
+    dm_sums: tuple[float, float, float] | None = None
+    dm_seed: list = field(default_factory=list)
+    adx: float = 0.0
+    dx_seed: list = field(default_factory=list)
+
+    def clone(self) -> _Accumulators:
+        other = copy.copy(self)
+        other.ema = dict(self.ema)
+        other.rsi_up = dict(self.rsi_up)
+        other.rsi_down = dict(self.rsi_down)
+        other.closes = deque(self.closes, maxlen=self.closes.maxlen)
+        other.volumes = deque(self.volumes, maxlen=self.volumes.maxlen)
+        other.returns = deque(self.returns, maxlen=self.returns.maxlen)
+        other.atr_seed = list(self.atr_seed)
+        other.dm_seed = list(self.dm_seed)
+        other.dx_seed = list(self.dx_seed)
+        return other
+
+
+def _advance(acc: _Accumulators, bar: dict[str, float]) -> dict[str, float]:
+    """Fold one bar into ``acc`` in place and return that bar's indicator row.
+
+    Mirrors add_technical_indicators/ta bar by bar, so after N bars the row equals
+    the last row of add_technical_indicators over those N bars (before dropna).
+    """
+    o, h, l, c, v = bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"]
+    index = acc.bars
+    pc = acc.prev_close
+    row = {"open": o, "high": h, "low": l, "close": c, "volume": v}
+    w = WILDER_WINDOW
+
+    # RSI: Wilder-smoothed up/down moves; the first bar has no diff and counts as 0.
+    diff = c - pc if index else 0.0
+    for window in RSI_WINDOWS:
+        alpha = 1 / window
+        acc.rsi_up[window] = _ema_step(acc.rsi_up[window], max(diff, 0.0), alpha)
+        acc.rsi_down[window] = _ema_step(acc.rsi_down[window], max(-diff, 0.0), alpha)
+        up, down = acc.rsi_up[window], acc.rsi_down[window]
+        if index + 1 < window:
+            row[f"rsi_{window}"] = NAN
+        else:
+            row[f"rsi_{window}"] = 100.0 if down == 0 else 100 - 100 / (1 + up / down)
+
+    # EMAs and MACD (pandas ewm, adjust=False, min_periods=span).
+    for span in acc.ema:
+        acc.ema[span] = _ema_step(acc.ema[span], c, 2 / (span + 1))
+    ema = {span: value if index + 1 >= span else NAN for span, value in acc.ema.items()}
+    row["macd"] = ema[12] - ema[26]
+    if not math.isnan(row["macd"]):
+        acc.macd_signal = _ema_step(acc.macd_signal, row["macd"], 2 / 10)
+        acc.macd_count += 1
+    row["macd_signal"] = acc.macd_signal if acc.macd_count >= 9 else NAN
+    row["macd_diff"] = row["macd"] - row["macd_signal"]
+
+    acc.closes.append(c)
+    closes = list(acc.closes)
+    last20 = closes[-20:]
+    row["sma_20"] = fmean(last20) if len(last20) == 20 else NAN
+    row["sma_50"] = fmean(closes) if len(closes) == 50 else NAN
+    row["ema_20"] = ema[20]
+    row["ema_12"] = ema[12]
+
+    bb_std = _std(last20, 0) if len(last20) == 20 else NAN
+    row["bb_high"] = row["sma_20"] + 2 * bb_std
+    row["bb_low"] = row["sma_20"] - 2 * bb_std
+    row["bb_mid"] = row["sma_20"]
+
+    # ATR: zeros while warming up, seeded with the mean of the first `w` true ranges.
+    true_range = h - l if index == 0 else max(h - l, abs(h - pc), abs(l - pc))
+    if index < w - 1:
+        acc.atr_seed.append(true_range)
+        acc.atr = 0.0
+    elif index == w - 1:
+        acc.atr = fmean(acc.atr_seed + [true_range])
+        acc.atr_seed = []
+    else:
+        acc.atr = (acc.atr * (w - 1) + true_range) / w
+    row["atr_14"] = acc.atr
+
+    acc.volumes.append(v)
+    volume_ma = fmean(acc.volumes) if len(acc.volumes) == 20 else NAN
+    row["volume_ma_20"] = volume_ma
+    row["volume_ratio"] = v / (1 if volume_ma == 0 else volume_ma)
+
+    returns = c / pc - 1 if index else NAN
+    if index:
+        acc.returns.append(returns)
+    row["returns"] = returns
+    row["returns_3d"] = c / closes[-4] - 1 if len(closes) >= 4 else NAN
+    row["returns_7d"] = c / closes[-8] - 1 if len(closes) >= 8 else NAN
+    recent_returns = list(acc.returns)
+    row["volatility_20"] = _std(recent_returns, 1) if len(recent_returns) == 20 else NAN
+    row["volatility_10"] = _std(recent_returns[-10:], 1) if len(recent_returns) >= 10 else NAN
+
+    row["price_to_sma20"] = (c - row["sma_20"]) / row["sma_20"]
+    row["price_to_sma50"] = (c - row["sma_50"]) / row["sma_50"]
+    bb_range = row["bb_high"] - row["bb_low"]
+    row["bb_position"] = (c - row["bb_low"]) / (1 if bb_range == 0 else bb_range)
+
+    # ADX: Wilder sums of true range and directional movement from the second bar on.
+    adx = 0.0
+    if index:
+        movement = max(h, pc) - min(l, pc)
+        up_move, down_move = h - acc.prev_high, acc.prev_low - l
+        pos = up_move if up_move > down_move and up_move > 0 else 0.0
+        neg = down_move if down_move > up_move and down_move > 0 else 0.0
+        if acc.dm_sums is None:
+            acc.dm_seed.append((movement, pos, neg))
+            if len(acc.dm_seed) == w:
+                acc.dm_sums = tuple(sum(values) for values in zip(*acc.dm_seed))
+                acc.dm_seed = []
+        else:
+            acc.dm_sums = tuple(total - total / w + value for total, value in zip(acc.dm_sums, (movement, pos, neg)))
+        if acc.dm_sums is not None:
+            tr_sum, pos_sum, neg_sum = acc.dm_sums
+            di_pos = 100 * pos_sum / tr_sum if tr_sum != 0 else 0.0
+            di_neg = 100 * neg_sum / tr_sum if tr_sum != 0 else 0.0
+            di_total = di_pos + di_neg
+            dx = 100 * abs(di_pos - di_neg) / di_total if di_total != 0 else 0.0
+            if index < 2 * w - 1:
+                acc.dx_seed.append(dx)
+            elif index == 2 * w - 1:
+                acc.adx = fmean(acc.dx_seed + [dx])
+                acc.dx_seed = []
+            else:
+                acc.adx = (acc.adx * (w - 1) + dx) / w
+            adx = acc.adx if index >= 2 * w - 1 else 0.0
+    row["adx_14"] = adx
+
+    acc.bars += 1
+    acc.prev_close, acc.prev_high, acc.prev_low = c, h, l
+    return row
+
+
+class IndicatorState:
+    """Incremental add_technical_indicators for one (instrument, interval) stream.
+
+    Closed bars are folded into running EMA/RSI/ATR/ADX/Bollinger accumulators once;
+    the forming bar is evaluated on a copy, so each update is O(1) in history
+    length. Values equal the last row of add_technical_indicators run over every
+    bar since the state was seeded.
+    """
+
+    def __init__(self, instrument_key: str, interval: str) -> None:
+        self.instrument_key = instrument_key
+        self.interval = interval
+        self._committed = _Accumulators()
+        self._forming: dict[str, float] | None = None
+        self._forming_ts: datetime | None = None
+        self._row: dict[str, float] = {}
+        self._prev_row: dict[str, float] = {}
+
+    @classmethod
+    def from_candles(cls, instrument_key: str, interval: str, candles: list[Candle]) -> IndicatorState:
+        state = cls(instrument_key, interval)
+        for candle in candles:
+            state.update(candle.timestamp, float(candle.open), float(candle.high), float(candle.low),
+                         float(candle.close), float(candle.volume))
+        return state
+
+    @property
+    def last_timestamp(self) -> datetime | None:
+        return self._forming_ts
+
+    @property
+    def bars(self) -> int:
+        """Number of bars seen, the forming bar included."""
+        return self._committed.bars + (self._forming is not None)
+
+    @property
+    def ready(self) -> bool:
+        """True once the latest row would survive add_technical_indicators' dropna()."""
+        return bool(self._row) and not any(math.isnan(value) for value in self._row.values())
+
+    def update(self, timestamp: datetime, open: float, high: float, low: float, close: float, volume: float) -> dict[str, float]:
+        """Apply a bar. A new timestamp closes the previous bar; the same one revises it."""
+        if self._forming_ts is not None and timestamp < self._forming_ts:
+            return self.values()
+        if self._forming_ts is not None and timestamp > self._forming_ts:
+            self._prev_row = _advance(self._committed, self._forming)
+        self._forming_ts = timestamp
+        self._forming = {"open": open, "high": high, "low": low, "close": close, "volume": volume}
+        self._row = _advance(self._committed.clone(), self._forming)
+        return self.values()
+
+    def values(self) -> dict[str, float]:
+        """Latest row (forming bar included), keyed like add_technical_indicators output."""
+        return {column: self._row.get(column, NAN) for column in PRICE_COLUMNS + INDICATOR_COLUMNS}
+
+    def previous_values(self) -> dict[str, float]:
+        """Row for the last closed bar, i.e. ``df.iloc[-2]`` of the recomputed frame."""
+        return {column: self._prev_row.get(column, NAN) for column in PRICE_COLUMNS + INDICATOR_COLUMNS}
+
+
+_states: dict[tuple[str, str], IndicatorState] = {}
+
+
+def clear_indicator_states() -> None:
+    """Drop every cached state so the next sync reseeds from stored candles."""
+    _states.clear()
+
+
+async def sync_indicator_state(
+    market_service: MarketDataService,
+    instrument_key: str,
+    interval: str,
+    seed_bars: int = 200,
+    reseed: bool = False,
+) -> IndicatorState:
+    """Return the shared state for (instrument, interval), folding in any new stored candles.
+
+    The first call (or ``reseed=True``, e.g. after a backfill of older bars) seeds
+    from the last ``seed_bars`` candles; later calls only read candles at or after
+    the state's latest timestamp.
+    """
+    key = (instrument_key, interval)
+    state = _states.get(key)
+    if reseed or state is None or state.last_timestamp is None:
+        candles = await market_service.recent_candles(instrument_key, interval, limit=seed_bars)
+        state = IndicatorState.from_candles(instrument_key, interval, candles)
+        _states[key] = state
+        return state
+    candles = await market_service.recent_candles(instrument_key, interval, limit=seed_bars, from_date=state.last_timestamp)
+    if len(candles) >= seed_bars:
+        # Too far behind to catch up bar by bar without gaps; reseed instead.
+        state = IndicatorState.from_candles(instrument_key, interval, candles)
+        _states[key] = state
+        return state
+    for candle in candles:
+        state.update(candle.timestamp, float(candle.open), float(candle.high), float(candle.low),
+                     float(candle.close), float(candle.volume))
+    return state
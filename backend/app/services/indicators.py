@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 from ta.momentum import RSIIndicator
 from ta.trend import ADXIndicator, EMAIndicator, MACD, SMAIndicator
@@ -58,3 +62,52 @@ def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
     
     return enriched.dropna().reset_index(drop=True)
 
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_indicator_executor() -> ProcessPoolExecutor | None:
+    """Shared process pool for indicator work; None when indicator_workers is 0."""
+    global _executor
+    if _executor is None:
+        from app.core.config import get_settings
+        workers = get_settings().indicator_workers
+        if workers <= 0:
+            return None
+        # spawn keeps the workers free of the parent's event loop and Mongo/Redis sockets
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_indicator_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def enrich_frames(frames: list[pd.DataFrame]) -> list[pd.DataFrame]:
+    """Run add_technical_indicators over a batch of frames (executed inside a pool worker)."""
+    return [add_technical_indicators(frame) for frame in frames]
+
+
+async def add_technical_indicators_async(df: pd.DataFrame) -> pd.DataFrame:
+    """add_technical_indicators off the event loop, in the indicator process pool."""
+    executor = get_indicator_executor()
+    if executor is None:
+        return add_technical_indicators(df)
+    return await asyncio.get_running_loop().run_in_executor(executor, add_technical_indicators, df)
+
+
+async def enrich_frames_async(frames: list[pd.DataFrame]) -> list[pd.DataFrame]:
+    """Enrich a batch of symbol frames, split into one chunk per pool worker."""
+    executor = get_indicator_executor()
+    if executor is None or len(frames) <= 1:
+        return [await add_technical_indicators_async(frame) for frame in frames]
+    from app.core.config import get_settings
+    workers = get_settings().indicator_workers
+    chunk_size = -(-len(frames) // workers)
+    chunks = [frames[i:i + chunk_size] for i in range(0, len(frames), chunk_size)]
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(loop.run_in_executor(executor, enrich_frames, chunk) for chunk in chunks))
+    return [frame for chunk in results for frame in chunk]
@@ -5,12 +5,12 @@ import logging
 from datetime import datetime, timezone
 from typing import Any
 
-import pandas as pd
-
 from app.core.config import get_settings
 from app.db.session import get_client
 from app.services.alerts import AlertService
-from app.services.indicators import add_technical_indicators
+from app.services.indicator_state import IndicatorState, sync_indicator_state
+from app.services.market_stream import set_stream_interest
+from app.services.quotes import fetch_quotes
 from app.services.upstox import UpstoxService
 
 logger = logging.getLogger(__name__)
@@ -64,23 +64,18 @@ def _db():
     return get_client()[settings.mongodb_db]
 
 
-def _scalping_signal(candles: list[dict], current_price: float) -> str | None:
+def _scalping_signal(state: IndicatorState, current_price: float) -> str | None:
     """
     Scalping signal based on 1-minute momentum and RSI.
     BUY: RSI < 40 and price rising
     SELL: RSI > 60 and price falling
     """
-    if len(candles) < 15:
+    if state.bars < 15 or not state.ready:
         return None
     
     try:
-        df = pd.DataFrame(candles)
-        df = add_technical_indicators(df)
-        if df.empty:
-            return None
-        
-        row = df.iloc[-1]
-        prev_row = df.iloc[-2]
+        row = state.values()
+        prev_row = state.previous_values()
         
         rsi = float(row.get("rsi_14", 50))
         prev_close = float(prev_row.get("close", current_price))
@@ -101,31 +96,27 @@ def _scalping_signal(candles: list[dict], current_price: float) -> str | None:
         return None
 
 
-async def _fetch_intraday_candles(upstox: UpstoxService, credential: Any, instrument_key: str, interval: str) -> list[dict]:
-    """Fetch intraday candles for scalping."""
+async def _intraday_indicator_state(upstox: UpstoxService, credential: Any, instrument_key: str, interval: str) -> IndicatorState:
+    """Incremental indicators for scalping, backfilling today's candles when the DB is short."""
     from app.services.market_data import MarketDataService
     db = _db()
     svc = MarketDataService(db)
     
-    # Try to get from DB first
-    candles = await svc.recent_candles(instrument_key, interval, limit=30)
+    # Fold any new stored candles into the running state
+    state = await sync_indicator_state(svc, instrument_key, interval)
     
     # If not enough, fetch from Upstox
-    if len(candles) < 15:
+    if state.bars < 15:
         try:
             today = datetime.now(timezone.utc).date().isoformat()
             data = await upstox.get_historical_candles(credential.access_token, instrument_key, interval, today, today)
             rows = data.get("data", {}).get("candles", [])
-            await svc.persist_candles(instrument_key, interval, rows)
-            candles = await svc.recent_candles(instrument_key, interval, limit=30)
+            await svc.upsert_candles(instrument_key, interval, rows)
+            state = await sync_indicator_state(svc, instrument_key, interval, reseed=True)
         except Exception as e:
             logger.warning("Could not load intraday candles for %s: %s", instrument_key, e)
     
-    return [
-        {"open": float(c.open), "high": float(c.high), "low": float(c.low),
-         "close": float(c.close), "volume": c.volume}
-        for c in candles
-    ]
+    return state
 
 
 async def _place_order(upstox: UpstoxService, credential: Any, instrument_key: str,
@@ -184,8 +175,8 @@ async def _run_scalping_cycle(db, state: dict) -> None:
         qty = int(open_pos.get("quantity", 0))
         
         # Get current price
-        quotes_resp = await upstox.get_quotes(credential.access_token, [instrument_key])
-        quote = (quotes_resp.get("data") or {}).get(instrument_key) or {}
+        quotes = await fetch_quotes(upstox, credential.access_token, [instrument_key])
+        quote = quotes.get(instrument_key) or {}
         current_price = float(quote.get("last_price") or entry_price)
         
         # Calculate time in position
@@ -241,9 +232,9 @@ async def _run_scalping_cycle(db, state: dict) -> None:
     
     # If specific stock selected, only trade that stock
     stocks_to_scan = [target_stock] if target_stock else WATCHLIST
+    await set_stream_interest("intraday_scalper", stocks_to_scan)
     
-    quotes_resp = await upstox.get_quotes(credential.access_token, stocks_to_scan)
-    quotes: dict = quotes_resp.get("data") or {}
+    quotes = await fetch_quotes(upstox, credential.access_token, stocks_to_scan)
     
     best_stock = None
     best_signal = None
@@ -255,8 +246,8 @@ async def _run_scalping_cycle(db, state: dict) -> None:
         if last_price == 0 or last_price > capital * 0.3:
             continue
         
-        candles = await _fetch_intraday_candles(upstox, credential, instrument_key, interval)
-        signal = _scalping_signal(candles, last_price)
+        ind_state = await _intraday_indicator_state(upstox, credential, instrument_key, interval)
+        signal = _scalping_signal(ind_state, last_price)
         
         if signal:
             best_stock = instrument_key
@@ -1,48 +1,100 @@
 from __future__ import annotations
 
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
+import numpy as np
+import pandas as pd
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
+from app.core.clock import simulated_now
 from app.models.trading import Candle
 
+logger = logging.getLogger(__name__)
+
+CANDLE_KEY_INDEX = [("instrument_key", ASCENDING), ("interval", ASCENDING), ("timestamp", ASCENDING)]
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+INTERVAL_SECONDS = {"1minute": 60, "5minute": 300, "30minute": 1800, "day": 86400}
+
 
 class MarketDataService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.col = db["candles"]
 
+    async def ensure_indexes(self) -> None:
+        """Create the unique (instrument_key, interval, timestamp) index used by bulk upserts."""
+        try:
+            await self.col.create_index(CANDLE_KEY_INDEX, unique=True, name="candle_key_unique")
+        except PyMongoError as exc:
+            logger.warning("Could not create unique candle index: %s", exc)
+
+    @staticmethod
+    def _candle_doc(instrument_key: str, interval: str, candle: list, source: str = "upstox") -> dict:
+        return {
+            "instrument_key": instrument_key,
+            "interval": interval,
+            "timestamp": datetime.fromisoformat(str(candle[0]).replace("Z", "+00:00")),
+            "open": float(candle[1]),
+            "high": float(candle[2]),
+            "low": float(candle[3]),
+            "close": float(candle[4]),
+            "volume": int(candle[5]),
+            "oi": int(candle[6]) if len(candle) > 6 and candle[6] is not None else None,
+            "source": source,
+        }
+
+    async def upsert_candles(self, instrument_key: str, interval: str, candle_rows: list[list]) -> dict[str, int]:
+        """Write a batch of candles with one unordered bulk upsert.
+
+        Rows are keyed on (instrument_key, interval, timestamp); existing bars are
+        overwritten so a re-fetched forming candle picks up its latest OHLCV.
+        """
+        return await self.upsert_candle_batch([(instrument_key, interval, candle) for candle in candle_rows])
+
+    async def upsert_candle_batch(self, rows: list[tuple[str, str, list]], source: str = "upstox") -> dict[str, int]:
+        """upsert_candles across instruments/intervals: ``(instrument_key, interval, candle_row)`` tuples."""
+        if not rows:
+            return {"received": 0, "inserted": 0, "updated": 0}
+
+        operations = []
+        for instrument_key, interval, candle in rows:
+            doc = self._candle_doc(instrument_key, interval, candle, source)
+            key = {"instrument_key": instrument_key, "interval": interval, "timestamp": doc["timestamp"]}
+            operations.append(UpdateOne(key, {"$set": doc}, upsert=True))
+
+        try:
+            result = await self.col.bulk_write(operations, ordered=False)
+            inserted, updated = result.upserted_count, result.modified_count
+        except BulkWriteError as exc:
+            # Unordered writes keep going past individual failures (e.g. a concurrent
+            # insert racing the unique index); report what did land.
+            details = exc.details
+            inserted, updated = details.get("nUpserted", 0), details.get("nModified", 0)
+            logger.warning("Bulk candle upsert of %d rows had %d write errors", len(rows), len(details.get("writeErrors", [])))
+        return {"received": len(rows), "inserted": inserted, "updated": updated}
+
     async def persist_candles(self, instrument_key: str, interval: str, candle_rows: list[list]) -> int:
-        inserted = 0
-        for candle in candle_rows:
-            ts = datetime.fromisoformat(str(candle[0]).replace("Z", "+00:00"))
-            exists = await self.col.find_one({"instrument_key": instrument_key, "interval": interval, "timestamp": ts})
-            if exists:
-                continue
-            await self.col.insert_one({
-                "instrument_key": instrument_key,
-                "interval": interval,
-                "timestamp": ts,
-                "open": float(candle[1]),
-                "high": float(candle[2]),
-                "low": float(candle[3]),
-                "close": float(candle[4]),
-                "volume": int(candle[5]),
-                "oi": int(candle[6]) if len(candle) > 6 and candle[6] is not None else None,
-                "source": "upstox",
-            })
-            inserted += 1
-        return inserted
+        result = await self.upsert_candles(instrument_key, interval, candle_rows)
+        return result["inserted"]
 
-    async def recent_candles(
-        self,
+    @staticmethod
+    def _candle_query(
         instrument_key: str,
         interval: str,
-        limit: int = 300,
-        from_date: datetime | None = None,
-        to_date: datetime | None = None,
-    ) -> list[Candle]:
+        from_date: datetime | None,
+        to_date: datetime | None,
+    ) -> dict[str, object]:
         query: dict[str, object] = {"instrument_key": instrument_key, "interval": interval}
+        replay_now = simulated_now()
+        if replay_now is not None:
+            # During a replay only bars that have closed by the simulated time exist.
+            closed_by = replay_now - timedelta(seconds=INTERVAL_SECONDS.get(interval, 0))
+            if to_date is not None and to_date.tzinfo is None:
+                to_date = to_date.replace(tzinfo=timezone.utc)
+            to_date = closed_by if to_date is None else min(to_date, closed_by)
         timestamp_query: dict[str, datetime] = {}
         if from_date is not None:
             timestamp_query["$gte"] = from_date
@@ -50,7 +102,17 @@ class MarketDataService:
             timestamp_query["$lte"] = to_date
         if timestamp_query:
             query["timestamp"] = timestamp_query
+        return query
 
+    async def recent_candles(
+        self,
+        instrument_key: str,
+        interval: str,
+        limit: int = 300,
+        from_date: datetime | None = None,
+        to_date: datetime | None = None,
+    ) -> list[Candle]:
+        query = self._candle_query(instrument_key, interval, from_date, to_date)
         cursor = self.col.find(query, sort=[("timestamp", -1)], limit=limit)
         docs = await cursor.to_list(length=limit)
         return list(reversed([
@@ -69,3 +131,41 @@ class MarketDataService:
             )
             for d in docs
         ]))
+
+    async def recent_candles_arrays(
+        self,
+        instrument_key: str,
+        interval: str,
+        limit: int | None = 300,
+        from_date: datetime | None = None,
+        to_date: datetime | None = None,
+        fields: tuple[str, ...] = OHLCV_FIELDS,
+    ) -> dict[str, np.ndarray]:
+        """Columnar variant of recent_candles: oldest-first float64 arrays plus a timestamp column.
+
+        Only ``timestamp`` and ``fields`` are projected from Mongo, and no per-row
+        Candle/Decimal objects are built. Missing values (e.g. ``oi``) become NaN.
+        ``limit=None`` reads every matching candle.
+        """
+        query = self._candle_query(instrument_key, interval, from_date, to_date)
+        projection = {"_id": 0, "timestamp": 1, **{field: 1 for field in fields}}
+        cursor = self.col.find(query, projection, sort=[("timestamp", -1)], limit=limit or 0)
+        docs = await cursor.to_list(length=limit)
+        docs.reverse()
+        arrays = {"timestamp": np.array([d["timestamp"] for d in docs], dtype="datetime64[ms]")}
+        for field in fields:
+            arrays[field] = np.array([d.get(field) for d in docs], dtype=np.float64)
+        return arrays
+
+    async def recent_candles_frame(
+        self,
+        instrument_key: str,
+        interval: str,
+        limit: int | None = 300,
+        from_date: datetime | None = None,
+        to_date: datetime | None = None,
+        fields: tuple[str, ...] = OHLCV_FIELDS,
+    ) -> pd.DataFrame:
+        """Same as recent_candles_arrays, wrapped in a DataFrame ready for add_technical_indicators."""
+        arrays = await self.recent_candles_arrays(instrument_key, interval, limit, from_date, to_date, fields)
+        return pd.DataFrame(arrays, copy=False)
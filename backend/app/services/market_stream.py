@@ -2,23 +2,147 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Iterable
+import logging
+import random
+import time
+from contextlib import suppress
+from itertools import islice
+from typing import Any, Iterable
 
 import websockets
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from app.core.config import get_settings
+from app.db.session import get_client
 from app.services.alerts import AlertService
+from app.services.bar_builder import BarBuilder
+from app.services.feed_decoder import FeedDecoder, Tick, tick_payload
+from app.services.market_data import MarketDataService
+from app.services.tick_store import ingest_feed, ingest_ticks
 from app.services.upstox import UpstoxService
 
+logger = logging.getLogger(__name__)
+
+_task: asyncio.Task | None = None
+_service: MarketStreamService | None = None
+# Frames waiting when the decoder frees up are decoded together, up to this many.
+FRAME_BATCH = 64
+# Ticks per published market.tick message.
+PUBLISH_BATCH = 500
+
+
+class TickConflator:
+    """Bounded hand-off between decoding and publishing that keeps only the latest tick per instrument.
+
+    A newer tick for an instrument still waiting replaces it (conflated); once
+    ``capacity`` instruments are waiting, ticks for further ones are dropped.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._pending: dict[str, Tick] = {}
+        self._ready = asyncio.Event()
+        self.stats = {"queued": 0, "conflated": 0, "dropped": 0}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, ticks: list[Tick]) -> None:
+        for tick in ticks:
+            key = tick.instrument_key
+            if key in self._pending:
+                self.stats["conflated"] += 1
+            elif len(self._pending) >= self.capacity:
+                self.stats["dropped"] += 1
+                continue
+            else:
+                self.stats["queued"] += 1
+            self._pending[key] = tick
+        if self._pending:
+            self._ready.set()
+
+    async def drain(self, limit: int) -> list[Tick]:
+        """Wait for pending ticks and take up to ``limit`` of them, longest-waiting instruments first."""
+        await self._ready.wait()
+        keys = list(islice(self._pending, limit))
+        batch = [self._pending.pop(key) for key in keys]
+        if not self._pending:
+            self._ready.clear()
+        return batch
+
 
 class MarketStreamService:
+    """Long-lived Upstox feed connection with runtime subscriptions.
+
+    Callers declare the instruments they need per owner (set_interest); the feed
+    subscription follows the union and is replayed after every reconnect. Ticks
+    update the tick store and bar builder as they are decoded; Redis publishing
+    runs in its own task behind a TickConflator, so a slow consumer delays only
+    the latest tick per instrument instead of backing up the socket.
+    """
+
     def __init__(self, db: AsyncIOMotorDatabase, user_id: str) -> None:
         self.db = db
         self.user_id = user_id
         self.upstox = UpstoxService(db)
         self.alerts = AlertService()
+        settings = get_settings()
+        self.decoder = FeedDecoder(settings.market_feed_decoder_workers)
+        self.bars = BarBuilder(MarketDataService(db), self.alerts) if settings.stream_bars_enabled else None
+        self.ticks = TickConflator(settings.market_stream_queue_instruments)
+        self.interest: dict[str, set[str]] = {}
+        self.subscribed: set[str] = set()
+        self._websocket: Any = None
+        self.stats = {"connects": 0, "reconnects": 0, "frames": 0, "frames_dropped": 0, "sync_errors": 0}
 
-    async def stream(self, instrument_keys: Iterable[str]) -> None:
+    def instruments(self) -> set[str]:
+        return set().union(*self.interest.values())
+
+    async def set_interest(self, owner: str, instrument_keys: Iterable[str]) -> None:
+        """Declare the instruments ``owner`` needs (empty releases them) and resync the subscription.
+
+        Never raises on feed trouble: a failed send is logged and the connection is
+        closed, so the reconnect replays the whole subscription.
+        """
+        keys = set(instrument_keys)
+        if keys:
+            self.interest[owner] = keys
+        else:
+            self.interest.pop(owner, None)
+        websocket = self._websocket
+        try:
+            await self._sync_subscriptions()
+        except Exception as exc:
+            self.stats["sync_errors"] += 1
+            logger.warning("Market stream subscription update failed (%s); it is replayed on reconnect", exc)
+            with suppress(Exception):
+                await websocket.close()
+
+    async def _sync_subscriptions(self) -> None:
+        websocket = self._websocket
+        if websocket is None:
+            return
+        wanted = self.instruments()
+        added, removed = wanted - self.subscribed, self.subscribed - wanted
+        # recorded before sending so concurrent callers diff against the same state;
+        # a failed send breaks the connection and the reconnect replays everything
+        self.subscribed = wanted
+        if removed:
+            await self._send(websocket, "unsub", removed)
+        if added:
+            await self._send(websocket, "sub", added)
+
+    async def _send(self, websocket: Any, method: str, instrument_keys: set[str]) -> None:
+        await websocket.send(json.dumps({
+            "guid": "benx-market-stream",
+            "method": method,
+            "data": {"mode": "full", "instrumentKeys": sorted(instrument_keys)},
+        }))
+
+    async def stream(self, instrument_keys: Iterable[str] | None = None) -> None:
+        """Run one connection: subscribe to the current interest and process frames until it fails."""
+        if instrument_keys is not None:
+            self.interest["default"] = set(instrument_keys)
         credential = await self.upstox.get_credential(self.user_id)
         auth_response = await self.upstox.get_websocket_authorization(credential.access_token)
         authorized_url = auth_response.get("data", {}).get("authorized_redirect_uri") or auth_response.get("data", {}).get("authorized_redirect_url")
@@ -26,31 +150,162 @@ class MarketStreamService:
             raise RuntimeError("Upstox websocket authorization URL was not returned")
 
         async with websockets.connect(authorized_url, ping_interval=20, ping_timeout=20) as websocket:
-            await websocket.send(json.dumps({
-                "guid": "benx-market-stream",
-                "method": "sub",
-                "data": {"mode": "full", "instrumentKeys": list(instrument_keys)},
-            }))
-            while True:
-                raw = await websocket.recv()
-                self.alerts.publish("market.tick", self._normalize(raw))
+            self.stats["connects"] += 1
+            self._websocket = websocket
+            self.subscribed = set()
+            frames: asyncio.Queue = asyncio.Queue(maxsize=get_settings().market_stream_frame_queue)
+            tasks = [asyncio.create_task(self._read(websocket, frames)), asyncio.create_task(self._publish())]
+            if self.bars:
+                tasks.append(asyncio.create_task(self._flush_bars()))
+            try:
+                await self._sync_subscriptions()
+                while True:
+                    batch = [await frames.get()]
+                    while not frames.empty() and len(batch) < FRAME_BATCH:
+                        batch.append(frames.get_nowait())
+                    failure = next((frame for frame in batch if isinstance(frame, Exception)), None)
+                    await self._dispatch([frame for frame in batch if not isinstance(frame, Exception)])
+                    if failure is not None:
+                        raise failure
+            finally:
+                self._websocket = None
+                for task in tasks:
+                    task.cancel()
 
-    def _normalize(self, raw: str | bytes) -> dict:
-        if isinstance(raw, bytes):
+    async def run(self) -> None:
+        """Stream until cancelled, reconnecting with jittered exponential backoff."""
+        settings = get_settings()
+        base, ceiling = settings.market_stream_backoff_base_seconds, settings.market_stream_backoff_max_seconds
+        failures = 0
+        while True:
+            started = time.monotonic()
             try:
-                raw = raw.decode("utf-8")
-            except UnicodeDecodeError:
-                return {"raw": list(raw)}
+                await self.stream()
+            except Exception as exc:
+                if time.monotonic() - started > ceiling:
+                    failures = 0  # the connection was healthy for a while; start the backoff over
+                failures += 1
+                cap = min(ceiling, base * 2 ** (failures - 1))
+                delay = cap / 2 + random.uniform(0, cap / 2)
+                self.stats["reconnects"] += 1
+                logger.warning("Market stream disconnected (%s); reconnecting in %.1fs", exc, delay)
+                self.alerts.publish("risk.warning", {"message": f"market stream disconnected: {exc}", "retry_in_seconds": round(delay, 1)})
+                await asyncio.sleep(delay)
+
+    async def _read(self, websocket: Any, frames: asyncio.Queue) -> None:
+        """Move frames off the socket while the previous batch decodes.
+
+        When the queue is full the oldest frame is dropped; a failure is queued for the consumer.
+        """
+        try:
+            while True:
+                frame = await websocket.recv()
+                self.stats["frames"] += 1
+                if frames.full():
+                    frames.get_nowait()
+                    self.stats["frames_dropped"] += 1
+                frames.put_nowait(frame)
+        except Exception as exc:
+            if frames.full():
+                frames.get_nowait()
+            frames.put_nowait(exc)
+
+    async def _dispatch(self, batch: list[bytes | str]) -> None:
+        """Binary frames go through the protobuf decoder; JSON text frames are stored as-is."""
+        ticks = await self.decoder.decode([frame for frame in batch if isinstance(frame, bytes)])
+        if ticks:
+            ingest_ticks(ticks)
+            if self.bars:
+                self.bars.add_ticks(ticks)
+            self.ticks.put(ticks)
+        for frame in batch:
+            if isinstance(frame, str):
+                message = self._normalize(frame)
+                ingest_feed(message)
+                self.alerts.publish("market.tick", message)
+
+    async def _publish(self) -> None:
+        while True:
+            ticks = await self.ticks.drain(PUBLISH_BATCH)
+            self.alerts.publish("market.tick", {"ticks": [tick_payload(tick) for tick in ticks]})
+            await asyncio.sleep(0)
+
+    async def _flush_bars(self) -> None:
+        """Periodically close bars of quiet instruments and write the closed bars."""
+        interval = get_settings().stream_bar_flush_seconds
+        while True:
+            await asyncio.sleep(interval)
+            self.bars.close_due()
+            await self.bars.flush()
+
+    def _normalize(self, raw: str) -> dict:
         try:
             return json.loads(raw)
         except json.JSONDecodeError:
             return {"raw": raw}
 
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            **self.stats,
+            "connected": self._websocket is not None,
+            "subscribed": len(self.subscribed),
+            "interest": {owner: len(keys) for owner, keys in self.interest.items()},
+            "publish_queue": {**self.ticks.stats, "waiting": len(self.ticks)},
+            "bars": self.bars.stats if self.bars else None,
+        }
 
-async def run_forever(service: MarketStreamService, instrument_keys: Iterable[str], retry_delay: int = 5) -> None:
-    while True:
-        try:
-            await service.stream(instrument_keys)
-        except Exception as exc:
-            service.alerts.publish("risk.warning", {"message": f"market stream disconnected: {exc}"})
-            await asyncio.sleep(retry_delay)
+
+async def run_forever(service: MarketStreamService, instrument_keys: Iterable[str] = ()) -> None:
+    """Run the stream with ``instrument_keys`` always subscribed (if any) on top of the owners' interest."""
+    keys = set(instrument_keys)
+    if keys:
+        service.interest["default"] = keys
+    await service.run()
+
+
+async def set_stream_interest(owner: str, instrument_keys: Iterable[str]) -> None:
+    """Have the running market stream cover ``instrument_keys`` for ``owner``; a no-op when not streaming."""
+    if _service is not None:
+        await _service.set_interest(owner, instrument_keys)
+
+
+def get_stream_stats() -> dict[str, Any] | None:
+    return _service.get_stats() if _service is not None else None
+
+
+async def _stream_default_user(instrument_keys: list[str]) -> None:
+    global _service
+    settings = get_settings()
+    db = get_client()[settings.mongodb_db]
+    user = await db["users"].find_one({"email": settings.default_admin_email})
+    if user is None:
+        logger.warning("Market stream not started: no user %s", settings.default_admin_email)
+        return
+    _service = MarketStreamService(db, str(user["_id"]))
+    try:
+        await run_forever(_service, instrument_keys)
+    finally:
+        _service.decoder.close()
+        _service = None
+
+
+def start_market_stream(instrument_keys: list[str] | None = None) -> None:
+    """Keep the tick store fed from the Upstox feed for the default user (background task).
+
+    Only ``instrument_keys`` (default: the market_stream_default_instruments setting) are
+    held permanently; everything else is subscribed as traders declare interest.
+    """
+    global _task
+    if _task is not None and not _task.done():
+        return
+    if instrument_keys is None:
+        instrument_keys = get_settings().market_stream_default_keys
+    _task = asyncio.get_event_loop().create_task(_stream_default_user(instrument_keys))
+    logger.info("Market stream task created")
+
+
+def stop_market_stream() -> None:
+    global _task
+    if _task and not _task.done():
+        _task.cancel()
+    _task = None
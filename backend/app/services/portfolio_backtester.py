@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from app.services.backtester import DEFAULT_PARAMS, StrategyParams, macd_lines, performance_metrics
+from app.services.indicator_panel import build_price_panel, compute_indicator_panel
+from app.services.indicators import get_indicator_executor
+from trading_engine.risk import EnhancedRiskManager
+
+
+@dataclass(frozen=True)
+class PortfolioConfig:
+    """Portfolio rules; defaults follow the live auto-trader's state defaults."""
+
+    strategy: StrategyParams = field(default_factory=StrategyParams)
+    max_positions: int = 3
+    stop_loss_pct: float = 0.75
+    profit_target_pct: float = 1.5
+    trailing_stop_enabled: bool = True
+    daily_loss_limit: float = 2000.0
+    max_trades_per_day: int = 10
+    risk_per_trade_pct: float = 1.0
+    max_position_size_pct: float = 20.0
+    confidence: float = 0.6
+
+
+@dataclass
+class _Position:
+    row: int
+    quantity: int
+    entry_price: float
+    initial_stop: float
+    stop: float
+    target: float
+
+
+def align_frames(frames: dict[str, pd.DataFrame], params: StrategyParams = DEFAULT_PARAMS) -> dict:
+    """Indicators per symbol on its own history, scattered onto one shared timeline.
+
+    Returns (symbols x time) arrays for prices, RSI, ATR and the buy/sell masks,
+    with NaN (or False) where a symbol has no bar at that timestamp.
+    """
+    keys = list(frames)
+    timeline = np.unique(np.concatenate([frame["timestamp"].to_numpy(dtype="datetime64[ms]") for frame in frames.values()]))
+    panel = build_price_panel(list(frames.values()))
+    indicators = compute_indicator_panel(panel["open"], panel["high"], panel["low"], panel["close"], panel["volume"])
+    periods = (params.macd_fast, params.macd_slow, params.macd_signal)
+    if periods != (DEFAULT_PARAMS.macd_fast, DEFAULT_PARAMS.macd_slow, DEFAULT_PARAMS.macd_signal):
+        lines = [macd_lines(panel["close"][row], *periods) for row in range(len(keys))]
+        complete = ~np.isnan(indicators["close"])
+        indicators["macd"] = np.where(complete, np.stack([macd for macd, _ in lines]), np.nan)
+        indicators["macd_signal"] = np.where(complete, np.stack([signal for _, signal in lines]), np.nan)
+
+    with np.errstate(invalid="ignore"):
+        buy = (indicators["rsi_14"] < params.rsi_buy) & (indicators["macd"] > indicators["macd_signal"])
+        sell = (indicators["rsi_14"] > params.rsi_sell) & (indicators["macd"] < indicators["macd_signal"])
+
+    length = panel["close"].shape[1]
+    aligned = {name: np.full((len(keys), len(timeline)), np.nan) for name in ("open", "high", "low", "close", "rsi_14", "atr_14")}
+    aligned["buy"] = np.zeros((len(keys), len(timeline)), dtype=bool)
+    aligned["sell"] = np.zeros((len(keys), len(timeline)), dtype=bool)
+    for row, frame in enumerate(frames.values()):
+        columns = np.searchsorted(timeline, frame["timestamp"].to_numpy(dtype="datetime64[ms]"))
+        source = slice(length - len(frame), length)
+        for name in ("open", "high", "low", "close"):
+            aligned[name][row, columns] = panel[name][row, source]
+        for name in ("rsi_14", "atr_14"):
+            aligned[name][row, columns] = indicators[name][row, source]
+        aligned["buy"][row, columns] = buy[row, source]
+        aligned["sell"][row, columns] = sell[row, source]
+    aligned["keys"] = keys
+    aligned["timeline"] = timeline
+    return aligned
+
+
+def simulate_portfolio(aligned: dict, capital: float, config: PortfolioConfig) -> dict:
+    """Replay every symbol bar by bar with shared cash and the live engine's risk rules.
+
+    Exits are checked before entries on each bar: stop (initial or trailing) at
+    the stop price or a gap-through open, then the profit target, then the
+    strategy's sell signal at the close. New longs are opened at the close on buy
+    signals, most oversold RSI first, sized by EnhancedRiskManager and capped by
+    free cash, max_positions, max_trades_per_day and the daily loss limit.
+    """
+    keys = aligned["keys"]
+    timeline = aligned["timeline"]
+    risk = EnhancedRiskManager(
+        daily_loss_limit=config.daily_loss_limit,
+        max_capital_allocation=capital,
+        risk_per_trade_pct=config.risk_per_trade_pct,
+        max_position_size_pct=config.max_position_size_pct,
+    )
+    opens, highs, lows, closes = (aligned[name] for name in ("open", "high", "low", "close"))
+    marks = pd.DataFrame(closes.T).ffill().to_numpy().T
+    atr = aligned["atr_14"]
+    rsi = aligned["rsi_14"]
+    buy_rows = [np.flatnonzero(column).tolist() for column in aligned["buy"].T]
+    sells = aligned["sell"]
+    days = timeline.astype("datetime64[D]")
+
+    cash = capital
+    positions: dict[int, _Position] = {}
+    equity_curve = np.empty(len(timeline))
+    per_symbol = {key: {"trades": 0, "pnl": 0.0} for key in keys}
+    closed = 0
+    wins = 0
+    day = None
+    day_pnl = 0.0
+    day_trades = 0
+    blocked_entries = 0
+
+    for t in range(len(timeline)):
+        if days[t] != day:
+            day, day_pnl, day_trades = days[t], 0.0, 0
+
+        for row in list(positions):
+            bar_low = lows[row, t]
+            if math.isnan(bar_low):
+                continue
+            position = positions[row]
+            bar_open = opens[row, t]
+            exit_price = None
+            if bar_low <= position.stop:
+                exit_price = min(bar_open, position.stop)
+            elif highs[row, t] >= position.target:
+                exit_price = max(bar_open, position.target)
+            elif sells[row, t]:
+                exit_price = closes[row, t]
+            if exit_price is None:
+                if config.trailing_stop_enabled:
+                    position.stop = max(position.stop, risk.calculate_trailing_stop(
+                        position.entry_price, closes[row, t], position.initial_stop,
+                    ))
+                continue
+            exit_price = float(exit_price)
+            pnl = (exit_price - position.entry_price) * position.quantity
+            cash += exit_price * position.quantity
+            risk.update_performance(pnl)
+            per_symbol[keys[row]]["trades"] += 1
+            per_symbol[keys[row]]["pnl"] += pnl
+            closed += 1
+            wins += pnl > 0
+            day_pnl += pnl
+            day_trades += 1
+            del positions[row]
+
+        candidates = [row for row in buy_rows[t] if row not in positions]
+        if candidates:
+            halted, _ = risk.check_daily_limit(day_pnl)
+            for row in sorted(candidates, key=lambda r: rsi[r, t]):
+                if halted or len(positions) >= config.max_positions or day_trades >= config.max_trades_per_day:
+                    blocked_entries += 1
+                    continue
+                price = float(closes[row, t])
+                if config.strategy.atr_stop_multiplier > 0 and atr[row, t] > 0:
+                    stop = price - config.strategy.atr_stop_multiplier * float(atr[row, t])
+                else:
+                    stop = price * (1 - config.stop_loss_pct / 100)
+                quantity = risk.calculate_position_size(price, stop, config.confidence, float(atr[row, t]))
+                quantity = min(quantity, math.floor(cash / price))
+                if quantity <= 0:
+                    blocked_entries += 1
+                    continue
+                cash -= quantity * price
+                positions[row] = _Position(
+                    row=row,
+                    quantity=quantity,
+                    entry_price=price,
+                    initial_stop=stop,
+                    stop=stop,
+                    target=price * (1 + config.profit_target_pct / 100),
+                )
+                day_trades += 1
+
+        equity_curve[t] = cash + sum(marks[row, t] * position.quantity for row, position in positions.items())
+
+    metrics = performance_metrics(equity_curve, capital, closed, wins)
+    metrics.update({
+        "symbols": len(keys),
+        "bars": len(timeline),
+        "open_positions": [keys[row] for row in positions],
+        "blocked_entries": blocked_entries,
+        "per_symbol": per_symbol,
+        "risk": risk.get_performance_stats(),
+    })
+    return metrics
+
+
+def run_portfolio_backtest(frames: dict[str, pd.DataFrame], capital: float, config: PortfolioConfig) -> dict:
+    frames = {key: frame for key, frame in frames.items() if not frame.empty}
+    if not frames:
+        raise ValueError("No historical data loaded for these instruments")
+    return simulate_portfolio(align_frames(frames, config.strategy), capital, config)
+
+
+async def run_portfolio_backtest_async(frames: dict[str, pd.DataFrame], capital: float, config: PortfolioConfig) -> dict:
+    """run_portfolio_backtest in the indicator process pool, keeping the event loop free."""
+    executor = get_indicator_executor()
+    if executor is None:
+        return run_portfolio_backtest(frames, capital, config)
+    return await asyncio.get_running_loop().run_in_executor(executor, run_portfolio_backtest, frames, capital, config)
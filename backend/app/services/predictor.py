@@ -1,13 +1,53 @@
 from __future__ import annotations
 
+import logging
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any
 
 import numpy as np
 import pandas as pd
 
 from app.core.config import get_settings
-from app.services.indicators import add_technical_indicators
+from app.services.indicators import add_technical_indicators, add_technical_indicators_async
+
+logger = logging.getLogger(__name__)
+
+LSTM_LABELS = ("SELL", "HOLD", "BUY")
+
+
+class _StreamState:
+    """Streaming-LSTM (h, c) for one instrument, committed through its last closed bar."""
+
+    __slots__ = ("h", "c", "last_bar", "steps")
+
+    def __init__(self, h: Any, c: Any, last_bar: pd.Timestamp, steps: int) -> None:
+        self.h = h
+        self.c = c
+        self.last_bar = last_bar
+        self.steps = steps
+
+
+# Streaming state per (instrument, bar size), shared by every PredictionService (services are
+# per scan), so daily and intraday predictions for one instrument keep separate states.
+_stream_states: dict[tuple[str, pd.Timedelta], _StreamState] = {}
+# Window-model runners by (runtime, model path, mtime): sessions and quantized copies are built once.
+_runners: dict[tuple[str, str, float], Any] = {}
+
+
+def _window_runner(runtime: str, model: Any, model_path: Path) -> Any:
+    from ai_models.runtime import load_runner
+    key = (runtime, str(model_path), model_path.stat().st_mtime)
+    if key not in _runners:
+        # a retrained model has a new mtime: release the sessions built for the old one
+        for stale in [k for k in _runners if k[:2] == key[:2]]:
+            del _runners[stale]
+        try:
+            _runners[key] = load_runner(runtime, model, model_path)
+        except Exception as exc:
+            logger.warning("LSTM runtime %r unavailable (%s); using eager PyTorch", runtime, exc)
+            _runners[key] = load_runner("eager", model, model_path)
+    return _runners[key]
 
 
 class PredictionService:
@@ -18,17 +58,27 @@ class PredictionService:
     def _try_load_lstm(self) -> None:
         self._lstm = None
         self._scaler = None
+        self._streaming = False
         try:
             import joblib, torch
             from ai_models.features import FEATURE_COLUMNS
-            from ai_models.lstm_model import LSTMClassifier
+            from ai_models.lstm_model import LSTMClassifier, StreamingLSTMClassifier
             mp = Path(self.settings.model_path)
             sp = Path(self.settings.scaler_path)
+            streaming_path = Path(self.settings.lstm_streaming_model_path)
             if mp.exists() and sp.exists():
-                model = LSTMClassifier(input_size=len(FEATURE_COLUMNS), hidden_size=128, num_layers=2, num_classes=3)
+                # the streaming variant falls back to the bidirectional model until it has been trained
+                if self.settings.lstm_variant == "streaming" and streaming_path.exists():
+                    model = StreamingLSTMClassifier(input_size=len(FEATURE_COLUMNS), hidden_size=128, num_layers=2, num_classes=3)
+                    mp = streaming_path
+                    self._streaming = True
+                else:
+                    model = LSTMClassifier(input_size=len(FEATURE_COLUMNS), hidden_size=128, num_layers=2, num_classes=3)
                 model.load_state_dict(torch.load(mp, map_location="cpu", weights_only=False))
                 model.eval()
                 self._lstm = model
+                # lstm_runtime applies to the window model; the streaming model runs eager
+                self._runner = _window_runner("eager" if self._streaming else self.settings.lstm_runtime, model, mp)
                 self._scaler = joblib.load(sp)
                 self._feature_cols = FEATURE_COLUMNS
         except Exception:
@@ -197,24 +247,129 @@ class PredictionService:
         }
         return signal, round(confidence, 4), indicators
 
-    def _lstm_signal(self, df: pd.DataFrame) -> tuple[str, float] | None:
-        if self._lstm is None or self._scaler is None:
+    def _lstm_window(self, df: pd.DataFrame, length: int = 60) -> pd.DataFrame | None:
+        """Unscaled feature rows for the last ``length`` bars, or None if the frame has under 60 bars."""
+        from ai_models.features import prepare_inference_frame
+        if len(df) < 60:
             return None
+        # 10 extra bars cover the longest lookback among the derived features (volatility_10)
+        return prepare_inference_frame(df.tail(length + 10)).tail(length)[self._feature_cols]
+
+    def _scale(self, windows: list[pd.DataFrame], length: int) -> np.ndarray:
+        """(N, length, F) float32 batch from N unscaled windows, with one scaler call."""
+        return self._scaler.transform(pd.concat(windows)).astype(np.float32).reshape(len(windows), length, -1)
+
+    @staticmethod
+    def _label(probs: np.ndarray) -> tuple[str, float]:
+        idx = int(np.argmax(probs))
+        return LSTM_LABELS[idx], float(probs[idx])
+
+    def _lstm_signals(self, frames: list[pd.DataFrame], keys: list[str] | None = None) -> list[tuple[str, float] | None]:
+        """LSTM signal per frame from a single batched forward pass; None where unavailable.
+
+        With the streaming model and instrument ``keys``, cached per-instrument state is used.
+        """
+        results: list[tuple[str, float] | None] = [None] * len(frames)
+        if self._lstm is None or self._scaler is None or not frames:
+            return results
+        if self._streaming and keys is not None:
+            return self._streamed_signals(keys, frames)
+        windows, positions = [], []
+        for position, df in enumerate(frames):
+            try:
+                window = self._lstm_window(df)
+            except Exception:
+                continue
+            if window is not None:
+                windows.append(window)
+                positions.append(position)
+        if not windows:
+            return results
         try:
-            import torch
-            from ai_models.features import prepare_inference_frame
-            features = prepare_inference_frame(df)
-            latest = features.tail(60)
-            if len(latest) < 60:
-                return None
-            scaled = self._scaler.transform(latest[self._feature_cols])
-            tensor = torch.tensor(np.expand_dims(scaled, axis=0), dtype=torch.float32)
-            with torch.no_grad():
-                probs = torch.softmax(self._lstm(tensor), dim=1).numpy()[0]
-            idx = int(np.argmax(probs))
-            return ["SELL", "HOLD", "BUY"][idx], float(np.max(probs))
+            logits = self._runner(self._scale(windows, 60))
         except Exception:
-            return None
+            return results
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        for position, row in zip(positions, probs):
+            results[position] = self._label(row)
+        return results
+
+    def _streamed_signals(self, keys: list[str], frames: list[pd.DataFrame]) -> list[tuple[str, float] | None]:
+        """Streaming-model signals from each instrument's cached (h, c) for its bar size.
+
+        As in IndicatorState, the cached state only covers closed bars (through
+        ``iloc[-2]``); the last, possibly still forming, bar is evaluated with a
+        throwaway step from it on every call. State one closed bar behind commits
+        that bar with a single step first. The bar size is the smallest spacing in
+        the window, so overnight and weekend gaps do not change it. Instruments
+        without usable state (first sight, missed bars, or lstm_stream_rewarm_bars
+        steps since the last warm-up) are re-warmed from their previous 59 bars.
+        Each stage is one batched pass; frames that cannot be read (e.g. no
+        ``timestamp``) are left out and logged.
+        """
+        import torch
+        results: list[tuple[str, float] | None] = [None] * len(frames)
+        rewarm_bars = self.settings.lstm_stream_rewarm_bars
+        # (position, state key, unscaled rows ending at the last bar, last closed bar, committed state)
+        pending: list[tuple[int, tuple[str, pd.Timedelta], pd.DataFrame, pd.Timestamp, _StreamState | None]] = []
+        skipped: list[str] = []
+        for position, (key, df) in enumerate(zip(keys, frames)):
+            if len(df) < 60:
+                continue
+            try:
+                bars = df["timestamp"].iloc[-60:]
+                closed = bars.iloc[-2]
+                state_key = (key, bars.diff().min())
+                state = _stream_states.get(state_key)
+                if state is not None and state.steps < rewarm_bars:
+                    if state.last_bar == closed:
+                        pending.append((position, state_key, self._lstm_window(df, 1), closed, state))
+                        continue
+                    if state.last_bar == bars.iloc[-3]:
+                        pending.append((position, state_key, self._lstm_window(df, 2), closed, state))
+                        continue
+                pending.append((position, state_key, self._lstm_window(df), closed, None))
+            except Exception as exc:
+                skipped.append(f"{key} ({exc!r})")
+        if skipped:
+            logger.warning("Streaming LSTM skipped %d instruments: %s", len(skipped), ", ".join(skipped[:5]))
+        if not pending:
+            return results
+
+        def commit(indices: list[int], h: torch.Tensor, c: torch.Tensor, states: list) -> None:
+            for i, index in enumerate(indices):
+                _, state_key, _, closed, previous = pending[index]
+                steps = previous.steps + 1 if previous is not None else 0
+                states[index] = _stream_states[state_key] = _StreamState(h[:, i:i + 1].clone(), c[:, i:i + 1].clone(), closed, steps)
+
+        try:
+            lengths = [len(item[2]) for item in pending]
+            scaled = self._scaler.transform(pd.concat([item[2] for item in pending])).astype(np.float32)
+            rows = np.split(scaled, np.cumsum(lengths)[:-1])
+            states = [item[4] for item in pending]
+            with torch.inference_mode():
+                warm = [index for index, state in enumerate(states) if state is None]
+                if warm:
+                    _, (h, c) = self._lstm.warm(torch.from_numpy(np.stack([rows[index][:-1] for index in warm])))
+                    commit(warm, h, c, states)
+                advance = [index for index, length in enumerate(lengths) if length == 2]
+                if advance:
+                    previous = (torch.cat([states[index].h for index in advance], dim=1), torch.cat([states[index].c for index in advance], dim=1))
+                    _, (h, c) = self._lstm.step(torch.from_numpy(np.stack([rows[index][0] for index in advance])), previous)
+                    commit(advance, h, c, states)
+                committed = (torch.cat([state.h for state in states], dim=1), torch.cat([state.c for state in states], dim=1))
+                logits, _ = self._lstm.step(torch.from_numpy(np.stack([rows[index][-1] for index in range(len(pending))])), committed)
+            probs = torch.softmax(logits, dim=1).numpy()
+        except Exception:
+            logger.exception("Streaming LSTM pass failed for %d instruments", len(pending))
+            return results
+        for item, row in zip(pending, probs):
+            results[item[0]] = self._label(row)
+        return results
+
+    def _lstm_signal(self, df: pd.DataFrame, instrument_key: str | None = None) -> tuple[str, float] | None:
+        return self._lstm_signals([df], None if instrument_key is None else [instrument_key])[0]
 
     def predict(self, instrument_key: str, candles: list) -> dict:
         cols = ["timestamp", "open", "high", "low", "close", "volume", "oi"]
@@ -223,12 +378,39 @@ class PredictionService:
         for col in ["open", "high", "low", "close"]:
             frame[col] = frame[col].astype(float)
         frame["volume"] = frame["volume"].astype(float)
-        df = add_technical_indicators(frame)
+        return self.predict_frame(instrument_key, frame)
+
+    def predict_frame(self, instrument_key: str, frame: pd.DataFrame) -> dict:
+        """Predict from a float OHLCV frame, e.g. MarketDataService.recent_candles_frame."""
+        return self.predict_enriched(instrument_key, add_technical_indicators(frame))
+
+    async def predict_frame_async(self, instrument_key: str, frame: pd.DataFrame) -> dict:
+        """predict_frame with the indicator stage offloaded to the indicator process pool."""
+        return self.predict_enriched(instrument_key, await add_technical_indicators_async(frame))
+
+    def predict_enriched(self, instrument_key: str, df: pd.DataFrame) -> dict:
+        """Predict from a frame that already went through add_technical_indicators."""
         if df.empty:
             raise RuntimeError("Not enough candle data for indicators.")
+        return self._predict(instrument_key, df, self._lstm_signal(df, instrument_key))
+
+    def predict_enriched_many(self, frames: dict[str, pd.DataFrame]) -> dict[str, dict]:
+        """predict_enriched for many instruments, with one batched LSTM pass for all of them.
+
+        Instruments whose prediction fails (e.g. an empty frame) are left out.
+        """
+        keys = [key for key, df in frames.items() if not df.empty]
+        lstm_results = self._lstm_signals([frames[key] for key in keys], keys)
+        predictions = {}
+        for key, lstm_result in zip(keys, lstm_results):
+            try:
+                predictions[key] = self._predict(key, frames[key], lstm_result)
+            except Exception:
+                continue
+        return predictions
 
+    def _predict(self, instrument_key: str, df: pd.DataFrame, lstm_result: tuple[str, float] | None) -> dict:
         ind_signal, ind_conf, indicators = self._indicator_signal(df)
-        lstm_result = self._lstm_signal(df)
 
         # Blend LSTM + indicators if LSTM available
         if lstm_result:
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from app.core.clock import simulated_now
+from app.core.config import get_settings
+from app.services.tick_store import fresh_ticks
+
+logger = logging.getLogger(__name__)
+
+# Upstox v2 market-quote accepts at most this many instrument keys per request.
+UPSTOX_QUOTE_LIMIT = 500
+
+# Short-TTL cache shared by every caller in the process: instrument_key -> (monotonic time, quote).
+_cache: dict[str, tuple[float, dict[str, Any]]] = {}
+# Upstream fetches in progress, so concurrent callers for the same key share one request.
+_inflight: dict[str, asyncio.Task] = {}
+_inflight_loop: asyncio.AbstractEventLoop | None = None
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+
+def _by_instrument(data: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Re-key quote data by instrument key; Upstox keys it by "EXCHANGE:SYMBOL"."""
+    return {quote.get("instrument_token") or key: quote for key, quote in data.items() if quote}
+
+
+async def _fetch_batched(upstox: Any, access_token: str, keys: list[str], batch_size: int | None) -> dict[str, dict[str, Any]]:
+    size = max(1, min(batch_size or get_settings().upstox_quote_batch_size, UPSTOX_QUOTE_LIMIT))
+    chunks = [keys[start:start + size] for start in range(0, len(keys), size)]
+    responses = await asyncio.gather(
+        *(upstox.get_quotes(access_token, chunk) for chunk in chunks),
+        return_exceptions=True,
+    )
+    errors = [response for response in responses if isinstance(response, Exception)]
+    if errors and len(errors) == len(responses):
+        raise errors[0]
+    quotes: dict[str, dict[str, Any]] = {}
+    for chunk, response in zip(chunks, responses):
+        if isinstance(response, Exception):
+            logger.warning("Quote batch of %d instruments failed: %s", len(chunk), response)
+            continue
+        quotes.update(_by_instrument(response.get("data") or {}))
+    return quotes
+
+
+def _settle(task: asyncio.Task, keys: list[str]) -> None:
+    """Done-callback of a shared fetch: release its keys and cache what came back."""
+    for key in keys:
+        if _inflight.get(key) is task:
+            del _inflight[key]
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        _stats["errors"] += 1
+        return
+    fetched_at = time.monotonic()
+    for key, quote in task.result().items():
+        _cache[key] = (fetched_at, quote)
+
+
+async def fetch_quotes(
+    upstox: Any,
+    access_token: str,
+    instrument_keys: list[str],
+    batch_size: int | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Quotes for every instrument, served from live ticks or the short-TTL cache where fresh.
+
+    Keys are de-duplicated; instruments with a recent websocket tick are served
+    from the tick store, fresh cached quotes are returned as-is, keys already
+    being fetched by another caller wait on that request, and the rest are split
+    into chunks of at most ``batch_size`` (capped at the API limit) fetched
+    concurrently. Returns ``{instrument_key: quote}``; instruments Upstox has no
+    quote for are simply absent. A failed chunk is logged and skipped, but if
+    nothing could be served the first error is raised.
+
+    Ticks and cache are bypassed during a replay, where the simulated clock
+    moves faster than either; the cache also when ``upstox_quote_cache_ttl_ms`` is 0.
+    """
+    global _inflight_loop
+    keys = list(dict.fromkeys(key for key in instrument_keys if key))
+    if not keys:
+        return {}
+    if simulated_now() is not None:
+        return await _fetch_batched(upstox, access_token, keys, batch_size)
+    quotes, keys = fresh_ticks(keys)
+    if not keys:
+        return quotes
+    ttl = get_settings().upstox_quote_cache_ttl_ms / 1000
+    if ttl <= 0:
+        try:
+            quotes.update(await _fetch_batched(upstox, access_token, keys, batch_size))
+        except Exception as exc:
+            if not quotes:
+                raise
+            logger.warning("Quote fetch for %d stale instruments failed: %s", len(keys), exc)
+        return quotes
+
+    loop = asyncio.get_running_loop()
+    if _inflight_loop is not loop:
+        _inflight.clear()
+        _inflight_loop = loop
+
+    now = time.monotonic()
+    pending: dict[asyncio.Task, list[str]] = {}
+    missing: list[str] = []
+    for key in keys:
+        cached = _cache.get(key)
+        if cached is not None and now - cached[0] < ttl:
+            quotes[key] = cached[1]
+            _stats["hits"] += 1
+        elif key in _inflight:
+            pending.setdefault(_inflight[key], []).append(key)
+            _stats["coalesced"] += 1
+        else:
+            missing.append(key)
+            _stats["misses"] += 1
+    if missing:
+        task = asyncio.ensure_future(_fetch_batched(upstox, access_token, missing, batch_size))
+        task.add_done_callback(lambda done, fetched=missing: _settle(done, fetched))
+        for key in missing:
+            _inflight[key] = task
+        pending[task] = missing
+
+    # shield: a caller being cancelled must not cancel a fetch other callers are waiting on
+    results = await asyncio.gather(*(asyncio.shield(task) for task in pending), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors and not quotes and len(errors) == len(results):
+        raise errors[0]
+    for wanted, result in zip(pending.values(), results):
+        if isinstance(result, BaseException):
+            logger.warning("Quote fetch for %d instruments failed: %s", len(wanted), result)
+            continue
+        quotes.update((key, result[key]) for key in wanted if key in result)
+    return quotes
+
+
+def get_quote_cache_stats() -> dict[str, Any]:
+    """Hit/miss counters of the quote cache since process start."""
+    lookups = _stats["hits"] + _stats["misses"] + _stats["coalesced"]
+    return {
+        **_stats,
+        "hit_ratio": round((_stats["hits"] + _stats["coalesced"]) / lookups, 4) if lookups else 0.0,
+        "entries": len(_cache),
+        "inflight": len(_inflight),
+        "ttl_ms": get_settings().upstox_quote_cache_ttl_ms,
+    }
@@ -1,17 +1,35 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from typing import Any
 
 import pandas as pd
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from app.core.config import get_settings
 from app.models.watchlist import INTRADAY_UNIVERSE, SECTOR_MAP
+from app.services.indicator_panel import enrich_panel_async
 from app.services.indicators import add_technical_indicators
 from app.services.market_data import MarketDataService
 from app.services.news_sentiment import COMPANY_NAMES, COMPANY_SEARCH_TERMS, NewsSentimentService
 from app.services.predictor import PredictionService
 
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _timed(timings: dict[str, float], phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] += time.perf_counter() - start
+
 
 class StockScore:
     def __init__(
@@ -81,9 +99,11 @@ class StockScore:
 class StockScannerService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
+        self.settings = get_settings()
         self.market_service = MarketDataService(db)
         self.predictor = PredictionService()
         self.sentiment_service = NewsSentimentService(db)
+        self.last_scan_stats: dict[str, Any] = {}
 
     async def scan_universe(
         self,
@@ -91,54 +111,105 @@ class StockScannerService:
         min_candles: int = 100,
         top_n: int = 5,
         include_sentiment: bool = True,
+        concurrency: int | None = None,
+        symbol_timeout: float | None = None,
     ) -> list[dict[str, Any]]:
-        """Scan all stocks in universe and return top N ranked by intraday score."""
-        scores = []
-        
-        for symbol in INTRADAY_UNIVERSE:
+        """Scan all stocks in universe and return top N ranked by intraday score.
+
+        The scan runs in three phases: candle reads for every symbol run concurrently
+        (at most ``concurrency`` in flight), indicators for the whole universe are
+        computed in one vectorized panel pass off the event loop, then prediction
+        and news sentiment are scored concurrently. A symbol that takes longer than
+        ``symbol_timeout`` seconds in a phase is left out of the ranking. Counts and
+        per-phase timings are kept in ``last_scan_stats``.
+        """
+        concurrency = max(concurrency or self.settings.scanner_concurrency, 1)
+        symbol_timeout = symbol_timeout or self.settings.scanner_symbol_timeout_seconds
+        semaphore = asyncio.Semaphore(concurrency)
+        timings: dict[str, float] = defaultdict(float)
+        outcome = {"timed_out": 0, "failed": 0}
+        scan_start = time.perf_counter()
+
+        async def bounded(symbol: str, coro):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(coro, timeout=symbol_timeout)
+                except asyncio.TimeoutError:
+                    outcome["timed_out"] += 1
+                    logger.warning("Scanner timed out on %s after %.1fs", symbol, symbol_timeout)
+                except Exception:
+                    outcome["failed"] += 1
+                return None
+
+        async def fetch(symbol: str) -> pd.DataFrame:
+            return await self.market_service.recent_candles_frame(symbol, interval, limit=120)
+
+        with _timed(timings, "fetch"):
+            fetched = await asyncio.gather(*(bounded(symbol, fetch(symbol)) for symbol in INTRADAY_UNIVERSE))
+        frames = {
+            symbol: frame
+            for symbol, frame in zip(INTRADAY_UNIVERSE, fetched)
+            if frame is not None and len(frame) >= min_candles
+        }
+
+        with _timed(timings, "indicators"):
             try:
-                score = await self._score_stock(symbol, interval, min_candles, include_sentiment)
-                if score:
-                    scores.append(score)
+                enriched = dict(zip(frames, await enrich_panel_async(list(frames.values()))))
             except Exception:
-                continue
+                logger.exception("Indicator panel failed; enriching %d symbols one by one", len(frames))
+                enriched = {}
+                for symbol, frame in frames.items():
+                    try:
+                        enriched[symbol] = add_technical_indicators(frame)
+                    except Exception:
+                        outcome["failed"] += 1
+
+        with _timed(timings, "prediction"):
+            predictions = self.predictor.predict_enriched_many(enriched)
+
+        with _timed(timings, "scoring"):
+            results = await asyncio.gather(*(
+                bounded(symbol, self._score_enriched(symbol, df, include_sentiment, timings, predictions.get(symbol)))
+                for symbol, df in enriched.items()
+            ))
+        scores = [score for score in results if score]
 
         # Rank by composite score
         ranked = sorted(scores, key=lambda x: x.intraday_score, reverse=True)
         
         # Persist to database
-        await self._persist_scores(ranked)
-        
+        with _timed(timings, "persist"):
+            await self._persist_scores(ranked)
+        timings["total"] = time.perf_counter() - scan_start
+
+        self.last_scan_stats = {
+            "symbols": len(INTRADAY_UNIVERSE),
+            "with_history": len(frames),
+            "scored": len(scores),
+            "timed_out": outcome["timed_out"],
+            "failed": outcome["failed"],
+            "concurrency": concurrency,
+            "timings_ms": {phase: round(seconds * 1000, 1) for phase, seconds in timings.items()},
+        }
         return [s.to_dict() for s in ranked[:top_n]]
 
-    async def _score_stock(
+    async def _score_enriched(
         self,
         symbol: str,
-        interval: str,
-        min_candles: int,
+        df: pd.DataFrame,
         include_sentiment: bool = True,
+        timings: dict[str, float] | None = None,
+        prediction: dict | None = None,
     ) -> StockScore | None:
-        """Calculate intraday score for a single stock."""
-        candles = await self.market_service.recent_candles(symbol, interval, limit=120)
-        
-        if len(candles) < min_candles:
-            return None
+        """Calculate intraday score for a single stock from its indicator frame.
 
-        # Convert to DataFrame
-        df = pd.DataFrame([
-            {
-                "timestamp": c.timestamp,
-                "open": float(c.open),
-                "high": float(c.high),
-                "low": float(c.low),
-                "close": float(c.close),
-                "volume": c.volume,
-            }
-            for c in candles
-        ])
-
-        # Add technical indicators
-        df = add_technical_indicators(df)
+        ``prediction`` is the symbol's entry from a batched predict_enriched_many
+        call; without it the symbol is predicted on its own. ``timings``
+        accumulates seconds spent in per-symbol prediction and sentiment, summed across all
+        symbols of a scan.
+        """
+        if timings is None:
+            timings = defaultdict(float)
         if df.empty:
             return None
 
@@ -149,14 +220,11 @@ class StockScannerService:
         liquidity = self._calculate_liquidity(df)
         momentum = self._calculate_momentum(df)
 
-        # Get ML prediction
-        candle_rows = [
-            [c.timestamp.isoformat(), float(c.open), float(c.high), float(c.low), float(c.close), c.volume, c.oi]
-            for c in candles
-        ]
-        
+        # Get ML prediction (timed only when not already predicted in the batch)
         try:
-            prediction = self.predictor.predict(symbol, candle_rows)
+            if prediction is None:
+                with _timed(timings, "prediction"):
+                    prediction = self.predictor.predict_enriched(symbol, df)
             ml_signal = prediction["signal"]
             ml_confidence = prediction["confidence"]
         except Exception:
@@ -168,12 +236,13 @@ class StockScannerService:
         sentiment_label = "neutral"
         if include_sentiment:
             company_name = COMPANY_NAMES.get(symbol, symbol.split("|")[-1])
-            try:
-                sentiment = await self.sentiment_service.get_stock_sentiment(symbol, company_name, hours=24)
-                sentiment_score = sentiment["sentiment_score"]
-                sentiment_label = sentiment["sentiment_label"]
-            except Exception:
-                pass
+            with _timed(timings, "sentiment"):
+                try:
+                    sentiment = await self.sentiment_service.get_stock_sentiment(symbol, company_name, hours=24)
+                    sentiment_score = sentiment["sentiment_score"]
+                    sentiment_label = sentiment["sentiment_label"]
+                except Exception:
+                    pass
 
         sector = SECTOR_MAP.get(symbol, "Unknown")
 
@@ -249,10 +318,11 @@ class StockScannerService:
 
     async def _persist_scores(self, scores: list[StockScore]) -> None:
         """Save scan results to database."""
+        if not scores:
+            return
         scan_time = datetime.now(timezone.utc)
-        
-        for score in scores:
-            await self.db["stock_scores"].insert_one({
+        await self.db["stock_scores"].insert_many([
+            {
                 "symbol": score.symbol,
                 "scan_time": scan_time,
                 "intraday_score": score.intraday_score,
@@ -266,7 +336,9 @@ class StockScannerService:
                 "sector": score.sector,
                 "sentiment_score": score.sentiment_score,
                 "sentiment_label": score.sentiment_label,
-            })
+            }
+            for score in scores
+        ])
 
     async def get_latest_scan(self, limit: int = 10) -> list[dict[str, Any]]:
         """Retrieve most recent scan results."""
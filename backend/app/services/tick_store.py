@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+
+from app.core.config import get_settings
+
+if TYPE_CHECKING:
+    from app.services.feed_decoder import Tick
+
+# Last tick per instrument, in the same shape as an Upstox REST market quote.
+_ticks: dict[str, dict[str, Any]] = {}
+# Monotonic receive time per instrument, for staleness checks.
+_received: dict[str, float] = {}
+_stats = {"updates": 0, "hits": 0, "stale": 0}
+
+
+def _number(value: Any) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value: Any) -> str | None:
+    """Feed times are epoch milliseconds (strings once decoded to JSON)."""
+    millis = _number(value)
+    if millis is None:
+        return None
+    return datetime.fromtimestamp(millis / 1000, tz=timezone.utc).isoformat()
+
+
+def quote_from_feed(instrument_key: str, feed: dict[str, Any]) -> dict[str, Any] | None:
+    """Translate one instrument's feed entry (ltpc / full / index mode) into a REST-shaped quote."""
+    full = feed.get("fullFeed") or {}
+    market = full.get("marketFF") or full.get("indexFF") or {}
+    ltpc = market.get("ltpc") or feed.get("ltpc") or {}
+    last_price = _number(ltpc.get("ltp"))
+    if last_price is None:
+        return None
+
+    quote: dict[str, Any] = {
+        "instrument_token": instrument_key,
+        "last_price": last_price,
+        "timestamp": _timestamp(ltpc.get("ltt")),
+    }
+    close_price = _number(ltpc.get("cp"))
+    if close_price is not None:
+        quote["net_change"] = round(last_price - close_price, 2)
+    if "ltq" in ltpc:
+        quote["last_trade_quantity"] = _number(ltpc["ltq"])
+
+    daily = next(
+        (bar for bar in (market.get("marketOHLC") or {}).get("ohlc", []) if bar.get("interval") == "1d"),
+        None,
+    )
+    if daily:
+        quote["ohlc"] = {field: _number(daily.get(field)) for field in ("open", "high", "low", "close")}
+    if "vtt" in market:
+        quote["volume"] = _number(market["vtt"])
+    if "atp" in market:
+        quote["average_price"] = _number(market["atp"])
+    if "tbq" in market:
+        quote["total_buy_quantity"] = _number(market["tbq"])
+    if "tsq" in market:
+        quote["total_sell_quantity"] = _number(market["tsq"])
+
+    levels = (market.get("marketLevel") or {}).get("bidAskQuote") or []
+    if levels:
+        quote["depth"] = {
+            "buy": [{"price": _number(level.get("bidP")), "quantity": _number(level.get("bidQ")), "orders": 0} for level in levels],
+            "sell": [{"price": _number(level.get("askP")), "quantity": _number(level.get("askQ")), "orders": 0} for level in levels],
+        }
+    return quote
+
+
+def quote_from_tick(tick: Tick) -> dict[str, Any]:
+    """REST-shaped quote from a decoded feed tick."""
+    quote: dict[str, Any] = {
+        "instrument_token": tick.instrument_key,
+        "last_price": tick.ltp,
+        "timestamp": _timestamp(tick.ltt) if tick.ltt else None,
+        "net_change": round(tick.ltp - tick.cp, 2),
+        "last_trade_quantity": tick.ltq,
+    }
+    if tick.open is not None:
+        quote["ohlc"] = {"open": tick.open, "high": tick.high, "low": tick.low, "close": tick.close}
+    for field, name in (("volume", "volume"), ("atp", "average_price"), ("oi", "oi"),
+                        ("tbq", "total_buy_quantity"), ("tsq", "total_sell_quantity")):
+        value = getattr(tick, field)
+        if value is not None:
+            quote[name] = value
+    if tick.bids or tick.asks:
+        quote["depth"] = {
+            "buy": [{"price": price, "quantity": quantity, "orders": 0} for price, quantity in tick.bids],
+            "sell": [{"price": price, "quantity": quantity, "orders": 0} for price, quantity in tick.asks],
+        }
+    return quote
+
+
+def update_tick(instrument_key: str, quote: dict[str, Any]) -> None:
+    """Merge a tick into the store; fields missing from a partial (e.g. ltpc-only) tick are kept."""
+    _ticks[instrument_key] = {**_ticks.get(instrument_key, {}), **quote}
+    _received[instrument_key] = time.monotonic()
+    _stats["updates"] += 1
+
+
+def ingest_feed(message: dict[str, Any]) -> list[str]:
+    """Store every instrument in a JSON feed message; returns the keys updated."""
+    updated = []
+    for instrument_key, feed in (message.get("feeds") or {}).items():
+        quote = quote_from_feed(instrument_key, feed or {})
+        if quote is not None:
+            update_tick(instrument_key, quote)
+            updated.append(instrument_key)
+    return updated
+
+
+def ingest_ticks(ticks: list[Tick]) -> None:
+    for tick in ticks:
+        update_tick(tick.instrument_key, quote_from_tick(tick))
+
+
+def fresh_ticks(instrument_keys: list[str], max_age_ms: int | None = None) -> tuple[dict[str, dict[str, Any]], list[str]]:
+    """Split keys into ({key: last tick} received within ``max_age_ms``, keys that are stale or unseen)."""
+    max_age = (get_settings().tick_store_max_age_ms if max_age_ms is None else max_age_ms) / 1000
+    now = time.monotonic()
+    fresh: dict[str, dict[str, Any]] = {}
+    stale: list[str] = []
+    for key in instrument_keys:
+        received = _received.get(key)
+        if received is not None and now - received <= max_age:
+            fresh[key] = _ticks[key]
+        else:
+            stale.append(key)
+    _stats["hits"] += len(fresh)
+    _stats["stale"] += len(stale)
+    return fresh, stale
+
+
+def clear_ticks() -> None:
+    _ticks.clear()
+    _received.clear()
+
+
+def get_tick_store_stats() -> dict[str, Any]:
+    now = time.monotonic()
+    return {
+        **_stats,
+        "instruments": len(_ticks),
+        "oldest_age_ms": round((now - min(_received.values())) * 1000, 1) if _received else None,
+        "max_age_ms": get_settings().tick_store_max_age_ms,
+    }
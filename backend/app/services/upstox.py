@@ -1,5 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import importlib.util
+import logging
+import time
+from collections import defaultdict, deque
 from datetime import datetime, timedelta, timezone
 from typing import Any
 from urllib.parse import quote
@@ -10,6 +15,92 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.config import get_settings
 from app.models.trading import UpstoxCredential
 
+logger = logging.getLogger(__name__)
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_client_closer: asyncio.Task | None = None
+_latency: dict[str, dict[str, Any]] = defaultdict(
+    lambda: {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "recent": deque(maxlen=500)}
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled client for Upstox calls (keep-alive, optional HTTP/2).
+
+    Recreated if the running event loop changed, e.g. across asyncio.run() calls in scripts.
+    Each client is closed on its own loop when that loop shuts down, so its pooled
+    sockets are released rather than leaked once the loop is gone.
+    """
+    global _client, _client_loop, _client_closer
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        settings = get_settings()
+        http2 = settings.upstox_http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("upstox_http2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        _client = httpx.AsyncClient(
+            timeout=30,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.upstox_max_connections,
+                max_keepalive_connections=settings.upstox_max_keepalive_connections,
+                keepalive_expiry=settings.upstox_keepalive_expiry_seconds,
+            ),
+        )
+        _client_loop = loop
+        _client_closer = loop.create_task(_close_on_shutdown(_client))
+    return _client
+
+
+async def _close_on_shutdown(client: httpx.AsyncClient) -> None:
+    """Hold ``client`` until this task is cancelled (asyncio.run cancels leftover tasks
+    while its loop is still usable), then close it there."""
+    try:
+        await asyncio.Future()
+    finally:
+        try:
+            await client.aclose()
+        except Exception as exc:
+            logger.debug("Closing Upstox HTTP client failed: %s", exc)
+
+
+async def close_http_client() -> None:
+    global _client, _client_loop, _client_closer
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    if _client_closer is not None:
+        _client_closer.cancel()
+    _client = None
+    _client_loop = None
+    _client_closer = None
+
+
+def _record_latency(operation: str, elapsed_ms: float, failed: bool) -> None:
+    stats = _latency[operation]
+    stats["calls"] += 1
+    stats["errors"] += failed
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    stats["recent"].append(elapsed_ms)
+
+
+def get_latency_metrics() -> dict[str, dict[str, float]]:
+    """Per-operation call counts and latency (mean/max overall, p50/p95 over recent calls)."""
+    metrics = {}
+    for operation, stats in _latency.items():
+        recent = sorted(stats["recent"])
+        metrics[operation] = {
+            "calls": stats["calls"],
+            "errors": stats["errors"],
+            "mean_ms": round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else 0.0,
+            "p50_ms": round(recent[len(recent) // 2], 2) if recent else 0.0,
+            "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2) if recent else 0.0,
+            "max_ms": round(stats["max_ms"], 2),
+        }
+    return metrics
+
 
 class UpstoxService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -20,6 +111,18 @@ class UpstoxService:
     def _headers(self, access_token: str) -> dict[str, str]:
         return {"Accept": "application/json", "Authorization": f"Bearer {access_token}"}
 
+    async def _request(self, operation: str, method: str, url: str, timeout: float = 30, **kwargs: Any) -> dict[str, Any]:
+        """Send a request on the shared client, recording its latency under ``operation``."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await get_http_client().request(method, url, timeout=timeout, **kwargs)
+            response.raise_for_status()
+            failed = False
+            return response.json()
+        finally:
+            _record_latency(operation, (time.perf_counter() - start) * 1000, failed)
+
     async def exchange_code(self, user_id: str, code: str) -> dict[str, Any]:
         payload = {
             "code": code,
@@ -29,10 +132,7 @@ class UpstoxService:
             "grant_type": "authorization_code",
         }
         headers = {"Accept": "application/json", "Content-Type": "application/x-www-form-urlencoded"}
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(self.settings.upstox_token_url, data=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        data = await self._request("exchange_code", "POST", self.settings.upstox_token_url, data=payload, headers=headers)
 
         # Calculate expiry time - Upstox access_token typically expires in 24 hours
         expires_in = data.get("expires_in", 86400)  # Default to 24 hours if not provided
@@ -141,52 +241,43 @@ class UpstoxService:
         )
 
     async def get_quotes(self, access_token: str, instrument_keys: list[str]) -> dict[str, Any]:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                f"{self.settings.upstox_api_base_url}/v2/market-quote/quotes",
-                params={"instrument_key": ",".join(instrument_keys)},
-                headers=self._headers(access_token),
-            )
-            response.raise_for_status()
-            return response.json()
+        return await self._request(
+            "get_quotes",
+            "GET",
+            f"{self.settings.upstox_api_base_url}/v2/market-quote/quotes",
+            params={"instrument_key": ",".join(instrument_keys)},
+            headers=self._headers(access_token),
+        )
 
     async def get_historical_candles(self, access_token: str, instrument_key: str, interval: str, to_date: str | None, from_date: str | None) -> dict[str, Any]:
         encoded_instrument_key = quote(instrument_key, safe="")
         if interval == "1minute":
             url = f"{self.settings.upstox_api_base_url}/v3/historical-candle/intraday/{encoded_instrument_key}/minutes/1"
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.get(url, headers=self._headers(access_token))
-                response.raise_for_status()
-                return response.json()
+            return await self._request("get_historical_candles", "GET", url, timeout=60, headers=self._headers(access_token))
 
         if interval == "30minute":
             url = f"{self.settings.upstox_api_base_url}/v3/historical-candle/intraday/{encoded_instrument_key}/minutes/30"
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.get(url, headers=self._headers(access_token))
-                response.raise_for_status()
-                return response.json()
+            return await self._request("get_historical_candles", "GET", url, timeout=60, headers=self._headers(access_token))
 
         effective_to_date = to_date or datetime.now(timezone.utc).date().isoformat()
         url = f"{self.settings.upstox_api_base_url}/v2/historical-candle/{encoded_instrument_key}/{interval}/{effective_to_date}"
         if from_date:
             url = f"{url}/{from_date}"
-        async with httpx.AsyncClient(timeout=60) as client:
-            response = await client.get(url, headers=self._headers(access_token))
-            response.raise_for_status()
-            return response.json()
+        return await self._request("get_historical_candles", "GET", url, timeout=60, headers=self._headers(access_token))
 
     async def place_order(self, access_token: str, order_payload: dict[str, Any]) -> dict[str, Any]:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(
-                f"{self.settings.upstox_hft_base_url}/v3/order/place",
-                json=order_payload,
-                headers={**self._headers(access_token), "Content-Type": "application/json"},
-            )
-            response.raise_for_status()
-            return response.json()
+        return await self._request(
+            "place_order",
+            "POST",
+            f"{self.settings.upstox_hft_base_url}/v3/order/place",
+            json=order_payload,
+            headers={**self._headers(access_token), "Content-Type": "application/json"},
+        )
 
     async def get_websocket_authorization(self, access_token: str) -> dict[str, Any]:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(self.settings.upstox_market_feed_authorize_url, headers=self._headers(access_token))
-            response.raise_for_status()
-            return response.json()
+        return await self._request(
+            "get_websocket_authorization",
+            "GET",
+            self.settings.upstox_market_feed_authorize_url,
+            headers=self._headers(access_token),
+        )
@@ -14,16 +14,114 @@ sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins=settings.cors
 socket_app = socketio.ASGIApp(sio)
 logger = logging.getLogger(__name__)
 
+# Events scoped to one instrument; clients receive them only for subscribed instruments
+# (room "<event>:<instrument_key>", or "<event>:*" for all). Other events go to everyone.
+INSTRUMENT_EVENTS = ("market.tick", "market.bar")
+ALL_INSTRUMENTS = "*"
+
+# Newest tick per instrument since the last conflation flush.
+_pending_ticks: dict[str, dict] = {}
+_stats = {"ticks_in": 0, "ticks_unwatched": 0, "ticks_conflated": 0, "ticks_sent": 0, "emits": 0}
+
+
+def _rooms(data: dict) -> list[str]:
+    instruments = data.get("instruments") or []
+    events = [event for event in data.get("events") or INSTRUMENT_EVENTS if event in INSTRUMENT_EVENTS]
+    return [f"{event}:{key}" for event in events for key in instruments]
+
 
 @sio.event
 async def connect(sid, environ, auth):  # type: ignore[no-untyped-def]
     await sio.emit("system.status", {"connected": True}, to=sid)
 
 
+@sio.event
+async def subscribe(sid, data):  # type: ignore[no-untyped-def]
+    """{"instruments": [...], "events": ["market.tick", "market.bar"]}; "*" subscribes to every instrument."""
+    rooms = _rooms(data or {})
+    for room in rooms:
+        await sio.enter_room(sid, room)
+    return {"rooms": rooms}
+
+
+@sio.event
+async def unsubscribe(sid, data):  # type: ignore[no-untyped-def]
+    rooms = _rooms(data or {})
+    for room in rooms:
+        await sio.leave_room(sid, room)
+    return {"rooms": rooms}
+
+
+def _has_participants(room: str) -> bool:
+    return next(sio.manager.get_participants("/", room), None) is not None
+
+
+def _queue_ticks(ticks: list[dict]) -> None:
+    for tick in ticks:
+        key = tick.get("instrument_key")
+        _stats["ticks_in"] += 1
+        if key in _pending_ticks:
+            _stats["ticks_conflated"] += 1
+        _pending_ticks[key] = tick
+
+
+async def _emit_instrument_event(event: str, payload: dict) -> None:
+    key = payload.get("instrument_key")
+    rooms = [f"{event}:{ALL_INSTRUMENTS}"] + ([f"{event}:{key}"] if key else [])
+    await sio.emit(event, payload, room=rooms)
+    _stats["emits"] += 1
+
+
+async def _flush_ticks() -> None:
+    """Send each client one market.tick message holding the newest tick of every instrument it watches."""
+    global _pending_ticks
+    if not _pending_ticks:
+        return
+    pending, _pending_ticks = _pending_ticks, {}
+    per_client: dict[str, list[dict]] = {}
+    everything = [sid for sid, _ in sio.manager.get_participants("/", f"market.tick:{ALL_INSTRUMENTS}")]
+    for key, tick in pending.items():
+        for sid, _ in sio.manager.get_participants("/", f"market.tick:{key}"):
+            per_client.setdefault(sid, []).append(tick)
+    all_ticks = list(pending.values())
+    for sid in everything:
+        per_client[sid] = all_ticks
+    for sid, ticks in per_client.items():
+        await sio.emit("market.tick", {"ticks": ticks}, to=sid)
+        _stats["emits"] += 1
+        _stats["ticks_sent"] += len(ticks)
+
+
+async def _conflation_loop() -> None:
+    interval = settings.socket_conflation_ms / 1000
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _flush_ticks()
+        except Exception:
+            logger.exception("Tick fan-out flush failed")
+
+
+async def _relay(event: str, payload: dict) -> None:
+    if event == "market.tick" and isinstance(payload.get("ticks"), list):
+        ticks = payload["ticks"]
+        if not _has_participants(f"market.tick:{ALL_INSTRUMENTS}"):
+            # ticks nobody watches are dropped here, before they cost a serialization
+            ticks = [tick for tick in ticks if _has_participants(f"market.tick:{tick.get('instrument_key')}")]
+            _stats["ticks_unwatched"] += len(payload["ticks"]) - len(ticks)
+        _queue_ticks(ticks)
+    elif event in INSTRUMENT_EVENTS:
+        await _emit_instrument_event(event, payload)
+    else:
+        await sio.emit(event, payload)
+        _stats["emits"] += 1
+
+
 async def redis_fanout() -> None:
     if not settings.redis_url:
         return
     redis = Redis.from_url(settings.redis_url)
+    flusher = asyncio.create_task(_conflation_loop())
     try:
         pubsub = redis.pubsub()
         await pubsub.subscribe(settings.socket_io_redis_channel)
@@ -31,9 +129,15 @@ async def redis_fanout() -> None:
             if message["type"] != "message":
                 continue
             data = json.loads(message["data"])
-            await sio.emit(data["event"], data["payload"])
+            await _relay(data["event"], data["payload"])
     except Exception:
         logger.warning("Redis fanout listener unavailable; websocket relay disabled")
+    finally:
+        flusher.cancel()
+
+
+def get_fanout_stats() -> dict:
+    return {**_stats, "pending_ticks": len(_pending_ticks)}
 
 
 def create_redis_listener_task() -> asyncio.Task:
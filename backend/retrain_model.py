@@ -47,7 +47,10 @@ async def main():
         df,
         model_path=settings.model_path,
         scaler_path=settings.scaler_path,
-        epochs=30
+        epochs=30,
+        streaming_model_path=settings.lstm_streaming_model_path if settings.lstm_variant == "streaming" else None,
+        rewarm_bars=settings.lstm_stream_rewarm_bars,
+        max_int8_accuracy_drop=settings.lstm_int8_max_accuracy_drop,
     )
     
     print("\n✅ Training complete!")
@@ -57,6 +60,21 @@ async def main():
     print(f"   Training samples: {result['samples']}")
     print(f"\n   Model saved to: {settings.model_path}")
     print(f"   Scaler saved to: {settings.scaler_path}")
+    int8 = result["int8"]
+    if "error" in int8:
+        print(f"\n   int8 build: failed ({int8['error']})")
+    else:
+        print(f"\n   int8 build: {'saved to ' + int8['path'] if int8['accepted'] else 'rejected'}"
+              f" (val accuracy {int8['int8_val_acc']}% vs fp32 {int8['fp32_val_acc']}%)")
+        print(f"   Size: {int8['size_kb']['int8']} KB vs {int8['size_kb']['fp32']} KB;"
+              f" batch of {int8['batch_latency_ms']['batch_size']}: {int8['batch_latency_ms']['int8']} ms vs {int8['batch_latency_ms']['fp32']} ms")
+    if "streaming" in result:
+        report = result["streaming"]
+        print(f"\n   Streaming model saved to: {settings.lstm_streaming_model_path}")
+        print(f"   Streaming val accuracy: {report['val_acc']}% (bidirectional: {report['reference_val_acc']}%)")
+        print(f"   Agreement with bidirectional: {report['agreement_with_reference_pct']}%")
+        print(f"   Incremental vs full-window agreement: {report['incremental_vs_window_agreement_pct']}%"
+              f" (max prob diff {report['incremental_vs_window_max_prob_diff']})")
     
     client.close()
     return 0
@@ -23,6 +23,11 @@ export function LiveEvents() {
       setEvents((current) => [{ event, payload }, ...current].slice(0, 8));
     };
 
+    // market.tick is per-instrument; "*" asks for every instrument (conflated server-side).
+    // Rooms do not survive a reconnect, so subscribe on every connect.
+    socket.on("connect", () => {
+      socket.emit("subscribe", { instruments: ["*"], events: ["market.tick"] });
+    });
     socket.on("market.tick", pushEvent("market.tick"));
     socket.on("prediction.signal", pushEvent("prediction.signal"));
     socket.on("trade.executed", pushEvent("trade.executed"));
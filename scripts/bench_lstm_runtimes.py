@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Latency micro-benchmark of the LSTM classifier across inference runtimes
+(eager, TorchScript, ONNX Runtime, dynamic int8) on CPU.
+
+Uses the trained model at MODEL_PATH and the TorchScript/ONNX/int8 artifacts
+written next to it at train time (--export writes missing TorchScript/ONNX ones
+first; without a gated int8 build the model is quantized on the fly). Inputs are
+random standardized windows; each runtime is compared with eager for accuracy.
+
+Usage:
+    python scripts/bench_lstm_runtimes.py --batch-sizes 1,8,60 --iterations 50
+    python scripts/bench_lstm_runtimes.py --model-path backend/artifacts/lstm_latest.pt --export --threads 2
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# Add repo root (ai_models) and backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from ai_models.features import FEATURE_COLUMNS
+from ai_models.lstm_model import LSTMClassifier
+from ai_models.runtime import RUNTIMES, artifact_path, export_artifacts, load_runner, quantize_int8
+from app.core.config import get_settings
+
+
+def _summary(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+    }
+
+
+def bench_runner(runner, batches: dict[int, np.ndarray], iterations: int) -> dict:
+    report = {}
+    for size, batch in batches.items():
+        runner(batch)  # warm-up
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            runner(batch)
+            samples.append((time.perf_counter() - start) * 1000)
+        report[f"batch_{size}"] = _summary(samples)
+    return report
+
+
+def run(args: argparse.Namespace) -> dict:
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model_path = Path(args.model_path or get_settings().model_path)
+    model = LSTMClassifier(input_size=len(FEATURE_COLUMNS), hidden_size=128, num_layers=2, num_classes=3)
+    model.load_state_dict(torch.load(model_path, map_location="cpu", weights_only=False))
+    model.eval()
+    if args.export:
+        missing = [runtime for runtime in ("torchscript", "onnx") if not artifact_path(model_path, runtime).exists()]
+        if missing:
+            export_artifacts(model, model_path, len(FEATURE_COLUMNS))
+
+    rng = np.random.default_rng(args.seed)
+    sizes = [int(size) for size in args.batch_sizes.split(",")]
+    batches = {size: rng.standard_normal((size, 60, len(FEATURE_COLUMNS))).astype(np.float32) for size in sizes}
+    check = batches[max(sizes)]
+    reference = load_runner("eager", model, model_path)(check)
+
+    report = {"model_path": str(model_path), "threads": torch.get_num_threads(), "runtimes": {}}
+    for runtime in args.runtimes.split(","):
+        try:
+            if runtime == "int8" and not artifact_path(model_path, "int8").exists():
+                # no gated build on disk: benchmark a fresh quantization instead
+                runner = load_runner("eager", quantize_int8(model), model_path)
+            else:
+                runner = load_runner(runtime, model, model_path)
+        except Exception as exc:
+            report["runtimes"][runtime] = f"unavailable: {exc}"
+            continue
+        logits = runner(check)
+        report["runtimes"][runtime] = {
+            **bench_runner(runner, batches, args.iterations),
+            "max_logit_diff_vs_eager": round(float(np.abs(logits - reference).max()), 6),
+            "label_agreement_vs_eager_pct": round(float((logits.argmax(1) == reference.argmax(1)).mean() * 100), 2),
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare LSTM inference runtimes on CPU")
+    parser.add_argument("--model-path", default="", help="state_dict to load (default: MODEL_PATH setting)")
+    parser.add_argument("--runtimes", default=",".join(RUNTIMES), help="comma-separated subset of " + ",".join(RUNTIMES))
+    parser.add_argument("--batch-sizes", default="1,8,60", help="comma-separated batch sizes")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--export", action="store_true", help="write missing TorchScript/ONNX artifacts first")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Throughput/latency benchmark of the quote and feed paths, meant to run against
+scripts/upstox_fake_server.py (see its docstring for the settings to export).
+
+Usage:
+    python scripts/upstox_fake_server.py --latency-ms 40 --jitter-ms 15 &
+    python scripts/bench_upstox_stack.py --callers 8 --seconds 20 --stream-seconds 20
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.core.config import get_settings
+from app.db.session import get_db
+from app.models.watchlist import INTRADAY_UNIVERSE
+from app.services.market_stream import MarketStreamService
+from app.services.quotes import fetch_quotes, get_quote_cache_stats
+from app.services.tick_store import get_tick_store_stats
+from app.services.upstox import UpstoxService, close_http_client, get_latency_metrics
+
+
+def _summary(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+async def bench_quotes(db, callers: int, seconds: float, instrument_keys: list[str], pause_ms: float = 0) -> dict:
+    """``callers`` loops each calling fetch_quotes, ``pause_ms`` apart, as the trader loops would."""
+    upstox = UpstoxService(db)
+    token = get_settings().upstox_access_token or "fake"
+    samples: list[float] = []
+    failures = 0
+    deadline = time.perf_counter() + seconds
+
+    async def caller() -> None:
+        nonlocal failures
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await fetch_quotes(upstox, token, instrument_keys)
+            except Exception:
+                failures += 1
+            else:
+                samples.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(pause_ms / 1000)
+
+    await asyncio.gather(*(caller() for _ in range(callers)))
+    return {
+        "callers": callers,
+        "fetches_per_second": round(len(samples) / seconds, 1),
+        "failures": failures,
+        "fetch_quotes": _summary(samples),
+        "upstream": get_latency_metrics().get("get_quotes", {}),
+        "quote_cache": get_quote_cache_stats(),
+    }
+
+
+async def bench_stream(db, user_id: str, seconds: float, instrument_keys: list[str]) -> dict:
+    """Run the market stream for ``seconds`` and report what reached the tick store.
+
+    The bar builder is left off: it would upsert the fake feed's prices into ``candles``.
+    """
+    service = MarketStreamService(db, user_id)
+    service.bars = None
+    before = get_tick_store_stats()["updates"]
+    try:
+        await asyncio.wait_for(service.stream(instrument_keys), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        service.decoder.close()
+    updates = get_tick_store_stats()["updates"] - before
+    return {
+        "ticks_per_second": round(updates / seconds, 1),
+        "tick_store": get_tick_store_stats(),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    db = await get_db()
+    keys = INTRADAY_UNIVERSE[:args.instruments] if args.instruments else INTRADAY_UNIVERSE
+    report = {"instruments": len(keys)}
+    try:
+        if args.seconds > 0:
+            report["quotes"] = await bench_quotes(db, args.callers, args.seconds, keys, args.pause_ms)
+        if args.stream_seconds > 0:
+            user = await db["users"].find_one({"email": get_settings().default_admin_email})
+            if user is None:
+                report["stream"] = "skipped: no default user (run bootstrap-admin first)"
+            else:
+                report["stream"] = await bench_stream(db, str(user["_id"]), args.stream_seconds, keys)
+    finally:
+        await close_http_client()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark quote fetching and the market feed")
+    parser.add_argument("--callers", type=int, default=4, help="concurrent quote-fetching loops")
+    parser.add_argument("--pause-ms", type=float, default=0, help="pause between one caller's fetches")
+    parser.add_argument("--seconds", type=float, default=10, help="quote benchmark duration (0 skips)")
+    parser.add_argument("--stream-seconds", type=float, default=0, help="feed benchmark duration (0 skips)")
+    parser.add_argument("--instruments", type=int, default=0, help="first N of the intraday universe (0 = all)")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
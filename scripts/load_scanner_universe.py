@@ -29,6 +29,7 @@ async def load_universe(interval: str = "5minute", days: int = 30):
     
     upstox = UpstoxService(db)
     market_service = MarketDataService(db)
+    await market_service.ensure_indexes()
     
     # Get default user credential
     user = await db["users"].find_one({"email": settings.default_admin_email})
@@ -75,8 +76,8 @@ async def load_universe(interval: str = "5minute", days: int = 30):
                 continue
             
             # Persist to database
-            inserted = await market_service.persist_candles(symbol, interval, candle_rows)
-            print(f"✓ Loaded {inserted} candles")
+            result = await market_service.upsert_candles(symbol, interval, candle_rows)
+            print(f"✓ Loaded {result['inserted']} new, {result['updated']} updated candles")
             success += 1
             
             # Rate limit: 1 request per second
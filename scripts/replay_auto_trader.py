@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Replay the auto-trader decision cycle over stored candles on a simulated clock.
+
+Cycles run back to back (one per stored bar close) against a local Upstox
+stand-in; trades and positions go to a scratch "<mongodb_db>_replay" database.
+Load candles first with scripts/load_scanner_universe.py.
+
+Usage:
+    python scripts/replay_auto_trader.py --trader auto --start 2024-01-01 --end 2024-02-01
+    python scripts/replay_auto_trader.py --trader professional --start 2024-01-01 --end 2024-01-08 --profile
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import pstats
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.core.config import get_settings
+from app.db.session import get_client
+from app.services.cycle_replay import replay_cycles
+
+
+async def run(args: argparse.Namespace) -> dict:
+    settings = get_settings()
+    client = get_client()
+    state = {
+        "max_capital_allocation": args.capital,
+        "daily_loss_limit": args.daily_loss_limit,
+        "max_positions": args.max_positions,
+    }
+    return await replay_cycles(
+        client[settings.mongodb_db],
+        client[f"{settings.mongodb_db}_replay"],
+        datetime.fromisoformat(args.start),
+        datetime.fromisoformat(args.end),
+        trader=args.trader,
+        interval=args.interval,
+        state=state,
+        reenable_daily=not args.no_reenable,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Walk-forward replay of the auto-trader cycle")
+    parser.add_argument("--trader", choices=["auto", "professional"], default="auto")
+    parser.add_argument("--start", required=True, help="ISO date/time (UTC)")
+    parser.add_argument("--end", required=True, help="ISO date/time (UTC), exclusive")
+    parser.add_argument("--interval", default="5minute")
+    parser.add_argument("--capital", type=float, default=50000)
+    parser.add_argument("--daily-loss-limit", type=float, default=2000)
+    parser.add_argument("--max-positions", type=int, default=3)
+    parser.add_argument("--no-reenable", action="store_true", help="keep the trader off after a daily-loss shutdown")
+    parser.add_argument("--profile", action="store_true", help="print the top cumulative-time functions")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    report = asyncio.run(run(args))
+    if profiler:
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
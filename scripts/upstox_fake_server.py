@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Upstox API, for offline load and latency benchmarks.
+
+Serves market quotes, historical candles (v2 day/1/5/30-minute and v3 intraday),
+order placement, feed authorization and a protobuf v3 websocket tick feed.
+Prices are seeded random walks, so a given --seed replays the same history.
+Latency, error rate and tick rate are configurable.
+
+Point the backend at it with:
+    UPSTOX_API_BASE_URL=http://127.0.0.1:8765
+    UPSTOX_HFT_BASE_URL=http://127.0.0.1:8765
+    UPSTOX_MARKET_FEED_AUTHORIZE_URL=http://127.0.0.1:8765/v3/feed/market-data-feed/authorize
+    UPSTOX_ACCESS_TOKEN=fake
+
+Usage:
+    python scripts/upstox_fake_server.py --latency-ms 40 --jitter-ms 15 --error-rate 0.01 --tick-rate 5
+    curl http://127.0.0.1:8765/fake/stats
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import zlib
+from collections import Counter
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.models.watchlist import INTRADAY_UNIVERSE
+from app.proto.MarketDataFeedV3_pb2 import FeedResponse
+
+IST = timezone(timedelta(hours=5, minutes=30))
+SESSION_OPEN = dt_time(9, 15)
+SESSION_MINUTES = 375  # 09:15-15:30
+HISTORY_START = date(2015, 1, 1)
+# Intervals served as session bars by the historical endpoint; besides these only "day" is valid.
+INTRADAY_MINUTES = {"1minute": 1, "5minute": 5, "30minute": 30}
+
+
+def _rng(seed: int, *parts: object) -> np.random.Generator:
+    return np.random.default_rng([seed, *(zlib.crc32(str(part).encode()) for part in parts)])
+
+
+class FakeMarket:
+    """Deterministic daily history per instrument plus a live random walk from the last close."""
+
+    def __init__(self, seed: int) -> None:
+        self.seed = seed
+        self._daily: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self.live: dict[str, dict] = {}
+
+    def daily(self, key: str) -> tuple[np.ndarray, np.ndarray]:
+        """(business dates, OHLCV rows) from HISTORY_START to today."""
+        if key not in self._daily:
+            days = np.arange(np.datetime64(HISTORY_START), np.datetime64(date.today()) + 1)
+            days = days[np.is_busday(days)]
+            rng = _rng(self.seed, key)
+            closes = (50 + 950 * rng.random()) * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(days))))
+            opens = np.concatenate([[closes[0]], closes[:-1]]) * np.exp(rng.normal(0, 0.004, len(days)))
+            spread = np.abs(rng.normal(0, 0.008, len(days))) * closes
+            highs = np.maximum(opens, closes) + spread
+            lows = np.minimum(opens, closes) - spread
+            volumes = rng.integers(100_000, 5_000_000, len(days))
+            self._daily[key] = (days, np.column_stack([opens, highs, lows, closes, volumes]))
+        return self._daily[key]
+
+    def intraday(self, key: str, day: date, minutes: int) -> list[list]:
+        """Session bars of ``minutes`` for one day, oldest first, anchored on that day's daily bar."""
+        days, rows = self.daily(key)
+        index = int(np.searchsorted(days, np.datetime64(day)))
+        anchor = float(rows[min(index, len(rows) - 1)][0])
+        rng = _rng(self.seed, key, day.isoformat())
+        closes = anchor * np.exp(np.cumsum(rng.normal(0, 0.0012, SESSION_MINUTES)))
+        opens = np.concatenate([[anchor], closes[:-1]])
+        noise = np.abs(rng.normal(0, 0.0006, SESSION_MINUTES)) * closes
+        volumes = rng.integers(500, 20_000, SESSION_MINUTES)
+        start = datetime.combine(day, SESSION_OPEN, tzinfo=IST)
+        bars = []
+        for first in range(0, SESSION_MINUTES, minutes):
+            last = min(first + minutes, SESSION_MINUTES) - 1
+            bars.append([
+                (start + timedelta(minutes=first)).isoformat(),
+                round(float(opens[first]), 2),
+                round(float(np.max(np.maximum(opens, closes)[first:last + 1] + noise[first:last + 1])), 2),
+                round(float(np.min(np.minimum(opens, closes)[first:last + 1] - noise[first:last + 1])), 2),
+                round(float(closes[last]), 2),
+                int(volumes[first:last + 1].sum()),
+                0,
+            ])
+        return bars
+
+    def state(self, key: str) -> dict:
+        if key not in self.live:
+            _, rows = self.daily(key)
+            close = round(float(rows[-2][3] if len(rows) > 1 else rows[-1][3]), 2)
+            self.live[key] = {"ltp": close, "cp": close, "open": close, "high": close, "low": close, "volume": 0, "ltq": 0, "ltt": 0}
+        return self.live[key]
+
+    def step(self, key: str) -> dict:
+        state = self.state(key)
+        price = round(state["ltp"] * float(np.exp(random.gauss(0, 0.0008))), 2)
+        state.update(ltp=price, high=max(state["high"], price), low=min(state["low"], price),
+                     ltq=random.randint(1, 500), ltt=int(time.time() * 1000))
+        state["volume"] += state["ltq"]
+        return state
+
+    def quote(self, key: str) -> dict:
+        state = self.state(key)
+        ltp = state["ltp"]
+        return {
+            "ohlc": {"open": state["open"], "high": state["high"], "low": state["low"], "close": ltp},
+            "depth": {
+                "buy": [{"quantity": 100 * (level + 1), "price": round(ltp - 0.05 * (level + 1), 2), "orders": level + 1} for level in range(5)],
+                "sell": [{"quantity": 100 * (level + 1), "price": round(ltp + 0.05 * (level + 1), 2), "orders": level + 1} for level in range(5)],
+            },
+            "timestamp": datetime.now(IST).isoformat(),
+            "instrument_token": key,
+            "symbol": key.split("|")[-1],
+            "last_price": ltp,
+            "volume": state["volume"],
+            "average_price": round((state["high"] + state["low"] + ltp) / 3, 2),
+            "oi": 0,
+            "net_change": round(ltp - state["cp"], 2),
+            "total_buy_quantity": 50_000,
+            "total_sell_quantity": 50_000,
+            "lower_circuit_limit": round(state["cp"] * 0.8, 2),
+            "upper_circuit_limit": round(state["cp"] * 1.2, 2),
+            "last_trade_time": str(state["ltt"]),
+            "oi_day_high": 0,
+            "oi_day_low": 0,
+        }
+
+    def feed_frame(self, keys: list[str], mode: str, frame_type: int = 1) -> bytes:
+        response = FeedResponse()
+        response.type = frame_type
+        response.currentTs = int(time.time() * 1000)
+        for key in keys:
+            state = self.step(key)
+            feed = response.feeds[key]
+            ltpc = feed.ltpc if mode == "ltpc" else feed.fullFeed.marketFF.ltpc
+            ltpc.ltp, ltpc.ltt, ltpc.ltq, ltpc.cp = state["ltp"], state["ltt"], state["ltq"], state["cp"]
+            if mode == "ltpc":
+                continue
+            market = feed.fullFeed.marketFF
+            for level in range(5):
+                quote = market.marketLevel.bidAskQuote.add()
+                quote.bidP, quote.bidQ = round(state["ltp"] - 0.05 * (level + 1), 2), 100 * (level + 1)
+                quote.askP, quote.askQ = round(state["ltp"] + 0.05 * (level + 1), 2), 100 * (level + 1)
+            bar = market.marketOHLC.ohlc.add()
+            bar.interval, bar.open, bar.high, bar.low, bar.close = "1d", state["open"], state["high"], state["low"], state["ltp"]
+            bar.vol, bar.ts = state["volume"], response.currentTs
+            market.atp = round((state["high"] + state["low"] + state["ltp"]) / 3, 2)
+            market.vtt = state["volume"]
+            market.tbq = market.tsq = 50_000
+        return response.SerializeToString()
+
+
+def _candles_response(rows: list[list]) -> dict:
+    return {"status": "success", "data": {"candles": list(reversed(rows))}}  # Upstox returns newest first
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Upstox fake")
+    market = FakeMarket(args.seed)
+    stats: Counter = Counter()
+    orders: list[dict] = []
+
+    @app.middleware("http")
+    async def inject_latency_and_errors(request: Request, call_next):
+        if request.url.path.startswith("/fake/"):
+            return await call_next(request)
+        stats[f"requests:{request.url.path.split('/')[2] if request.url.path.count('/') > 1 else request.url.path}"] += 1
+        delay = max(0.0, random.gauss(args.latency_ms, args.jitter_ms)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+        if args.error_rate and random.random() < args.error_rate:
+            stats["injected_errors"] += 1
+            return JSONResponse(
+                status_code=500,
+                content={"status": "error", "errors": [{"errorCode": "UDAPI100500", "message": "Injected fake error"}]},
+            )
+        return await call_next(request)
+
+    @app.get("/v2/market-quote/quotes")
+    async def quotes(instrument_key: str) -> dict:
+        keys = [key for key in instrument_key.split(",") if key]
+        if len(keys) > 500:
+            return JSONResponse(status_code=400, content={"status": "error", "errors": [{"errorCode": "UDAPI1036", "message": "Max 500 instruments"}]})
+        return {"status": "success", "data": {f"{key.split('|')[0]}:{key.split('|')[-1]}": market.quote(key) for key in keys}}
+
+    @app.get("/v2/historical-candle/{instrument_key}/{interval}/{to_date}")
+    @app.get("/v2/historical-candle/{instrument_key}/{interval}/{to_date}/{from_date}")
+    async def historical(instrument_key: str, interval: str, to_date: str, from_date: str | None = None) -> dict:
+        end = date.fromisoformat(to_date)
+        start = date.fromisoformat(from_date) if from_date else end - timedelta(days=365)
+        if interval in INTRADAY_MINUTES:
+            minutes = INTRADAY_MINUTES[interval]
+            rows = []
+            for day in np.arange(np.datetime64(start), np.datetime64(end) + 1):
+                if np.is_busday(day):
+                    rows.extend(market.intraday(instrument_key, day.item(), minutes))
+            return _candles_response(rows)
+        if interval != "day":
+            return JSONResponse(status_code=400, content={"status": "error", "errors": [{"errorCode": "UDAPI1020", "message": f"Invalid interval: {interval}"}]})
+        days, values = market.daily(instrument_key)
+        mask = (days >= np.datetime64(start)) & (days <= np.datetime64(end))
+        rows = [
+            [datetime.combine(day.item(), dt_time(0), tzinfo=IST).isoformat(),
+             *(round(float(v), 2) for v in row[:4]), int(row[4]), 0]
+            for day, row in zip(days[mask], values[mask])
+        ]
+        return _candles_response(rows)
+
+    @app.get("/v3/historical-candle/intraday/{instrument_key}/minutes/{minutes}")
+    async def intraday(instrument_key: str, minutes: int) -> dict:
+        today = datetime.now(IST).date()
+        rows = market.intraday(instrument_key, today, minutes)
+        elapsed = (datetime.now(IST) - datetime.combine(today, SESSION_OPEN, tzinfo=IST)).total_seconds() / 60
+        return _candles_response(rows[:max(0, int(elapsed // minutes))])
+
+    @app.post("/v3/order/place")
+    async def place_order(payload: dict) -> dict:
+        order_id = f"fake-{len(orders) + 1}"
+        orders.append({**payload, "order_id": order_id})
+        # v3 answers with order_ids; order_id is kept for callers reading the v2 shape
+        return {"status": "success", "data": {"order_ids": [order_id], "order_id": order_id}, "metadata": {"latency": int(args.latency_ms)}}
+
+    @app.get("/v3/feed/market-data-feed/authorize")
+    async def authorize(request: Request) -> dict:
+        ws_url = str(request.base_url).replace("http", "ws", 1).rstrip("/") + "/v3/feed/market-data-feed"
+        return {"status": "success", "data": {"authorized_redirect_uri": ws_url, "authorizedRedirectUri": ws_url}}
+
+    @app.websocket("/v3/feed/market-data-feed")
+    async def feed(websocket: WebSocket) -> None:
+        await websocket.accept()
+        stats["feed_connections"] += 1
+        subscribed: list[str] = []
+        mode = "full"
+
+        async def receive_subscriptions() -> None:
+            nonlocal subscribed, mode
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                raw = message.get("text") or (message.get("bytes") or b"").decode()
+                request = json.loads(raw)
+                keys = request.get("data", {}).get("instrumentKeys", [])
+                if request.get("method") == "unsub":
+                    subscribed = [key for key in subscribed if key not in keys]
+                    continue
+                mode = request.get("data", {}).get("mode", mode)
+                subscribed = list(dict.fromkeys(subscribed + keys))
+                await websocket.send_bytes(market.feed_frame(keys, mode, frame_type=0))
+
+        listener = asyncio.create_task(receive_subscriptions())
+        try:
+            await websocket.send_bytes(FeedResponse(type=2, currentTs=int(time.time() * 1000)).SerializeToString())
+            while not listener.done():
+                await asyncio.sleep(1 / args.tick_rate)
+                if not subscribed:
+                    continue
+                keys = subscribed if args.instruments_per_frame <= 0 else random.sample(subscribed, min(args.instruments_per_frame, len(subscribed)))
+                await websocket.send_bytes(market.feed_frame(keys, mode))
+                stats["feed_frames"] += 1
+                stats["feed_ticks"] += len(keys)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            listener.cancel()
+
+    @app.get("/fake/stats")
+    async def fake_stats() -> dict:
+        return {**stats, "orders": len(orders), "instruments_live": len(market.live)}
+
+    @app.get("/fake/orders")
+    async def fake_orders() -> list[dict]:
+        return orders
+
+    # warm the daily history so the first requests are not skewed
+    for key in INTRADAY_UNIVERSE:
+        market.daily(key)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Upstox stand-in for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per HTTP request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="standard deviation of the added latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of HTTP requests answered with a 500")
+    parser.add_argument("--tick-rate", type=float, default=2.0, help="feed frames per second per connection")
+    parser.add_argument("--instruments-per-frame", type=int, default=0, help="random subset per frame (0 = all subscribed)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()